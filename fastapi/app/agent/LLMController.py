@@ -1,6 +1,9 @@
+import asyncio
+import contextlib
 import logging
+import os
 from dotenv import load_dotenv
-from typing import Dict, Any, Optional, AsyncGenerator
+from typing import Dict, Any, List, Optional, AsyncGenerator
 import json
 from .TaskPlanner import TaskPlanner
 from .ToolSelector import ToolSelector
@@ -25,6 +28,33 @@ load_dotenv()
 # 设置日志记录器
 logger = logging.getLogger(__name__)
 
+# 默认关闭：开启后边生成任务计划边执行，每个任务单独调用一次工具选择
+STREAMING_PLAN_ENABLED = os.getenv("AGENT_STREAMING_PLAN", "false").lower() == "true"
+
+_PIPELINE_DONE = object()
+
+
+def _default_tool_selection(task: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "tool": "general_assistant",
+        "params": {"query_type": "general", "keywords": task.get("input", "")}
+    }
+
+
+def _task_result_entry(result: Any) -> Dict[str, Any]:
+    """把工具返回值整理为 task_results 中的记录"""
+    if isinstance(result, dict) and "error" in result:
+        return {"status": "error", "error": result["error"]}
+    # 处理Pydantic对象，将其转换为可JSON序列化的字典
+    if isinstance(result, pydantic.BaseModel):
+        if hasattr(result, 'model_dump'):
+            api_result = result.model_dump()
+        else:
+            api_result = result.dict()
+    else:
+        api_result = result
+    return {"status": "success", "api_result": api_result}
+
 async def get_process_info(message: str) -> AsyncGenerator[Dict[str, Any], None]:
     """
     获取处理用户请求的过程信息 - 异步版本
@@ -35,6 +65,11 @@ async def get_process_info(message: str) -> AsyncGenerator[Dict[str, Any], None]
     Yields:
         包含处理过程信息的字典
     """
+    if STREAMING_PLAN_ENABLED:
+        async for event in get_streaming_process_info(message):
+            yield event
+        return
+
     yield {"type": "step", "content": "任务规划中..."}
     # 1. Task Planning: Decompose user request into subtasks
     task_plan = await TaskPlanner.create_task_plan(message)
@@ -65,27 +100,12 @@ async def get_process_info(message: str) -> AsyncGenerator[Dict[str, Any], None]
             task_results[task_id] = {"status": "skipped", "reason": "依赖任务失败"}
             continue
         
-        tool_selection = task_to_tool_map.get(task_id, {
-            "tool": "general_assistant",
-            "params": {"query_type": "general", "keywords": task.get("input", "")}
-        })
+        tool_selection = task_to_tool_map.get(task_id, _default_tool_selection(task))
         logger.info(f"Selected tool for task {task_id}: {tool_selection}")
 
         result = await TaskExecutor.execute_task(task, tool_selection, task_results)
-        if isinstance(result, dict) and "error" in result:
-            task_results[task_id] = {"status": "error", "error": result["error"]}
-            yield {"type": "data", "subtype": "task_result", "content": {"task_id": task['id'], "result": result}}
-        else:
-            # 处理Pydantic对象，将其转换为可JSON序列化的字典
-            if isinstance(result, pydantic.BaseModel):
-                if hasattr(result, 'model_dump'):
-                    api_result = result.model_dump()
-                else:
-                    api_result = result.dict()
-            else:
-                api_result = result
-            task_results[task_id] = {"status": "success", "api_result": api_result}
-            yield {"type": "data", "subtype": "task_result", "content": {"task_id": task['id'], "result": result}}
+        task_results[task_id] = _task_result_entry(result)
+        yield {"type": "data", "subtype": "task_result", "content": {"task_id": task['id'], "result": result}}
             
     # 4. 返回处理过程信息
     process_info = {
@@ -98,3 +118,163 @@ async def get_process_info(message: str) -> AsyncGenerator[Dict[str, Any], None]
     logger.debug(f"Process info: {json.dumps(process_info, ensure_ascii=False)}")
     
     yield {"type": "data", "subtype": "process_summary", "content": process_info}
+
+
+async def get_streaming_process_info(message: str) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    边生成任务计划边执行 - 流式规划模式
+
+    规划器每输出一个完整的任务对象，就为它单独选择工具并在依赖完成后执行，
+    无依赖的任务不必等待整个计划生成。事件与 ``get_process_info`` 相同，
+    task_plan 与 tool_selections 随任务到达多次产出，内容为截至当时的完整列表。
+
+    Args:
+        message: User message
+
+    Yields:
+        包含处理过程信息的字典
+    """
+    yield {"type": "step", "content": "任务规划中..."}
+
+    queue: asyncio.Queue = asyncio.Queue()
+    tasks: List[Dict[str, Any]] = []
+    task_to_tool_map: Dict[Any, Dict[str, Any]] = {}
+    task_results: Dict[Any, Any] = {}
+    finished: Dict[Any, asyncio.Event] = {}
+    workers: List[asyncio.Task] = []
+
+    async def select_and_execute(task: Dict[str, Any], earlier_ids: set) -> None:
+        task_id = task.get("id")
+        deps = task.get("depends_on", [])
+        try:
+            # 与逐个执行时一致：只能依赖计划中排在前面的任务，否则按依赖失败处理，也避免循环等待
+            if any(dep_id not in earlier_ids for dep_id in deps):
+                task_results[task_id] = {"status": "skipped", "reason": "依赖任务失败"}
+                return
+
+            # 只把当前任务及其依赖交给工具选择器，参数中仍可引用依赖任务的结果
+            context = [item for item in tasks if item.get("id") in deps] + [task]
+            tool_selections = await ToolSelector.select_tools_for_tasks({"tasks": context})
+            tool_selection = next(
+                (
+                    selection
+                    for selection in tool_selections.get("tool_selections", [])
+                    if selection.get("task_id") == task_id
+                ),
+                None,
+            ) or _default_tool_selection(task)
+            task_to_tool_map[task_id] = tool_selection
+            await queue.put({"type": "data", "subtype": "tool_selections", "content": dict(task_to_tool_map)})
+            logger.info(f"Selected tool for task {task_id}: {tool_selection}")
+
+            for dep_id in deps:
+                await finished[dep_id].wait()
+            deps_met = all(task_results.get(dep_id, {}).get("status") == "success" for dep_id in deps)
+            if not deps_met:
+                task_results[task_id] = {"status": "skipped", "reason": "依赖任务失败"}
+                return
+
+            await queue.put({"type": "step", "content": f"执行任务: {task['task']}..."})
+            result = await TaskExecutor.execute_task(task, tool_selection, task_results)
+            task_results[task_id] = _task_result_entry(result)
+            await queue.put({"type": "data", "subtype": "task_result", "content": {"task_id": task_id, "result": result}})
+        except Exception as e:
+            logger.error(f"任务 {task_id} 处理出错: {str(e)}", exc_info=True)
+            task_results[task_id] = {"status": "error", "error": str(e)}
+        finally:
+            finished[task_id].set()
+
+    async def plan_and_dispatch() -> None:
+        try:
+            async for task in TaskPlanner.stream_task_plan(message):
+                task_id = task.get("id")
+                if task_id in finished:
+                    logger.warning(f"任务 ID 重复，忽略: {task}")
+                    continue
+                earlier_ids = set(finished)
+                tasks.append(task)
+                finished[task_id] = asyncio.Event()
+                await queue.put({"type": "data", "subtype": "task_plan", "content": list(tasks)})
+                if len(tasks) == 1:
+                    await queue.put({"type": "step", "content": "工具选择中..."})
+                workers.append(asyncio.create_task(select_and_execute(task, earlier_ids)))
+            await asyncio.gather(*workers)
+        finally:
+            await queue.put(_PIPELINE_DONE)
+
+    producer = asyncio.create_task(plan_and_dispatch())
+    try:
+        while True:
+            event = await queue.get()
+            if event is _PIPELINE_DONE:
+                break
+            yield event
+        await producer
+    finally:
+        for worker in [producer, *workers]:
+            if not worker.done():
+                worker.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await worker
+
+    tool_selections = {"tool_selections": list(task_to_tool_map.values())}
+    process_info = {
+        "user_input": message,
+        "task_planning": {"tasks": tasks},
+        "tool_selection": tool_selections,
+        "task_execution": task_results
+    }
+    logger.info("处理过程信息已生成")
+    logger.debug(f"Process info: {json.dumps(process_info, ensure_ascii=False, default=str)}")
+
+    yield {"type": "data", "subtype": "process_summary", "content": process_info}
+
+
+class ProcessInfoRecorder:
+    """
+    汇总 ``get_process_info`` 产生的事件，得到生成最终回复所需的处理过程信息
+
+    ``stage`` 表示流水线当前所处阶段：planning、tool_selection、task_execution
+    """
+
+    def __init__(self, message: str) -> None:
+        self.message = message
+        self.steps = []
+        self.task_plan = None
+        self.tool_selections = None
+        self.task_results: Dict[Any, Any] = {}
+        self.stage = "planning"
+
+    @property
+    def planned_tasks(self) -> int:
+        return len(self.task_plan or [])
+
+    @property
+    def pending_tasks(self) -> int:
+        return max(self.planned_tasks - len(self.task_results), 0)
+
+    def add(self, event: Any) -> Dict[str, Any]:
+        """记录一条事件，返回其字典形式"""
+        result = event.model_dump() if isinstance(event, pydantic.BaseModel) else event
+        if result.get("type") == "step":
+            self.steps.append(result.get("content"))
+        elif result.get("type") == "data":
+            if result.get("subtype") == "task_plan":
+                self.task_plan = result.get("content")
+                self.stage = "tool_selection"
+            elif result.get("subtype") == "task_result":
+                content = result.get("content", {})
+                self.task_results[content.get("task_id")] = content.get("result")
+            elif result.get("subtype") == "tool_selections":
+                self.tool_selections = result.get("content")
+                self.stage = "task_execution"
+        return result
+
+    def process_info(self) -> Dict[str, Any]:
+        return {
+            "user_input": self.message,
+            "steps": list(self.steps),
+            "task_planning": {"tasks": self.task_plan} if self.task_plan else {},
+            "tool_selection": {"tool_selections": self.tool_selections} if self.tool_selections else {},
+            "task_execution": dict(self.task_results),
+        }
@@ -0,0 +1,118 @@
+"""
+工具参数中的任务结果占位符。
+
+参数值中可以用 ``{TASK_<id>_RESULT<路径>}`` 引用前置任务的结果，路径由
+``.key`` 与 ``[index]`` 组成，如 ``{TASK_2_RESULT.items[0].link}``；对列表也可以
+写 ``.0``。字符串先编译为由字面量与占位符组成的模板（按字符串缓存），执行时
+只做查找与拼接：
+
+- 整个参数值就是一个占位符时保留结果的原始类型（dict、list、数字等）
+- 占位符嵌在文本中时，dict 与 list 按 JSON 输出，其他值按 ``str`` 输出
+- 同一个值中的多个占位符都会被替换
+
+找不到结果时沿用原有的标记文本，如 ``{TASK_1_RESULT_NOT_FOUND}``。
+"""
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Tuple, Union
+
+
+_PLACEHOLDER = re.compile(r"\{TASK_(\d+)_RESULT((?:\.[^\s.\[\]{}]+|\[\d+\])*)\}")
+_PATH_PART = re.compile(r"\.([^\s.\[\]{}]+)|\[(\d+)\]")
+
+
+@dataclass(frozen=True)
+class Placeholder:
+    task_id: int
+    # 键为 str，列表下标为 int
+    path: Tuple[Union[str, int], ...]
+
+    def resolve(self, task_results: Dict[Any, Any]) -> Any:
+        entry = task_results.get(self.task_id, task_results.get(str(self.task_id)))
+        if not isinstance(entry, dict) or entry.get("status") != "success":
+            return f"{{TASK_{self.task_id}_RESULT_NOT_FOUND}}"
+        value = entry.get("api_result")
+        for key in self.path:
+            if isinstance(value, dict):
+                if key not in value and str(key) in value:
+                    key = str(key)
+                if key not in value:
+                    return f"{{KEY_{key}_NOT_FOUND}}"
+                value = value[key]
+            elif isinstance(value, (list, tuple)):
+                index = _as_index(key)
+                if index is None or not -len(value) <= index < len(value):
+                    return f"{{KEY_{key}_NOT_FOUND}}"
+                value = value[index]
+            else:
+                return "{INVALID_KEY_PATH}"
+        return value
+
+
+def _as_index(key: Union[str, int]):
+    if isinstance(key, int):
+        return key
+    return int(key) if key.isdigit() else None
+
+
+@dataclass(frozen=True)
+class Template:
+    """字面量与占位符交替组成的字符串模板"""
+
+    parts: Tuple[Union[str, Placeholder], ...]
+
+    def render(self, task_results: Dict[Any, Any]) -> Any:
+        if len(self.parts) == 1 and isinstance(self.parts[0], Placeholder):
+            return self.parts[0].resolve(task_results)
+        return "".join(
+            part if isinstance(part, str) else _to_text(part.resolve(task_results))
+            for part in self.parts
+        )
+
+
+def _to_text(value: Any) -> str:
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def _parse_path(path: str) -> Tuple[Union[str, int], ...]:
+    return tuple(
+        key if index == "" else int(index)
+        for key, index in _PATH_PART.findall(path)
+    )
+
+
+@lru_cache(maxsize=2048)
+def compile_template(text: str) -> Template:
+    parts = []
+    position = 0
+    for match in _PLACEHOLDER.finditer(text):
+        if match.start() > position:
+            parts.append(text[position:match.start()])
+        parts.append(Placeholder(int(match.group(1)), _parse_path(match.group(2))))
+        position = match.end()
+    if position < len(text) or not parts:
+        parts.append(text[position:])
+    return Template(tuple(parts))
+
+
+def resolve_params(value: Any, task_results: Dict[Any, Any]) -> Any:
+    """
+    递归替换参数中的占位符，返回新对象，不修改传入的参数
+
+    Args:
+        value: 参数值，可以是 dict、list 或字符串
+        task_results: 前置任务的执行结果
+    """
+    if isinstance(value, str):
+        if "{TASK_" not in value:
+            return value
+        return compile_template(value).render(task_results)
+    if isinstance(value, dict):
+        return {key: resolve_params(item, task_results) for key, item in value.items()}
+    if isinstance(value, list):
+        return [resolve_params(item, task_results) for item in value]
+    return value
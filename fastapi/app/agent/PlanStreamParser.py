@@ -0,0 +1,127 @@
+"""
+任务计划的增量 JSON 解析。
+
+规划器流式输出形如 ``{"tasks": [{...}, {...}]}`` 的文本（可能包在 ```json 代码块中），
+``PlanStreamParser`` 逐块接收文本，``"tasks"`` 数组中的每个任务对象一闭合就解析出来，
+不必等待整个计划生成完毕。字符串之外的 ``//`` 注释会被忽略，数组之外的内容
+（代码块标记、尾随逗号、其他字段）不影响任务解析；单个任务对象按 ``PlannedTask``
+校验，必要时先经本地修复。
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from ..schemas.agent_plan import PlannedTask
+from ..services.json_repair import loads_tolerant
+
+
+_TASKS_KEY = re.compile(r'"tasks"\s*:\s*\[')
+
+
+class PlanStreamError(ValueError):
+    """任务对象无法解析"""
+
+
+class PlanStreamParser:
+    """逐块解析任务计划，任务对象闭合后立即返回"""
+
+    def __init__(self) -> None:
+        self.text = ""
+        self.tasks: List[Dict[str, Any]] = []
+        # 扫描位置；None 表示尚未找到 tasks 数组
+        self._position: Optional[int] = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._in_comment = False
+        self._object: List[str] = []
+        # 数组已闭合或解析出错后不再扫描
+        self.closed = False
+        self.error: Optional[str] = None
+        # 是否有任务对象经过本地修复
+        self.repaired = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """
+        追加一段文本，返回本次新闭合的任务
+
+        任务对象不是合法 JSON 时记录 ``error`` 并停止解析，此前闭合的任务仍然返回
+        """
+        self.text += chunk
+        if self._position is None:
+            match = _TASKS_KEY.search(self.text)
+            if match is None:
+                return []
+            self._position = match.end()
+
+        completed = []
+        text = self.text
+        while self._position < len(text) and not self.closed:
+            char = text[self._position]
+            self._position += 1
+
+            if self._in_comment:
+                if char == "\n":
+                    self._in_comment = False
+                continue
+
+            if self._in_string:
+                self._object.append(char)
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == "/" and self._position < len(text) and text[self._position] == "/":
+                self._in_comment = True
+                self._position += 1
+                continue
+            if char == "/" and self._position == len(text):
+                # 可能是注释的第一个斜杠，等下一块再判断
+                self._position -= 1
+                break
+
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._object = [char]
+                elif char == "]":
+                    self.closed = True
+                continue
+
+            self._object.append(char)
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        completed.append(self._parse_task("".join(self._object)))
+                    except PlanStreamError as e:
+                        self.error = str(e)
+                        self.closed = True
+                    self._object = []
+
+        self.tasks.extend(completed)
+        return completed
+
+    @property
+    def complete(self) -> bool:
+        """tasks 数组是否已正常闭合"""
+        return self.closed and self.error is None
+
+    def _parse_task(self, source: str) -> Dict[str, Any]:
+        try:
+            task, repaired = loads_tolerant(source)
+            task = PlannedTask.model_validate(task).model_dump()
+        except (json.JSONDecodeError, ValidationError) as e:
+            raise PlanStreamError(f"无法解析任务对象: {source[:200]}") from e
+        self.repaired = self.repaired or repaired
+        return task
@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..services.token_counter import TOKEN_COUNTER, TokenCounter
+
+logger = logging.getLogger(__name__)
+
+# 最终回复 prompt 中处理过程部分的 token 预算
+RESPONSE_CONTEXT_TOKEN_BUDGET = int(os.getenv("RESPONSE_CONTEXT_TOKEN_BUDGET", "3000"))
+# 结果超出均分预算时，每个任务至少保留的 token 数
+MIN_TASK_TOKEN_BUDGET = 120
+
+# skill 结果顶层的激活内容（SKILL.md 全文），最终回复用不到；工具选择理由由
+# ``compact_selections`` 只保留工具名与参数时去掉
+SKILL_ACTIVATION_KEY = "activation"
+
+# 逐步收紧的压缩档位：(单个字符串最多字符数, 单个列表最多元素数)
+SHRINK_LEVELS = ((2000, 20), (800, 10), (300, 5), (120, 3), (40, 2))
+
+
+def _plain(value: Any) -> Any:
+    """转换为可 JSON 序列化的结构，去掉空值"""
+    if hasattr(value, "model_dump"):
+        value = value.model_dump()
+    elif not isinstance(value, (dict, list, tuple, str, int, float, bool)) and hasattr(value, "__dict__"):
+        value = vars(value)
+
+    if isinstance(value, dict):
+        return {
+            str(key): _plain(item)
+            for key, item in value.items()
+            if item is not None and item != "" and item != [] and item != {}
+        }
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _compact_result(result: Any) -> Any:
+    """任务结果只去掉 skill 结果顶层的 activation，工具返回的其余字段原样保留"""
+    result = _plain(result)
+    if isinstance(result, dict):
+        result.pop(SKILL_ACTIVATION_KEY, None)
+        api_result = result.get("api_result")
+        if isinstance(api_result, dict):
+            api_result.pop(SKILL_ACTIVATION_KEY, None)
+    return result
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _shrink(value: Any, max_chars: int, max_items: int) -> Any:
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + "…"
+    if isinstance(value, list):
+        items = [_shrink(item, max_chars, max_items) for item in value[:max_items]]
+        if len(value) > max_items:
+            items.append(f"…另有{len(value) - max_items}项")
+        return items
+    if isinstance(value, dict):
+        return {key: _shrink(item, max_chars, max_items) for key, item in value.items()}
+    return value
+
+
+def allocate_budget(sizes: Dict[Any, int], budget: int, minimum: int = MIN_TASK_TOKEN_BUDGET) -> Dict[Any, int]:
+    """
+    按需均分预算：小于均分额度的结果全额保留，剩余额度在较大的结果间再均分
+
+    Args:
+        sizes: 每个任务结果的 token 数
+        budget: 总预算
+        minimum: 每个任务的最低额度
+
+    Returns:
+        每个任务分到的 token 数
+    """
+    allocation: Dict[Any, int] = {}
+    remaining = budget
+    pending = sorted(sizes, key=lambda key: (sizes[key], str(key)))
+    while pending:
+        share = remaining // len(pending)
+        key = pending[0]
+        if sizes[key] <= share:
+            allocation[key] = sizes[key]
+            remaining -= sizes[key]
+            pending.pop(0)
+            continue
+        for key in pending:
+            allocation[key] = max(share, minimum)
+        break
+    return allocation
+
+
+class ProcessContextBuilder:
+    """
+    为最终回复构建紧凑的处理过程上下文 - 按 token 预算裁剪
+
+    任务规划只保留编号与描述，工具选择只保留工具名与参数，任务结果去掉
+    skill 顶层的 ``activation`` 后紧凑序列化；结果总量超出预算时按任务分配额度，
+    超额的结果逐级截短字符串和列表，最后按 token 截断，相同输入得到相同输出。
+    """
+
+    def __init__(self, budget: int = RESPONSE_CONTEXT_TOKEN_BUDGET, counter: Optional[TokenCounter] = None) -> None:
+        self.budget = budget
+        self.counter = counter or TOKEN_COUNTER
+
+    def build(self, process_info: Dict[str, Any]) -> str:
+        plan = self.compact_plan(process_info.get("task_planning"))
+        selections = self.compact_selections(process_info.get("tool_selection"))
+        plan_text = _dumps(plan)
+        selections_text = _dumps(selections)
+
+        results = {
+            str(task_id): _compact_result(result)
+            for task_id, result in (process_info.get("task_execution") or {}).items()
+        }
+        overhead = self.counter.count(plan_text) + self.counter.count(selections_text)
+        results_text = self.fit_results(results, max(self.budget - overhead, 0))
+
+        return f"任务规划:\n{plan_text}\n\n工具选择:\n{selections_text}\n\n任务执行:\n{results_text}"
+
+    def fit_results(self, results: Dict[str, Any], budget: int) -> str:
+        texts = {task_id: _dumps(result) for task_id, result in results.items()}
+        sizes = {task_id: self.counter.count(text) for task_id, text in texts.items()}
+        if sum(sizes.values()) > budget:
+            allocation = allocate_budget(sizes, budget)
+            for task_id, limit in allocation.items():
+                if sizes[task_id] > limit:
+                    texts[task_id] = self.fit(results[task_id], limit)
+                    logger.debug(f"任务 {task_id} 结果 {sizes[task_id]} tokens 超出额度 {limit}，已压缩")
+        return "\n".join(f"{task_id}: {text}" for task_id, text in texts.items())
+
+    def fit(self, value: Any, max_tokens: int) -> str:
+        """把单个结果压缩到 ``max_tokens`` 以内"""
+        text = _dumps(value)
+        for max_chars, max_items in SHRINK_LEVELS:
+            if self.counter.count(text) <= max_tokens:
+                return text
+            text = _dumps(_shrink(value, max_chars, max_items))
+        return self.counter.truncate(text, max_tokens)
+
+    @staticmethod
+    def compact_plan(task_planning: Any) -> List[Dict[str, Any]]:
+        tasks = task_planning.get("tasks", []) if isinstance(task_planning, dict) else task_planning or []
+        compact = []
+        for task in tasks:
+            if not isinstance(task, dict):
+                continue
+            item = {"id": task.get("id"), "task": task.get("task")}
+            if task.get("depends_on"):
+                item["depends_on"] = task["depends_on"]
+            compact.append(item)
+        return compact
+
+    @staticmethod
+    def compact_selections(tool_selection: Any) -> Dict[str, Any]:
+        selections = tool_selection.get("tool_selections", tool_selection) if isinstance(tool_selection, dict) else tool_selection
+        if isinstance(selections, dict):
+            items: List[Tuple[Any, Any]] = list(selections.items())
+        else:
+            items = [(selection.get("task_id"), selection) for selection in selections or [] if isinstance(selection, dict)]
+
+        compact = {}
+        for task_id, selection in items:
+            if not isinstance(selection, dict):
+                continue
+            entry = {"tool": selection.get("tool")}
+            params = _plain(selection.get("params") or {})
+            if params:
+                entry["params"] = params
+            compact[str(task_id)] = entry
+        return compact
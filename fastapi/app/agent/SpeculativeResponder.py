@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+import logging
+import os
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+from .LLMController import ProcessInfoRecorder, get_process_info
+from .ResponseGenerator import ResponseGenerator
+
+logger = logging.getLogger(__name__)
+
+# 默认关闭：开启后回复开头只基于部分任务结果，会多一次 LLM 调用
+SPECULATIVE_RESPONSE_ENABLED = os.getenv("AGENT_SPECULATIVE_RESPONSE", "false").lower() == "true"
+
+
+class SpeculativeResponder:
+    """
+    让最终回复与任务执行重叠 - 推测式提前输出
+
+    任务规划完成且第一个任务结果返回后，如果还有任务未执行完，立即基于已有结果
+    流式生成回复开头，剩余任务在后台继续执行。``run`` 按到达顺序交替产出流水线事件
+    与开头文本；结束后调用方以 ``opening`` 为前缀，用完整的处理过程信息续写其余回复。
+    """
+
+    def __init__(self, message: str, chat_history: Optional[List[Dict[str, str]]] = None) -> None:
+        self.message = message
+        self.chat_history = chat_history
+        self.recorder = ProcessInfoRecorder(message)
+        self._opening: List[str] = []
+
+    @property
+    def opening(self) -> str:
+        return "".join(self._opening)
+
+    async def run(self) -> AsyncGenerator[Tuple[str, Any], None]:
+        """
+        Yields:
+            ("event", 事件字典) 或 ("token", 开头文本片段)
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def run_pipeline() -> None:
+            try:
+                async for event in get_process_info(self.message):
+                    queue.put_nowait(("event", event))
+            except Exception as exc:
+                queue.put_nowait(("error", exc))
+            finally:
+                queue.put_nowait(("pipeline_done", None))
+
+        async def run_opening(process_info: Dict[str, Any]) -> None:
+            try:
+                async for chunk in ResponseGenerator.create_opening_streaming_response(
+                    self.message, process_info, self.chat_history
+                ):
+                    queue.put_nowait(("token", chunk))
+            finally:
+                queue.put_nowait(("opening_done", None))
+
+        pipeline = asyncio.create_task(run_pipeline())
+        opening: Optional[asyncio.Task] = None
+        pipeline_done = opening_done = False
+        try:
+            # 两个任务的结束标记都出队后，队列中不会再有它们产出的内容
+            while not pipeline_done or (opening is not None and not opening_done):
+                kind, item = await queue.get()
+                if kind == "pipeline_done":
+                    pipeline_done = True
+                elif kind == "opening_done":
+                    opening_done = True
+                elif kind == "error":
+                    raise item
+                elif kind == "token":
+                    self._opening.append(item)
+                    yield kind, item
+                else:
+                    result = self.recorder.add(item)
+                    yield kind, result
+                    if opening is None and self._should_open(result):
+                        logger.info(f"提前输出回复开头，剩余任务数: {self.recorder.pending_tasks}")
+                        opening = asyncio.create_task(run_opening(self.recorder.process_info()))
+        finally:
+            for task in (pipeline, opening):
+                if task is not None and not task.done():
+                    task.cancel()
+                    with contextlib.suppress(asyncio.CancelledError):
+                        await task
+
+    def _should_open(self, result: Dict[str, Any]) -> bool:
+        return (
+            result.get("type") == "data"
+            and result.get("subtype") == "task_result"
+            and self.recorder.pending_tasks > 0
+        )
@@ -0,0 +1,84 @@
+"""
+规划器与工具选择器的结构化输出解析。
+
+LLM 输出先严格解析，失败时本地修复（见 ``json_repair``），再按 pydantic
+模型逐项校验：不合法的列表项被丢弃，其余项保留。结果按 parsed / repaired
+计入 ``PIPELINE_METRICS``；无法得到任何合法项时抛出 ``StructuredOutputError``，
+由调用方走降级方案并记为 fallback。
+"""
+import json
+import logging
+from typing import Any, Dict, Type
+
+from pydantic import BaseModel, ValidationError
+
+from ..schemas.agent_plan import PlannedTask, TaskPlan, ToolSelection, ToolSelectionPlan
+from ..services.json_repair import loads_tolerant
+from ..services.pipeline_metrics import PIPELINE_METRICS
+
+logger = logging.getLogger(__name__)
+
+
+class StructuredOutputError(ValueError):
+    """LLM 输出无法解析为所需结构"""
+
+
+def parse_structured_output(
+    role: str,
+    text: str,
+    schema: Type[BaseModel],
+    list_field: str,
+    item_schema: Type[BaseModel],
+) -> Dict[str, Any]:
+    """
+    解析并校验 LLM 输出
+
+    Args:
+        role: planner 或 selector，用于指标
+        text: LLM 输出文本
+        schema: 整体结构
+        list_field: 结构中的列表字段
+        item_schema: 列表项结构
+
+    Returns:
+        校验后的字典
+
+    Raises:
+        StructuredOutputError: 无法解析或没有合法项
+    """
+    try:
+        data, repaired = loads_tolerant(text or "")
+    except json.JSONDecodeError as e:
+        raise StructuredOutputError(f"无法解析 JSON: {str(e)}") from e
+
+    if isinstance(data, list):
+        # 直接返回了列表
+        data, repaired = {list_field: data}, True
+    if not isinstance(data, dict) or not isinstance(data.get(list_field), list):
+        raise StructuredOutputError(f"缺少 {list_field} 列表")
+
+    items = []
+    for item in data[list_field]:
+        try:
+            items.append(item_schema.model_validate(item).model_dump())
+        except ValidationError as e:
+            repaired = True
+            logger.warning(f"{role} 输出中丢弃不合法的项 {item}: {e.errors()[:1]}")
+
+    try:
+        result = schema.model_validate({**data, list_field: items}).model_dump()
+    except ValidationError as e:
+        raise StructuredOutputError(f"{list_field} 不合法: {e.errors()[:1]}") from e
+
+    PIPELINE_METRICS.record_structured_output(role, "repaired" if repaired else "parsed")
+    if repaired:
+        logger.info(f"{role} 输出经过本地修复后解析成功")
+    return result
+
+
+def parse_task_plan(text: str) -> Dict[str, Any]:
+    return parse_structured_output("planner", text, TaskPlan, "tasks", PlannedTask)
+
+
+def parse_tool_selections(text: str) -> Dict[str, Any]:
+    return parse_structured_output("selector", text, ToolSelectionPlan, "tool_selections", ToolSelection)
@@ -1,8 +1,9 @@
-import re
 import logging
-from typing import Dict, Any
+from typing import Any, Dict, List, Tuple
+from .ParamTemplate import compile_template, resolve_params
 from ..services.campus_tool_hub import CampusToolHub
 from ..services.server_manager import ServerManager
+from ..services.tool_catalog import ToolCatalogService
 from ..skills import SkillRegistry
 
 logger = logging.getLogger(__name__)
@@ -33,20 +34,20 @@ class TaskExecutor:
         
         try:
             # Get tool and parameters
-            params = tool_selection.get("params", {}).copy()
+            params = dict(tool_selection.get("params") or {})
             logger.debug(f"任务 {task_id} 初始参数: {params}")
             
             # 解决任务的参数依赖问题，即当前执行的任务依赖前面执行任务作为参数
-            for param_key, param_value in params.items():
-                if isinstance(param_value, str) and "{" in param_value:
-                    import re
-                    placeholders = re.findall(r"\{TASK_\d+_RESULT(?:\.\w+)*\}", param_value)
-                    logger.debug(f"任务 {task_id} 参数 {param_key} 包含占位符: {placeholders}")
-                    for ph in placeholders:
-                        resolved = cls.resolve_placeholder(ph, task_results)
-                        params[param_key] = param_value.replace(ph, str(resolved))
+            params = resolve_params(params, task_results)
             logger.debug(f"任务 {task_id} 最终参数: {params}")
 
+            # 按工具 schema 在本地校验参数，不合法的调用不再发往远程
+            if tool_name != "general_assistant":
+                params, errors = await cls.validate_params(tool_name, params)
+                if errors:
+                    logger.warning(f"任务 {task_id} 参数校验失败，不执行工具 {tool_name}: {errors}")
+                    return {"error": f"参数校验失败: {'; '.join(errors)}", "task_id": task_id, "tool": tool_name}
+
             if SkillRegistry.has_tool(tool_name):
                 logger.info(f"使用本地 skill 执行工具: {tool_name}")
                 return await SkillRegistry.execute_tool(tool_name, params)
@@ -86,25 +87,35 @@ class TaskExecutor:
             logger.error(f"任务 {task_id} 执行错误: {str(e)}", exc_info=True)
             return {"error": f"执行任务时出错: {str(e)}", "task_id": task_id, "tool": tool_name}
             
+    @classmethod
+    async def validate_params(cls, tool_name: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        使用工具目录中预编译的校验器校验参数
+
+        Returns:
+            (修正后的参数, 错误列表)，工具没有声明 schema 时原样返回
+        """
+        skill = SkillRegistry.get_tool(tool_name)
+        if skill is not None:
+            tool_name = skill.name
+            # 与 SkillRegistry.execute_tool 一致，展开嵌套的 params
+            if isinstance(params.get("params"), dict):
+                params = {**params, **params["params"]}
+                params.pop("params", None)
+
+        catalog = await ToolCatalogService.current()
+        validator = catalog.validator(tool_name)
+        if validator is None:
+            return params, []
+
+        result = validator.validate(params)
+        if result.repaired:
+            logger.info(f"工具 {tool_name} 参数已在本地修正: {result.repaired}")
+        return result.params, result.errors
+
     @classmethod
     def resolve_placeholder(cls, placeholder: str, task_results: Dict[int, Any]) -> Any:
         """
         解析占位符，从前置任务结果中获取数据
         """
-        if not placeholder.startswith("{TASK_") or not placeholder.endswith("}"):
-            return placeholder
-        try:
-            parts = placeholder[1:-1].split(".") # 去掉{}，按照.进行分割
-            task_id = int(parts[0].split("_")[1])
-            key_path = parts[1:]
-            if task_id not in task_results or task_results[task_id].get("status") != "success":
-                return f"{{TASK_{task_id}_RESULT_NOT_FOUND}}"
-            value = task_results[task_id]["api_result"]
-            for key in key_path:
-                if isinstance(value, dict):
-                    value = value.get(key, f"{{KEY_{key}_NOT_FOUND}}")
-                else:
-                    return f"{{INVALID_KEY_PATH}}"
-            return value
-        except Exception as e:
-            return f"{{PLACEHOLDER_ERROR: {str(e)}}}"
+        return compile_template(placeholder).render(task_results)
@@ -1,8 +1,12 @@
 import json
 import logging
 from logging.handlers import RotatingFileHandler
-from typing import Dict, Any
-from ..services.llm_service import LLMService, MAIN_AGENT_MODEL
+from typing import Dict, Any, AsyncGenerator
+from .PlanStreamParser import PlanStreamParser
+from .PromptTemplates import PLANNER_PROMPT, planner_messages
+from .StructuredOutput import StructuredOutputError, parse_task_plan
+from ..services.llm_service import LLMService, MAIN_AGENT_MODEL, log_prompt_cache_usage
+from ..services.pipeline_metrics import PIPELINE_METRICS
 from ..services.student_profile_service import format_student_profile_for_prompt
 
 logger = logging.getLogger(__name__)
@@ -24,39 +28,6 @@ class TaskPlanner:
     Central planning LLM that decomposes user requests into subtasks - FastAPI async version
     """
 
-    # system prompt for task planning
-    PLANNING_PROMPT = """你是浙江农林大学智能校园系统的中央规划器。你的任务是在校园场景下，分析用户的请求，并将其分解为可处理的子任务。
-    
-分析用户请求，并以下格式返回任务计划：
-
-{{
-  "tasks": [
-    {{
-      "id": 1,
-      "task": "具体任务描述",
-      "input": "给该任务的输入",
-      "depends_on": []
-    }},
-    {{
-      "id": 2,
-      "task": "具体任务描述",
-      "input": "给该任务的输入",
-      "depends_on": [1]  // 这表示此任务依赖于任务1的结果
-    }}
-  ],
-}}
-
-规则：
-1. 每个任务应尽可能精确
-2. 如果任务之间有依赖关系，请使用depends_on字段指定
-3. 复杂请求应分解为多个子任务
-4. 简单请求可以是单个任务
-
-当前用户画像：
-{student_profile}
-
-用户请求："{user_request}"
-    """
     @classmethod
     async def create_task_plan(cls, user_request: str) -> Dict[str, Any]:
         """
@@ -72,54 +43,90 @@ class TaskPlanner:
         logger.debug(f"用户请求: {user_request}")
         
         try:
-            # Create planning prompt
-            prompt = cls.PLANNING_PROMPT.format(
-                user_request=user_request,
-                student_profile=format_student_profile_for_prompt(),
-            )
-            logger.debug("已生成规划提示词")
+            # Create planning prompt：静态前缀 + 用户请求
+            messages = planner_messages(user_request, format_student_profile_for_prompt())
+            logger.debug(f"已生成规划提示词: {PLANNER_PROMPT.key}")
 
             # Use planning LLM to generate task plan
             logger.info("初始化 LLM 模型")
-            llm = await LLMService.get_llm(model_name=MAIN_AGENT_MODEL, temperature=0.2)
+            llm = await LLMService.get_llm(model_name=MAIN_AGENT_MODEL, temperature=0.2, json_mode=True)
 
             logger.info("向 LLM 发送请求")
-            planning_response = await llm.ainvoke([
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": user_request}
-            ])
+            planning_response = await llm.ainvoke(messages)
             logger.debug("已收到 LLM 响应")
+            log_prompt_cache_usage("planner", planning_response, PLANNER_PROMPT.key)
 
-            # Extract JSON from response
+            # 严格解析失败时先本地修复，再按 TaskPlan 校验
             response_text = planning_response.content
-            json_match = response_text.strip()
             logger.debug("开始解析 LLM 响应")
-
-            # Parse the plan
-            if "```json" in json_match:
-                logger.debug("检测到 JSON 代码块，进行提取")
-                json_match = json_match.split("```json")[1].split("```")[0]
-            
-            task_plan = json.loads(json_match)
+            task_plan = parse_task_plan(response_text)
             logger.info(f"成功生成任务计划，包含 {len(task_plan.get('tasks', []))} 个任务")
             logger.debug(f"任务计划详情: {json.dumps(task_plan, ensure_ascii=False, indent=2)}")
             
             return task_plan
 
-        except json.JSONDecodeError as je:
-            logger.error(f"JSON 解析错误: {str(je)}")
+        except StructuredOutputError as se:
+            logger.error(f"任务计划解析错误: {str(se)}")
             logger.debug(f"导致错误的响应内容: {response_text}")
             return await cls._get_fallback_plan(user_request)
         except Exception as e:
             logger.error(f"任务规划过程出错: {str(e)}", exc_info=True)
             return await cls._get_fallback_plan(user_request)
 
+    @classmethod
+    async def stream_task_plan(cls, user_request: str) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        流式生成任务计划，每个任务对象一闭合就产出
+
+        流中没有解析出任何任务（调用失败、格式错误）时产出降级方案中的任务；
+        已产出部分任务后出错则保留已产出的任务，不再追加
+
+        Args:
+            user_request: The user's message
+
+        Yields:
+            任务字典
+        """
+        logger.info("开始流式创建任务计划")
+        logger.debug(f"用户请求: {user_request}")
+
+        parser = PlanStreamParser()
+        try:
+            messages = planner_messages(user_request, format_student_profile_for_prompt())
+            llm = await LLMService.get_llm(model_name=MAIN_AGENT_MODEL, temperature=0.2, stream=True, json_mode=True)
+
+            async for chunk in llm.astream(messages):
+                if getattr(chunk, "usage_metadata", None):
+                    log_prompt_cache_usage("planner", chunk, PLANNER_PROMPT.key)
+                if parser.closed or not chunk.content:
+                    continue
+                for task in parser.feed(chunk.content):
+                    logger.info(f"解析出任务 {task.get('id')}: {task.get('task')}")
+                    yield task
+        except Exception as e:
+            logger.error(f"流式任务规划过程出错: {str(e)}", exc_info=True)
+
+        if parser.tasks:
+            if not parser.complete:
+                logger.warning(f"任务计划不完整，仅使用已解析的 {len(parser.tasks)} 个任务: {parser.error or '流提前结束'}")
+            PIPELINE_METRICS.record_structured_output(
+                "planner", "parsed" if parser.complete and not parser.repaired else "repaired"
+            )
+            logger.info(f"流式任务计划完成，包含 {len(parser.tasks)} 个任务")
+            return
+
+        logger.error(f"流式任务计划没有解析出任务: {parser.error or '未找到 tasks 数组'}")
+        logger.debug(f"导致错误的响应内容: {parser.text}")
+        for task in (await cls._get_fallback_plan(user_request))["tasks"]:
+            yield task
+
     @classmethod
     async def _get_fallback_plan(cls, user_request: str) -> Dict[str, Any]:
         """
         生成降级方案 - 异步版本
         """
         logger.warning("使用降级方案处理请求")
+        PIPELINE_METRICS.record_structured_output("planner", "fallback")
         return {
             "tasks": [
                 {
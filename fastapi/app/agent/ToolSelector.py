@@ -3,12 +3,15 @@ import logging
 from logging.handlers import RotatingFileHandler
 from typing import Dict, Any
 
-from ..services.llm_service import LLMService, MAIN_AGENT_MODEL
-from ..services.campus_tool_hub import CampusToolHub
+from .PromptTemplates import SELECTOR_PROMPT, selector_messages
+from .StructuredOutput import StructuredOutputError, parse_tool_selections
+from ..services.llm_service import LLMService, MAIN_AGENT_MODEL, log_prompt_cache_usage
+from ..services.pipeline_metrics import PIPELINE_METRICS
 from ..services.mcp_server import Server, Tool, Configuration
 from ..services.server_manager import ServerManager
 from ..services.student_profile_service import format_student_profile_for_prompt
-from ..skills import SkillRegistry
+from ..services.tool_catalog import ToolCatalogService
+from ..services.tool_index import TOOL_RETRIEVAL_MIN_CATALOG
 import os
 
 logger = logging.getLogger(__name__)
@@ -30,54 +33,6 @@ class ToolSelector:
     Component that selects appropriate API tools for each task - FastAPI async version
     """
     
-    # System prompt for tool selection
-    TOOL_SELECTION_PROMPT = """你是浙江农林大学智能校园系统的工具选择器。你需要为每个任务选择最合适的工具。
-    
-<可用工具及其能力>
-{tool_capabilities}
-</可用工具及其能力>
-
-任务计划：
-{task_plan}
-
-当前用户画像：
-{student_profile}
-
-请为每个任务选择最合适的工具，并以下格式返回工具选择方案：
-
-{{
-  "tool_selections": [
-    {{
-      "task_id": 1,
-      "tool": "最适合处理此任务的工具名称",
-      "params": {{
-        "param1": "值1",
-        "param2": "值2"
-      }},
-      "reason": "选择该工具的简短理由"
-    }},
-    {{
-      "task_id": 2,
-      "tool": "最适合处理此任务的工具名称",
-      "params": {{
-        "param1": "值1",
-        "param2": "值2"
-      }},
-      "reason": "选择该工具的简短理由"
-    }}
-  ]
-}}
-
-规则：
-1. 为每个任务选择一个最合适的API工具
-2. 确保提供该工具所需的所有必要参数
-3. 可以提供可选参数以提高结果准确性
-4. 参数值应基于任务描述和用户请求提取
-5. 如果必要参数在用户请求中不清楚，使用合理的默认值并在reason中说明
-6. 如果任务非常一般，可以选择general_assistant工具
-7. 如果任务依赖于其他任务的结果，可以使用占位符格式：{{TASK_X_RESULT}}，其中X是任务ID，key是结果中的键
-    """
-    
     @classmethod
     async def select_tools_for_tasks(cls, task_plan: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -93,63 +48,48 @@ class ToolSelector:
         logger.debug(f"输入的任务计划: {json.dumps(task_plan, ensure_ascii=False)}")
         
         try:
-            all_tools = []
             try:
-                # get the server manager instance
-                server_manager = await ServerManager.get_instance()
-
-                # get all tools from all the servers - using the cached tools (not async)
-                all_tools = ServerManager.get_cached_tools()
-                
-                # If cached tools are empty, try to get them directly
-                if not all_tools:
-                    logger.warning("缓存的工具列表为空，尝试直接从服务器获取工具列表")
-                    all_tools = await server_manager.list_all_tools()
+                # 确保 MCP 服务已初始化，工具列表在初始化时缓存
+                await ServerManager.get_instance()
             except Exception as server_error:
                 logger.warning(f"MCP工具初始化失败，仅使用本地skill: {str(server_error)}")
-                
-            skill_tools = SkillRegistry.list_tools()
-            all_tools = [*all_tools, *skill_tools]
-            logger.debug(f"获取到 {len(all_tools)} 个工具，其中本地 skill {len(skill_tools)} 个")
-            logger.debug("生成工具选择提示词")
-            builtin_tools_description = await CampusToolHub.get_tool_info_for_planner()
-            discovered_tools_description = "\n".join([tool.format_for_llm() for tool in all_tools])
-            tools_description = "\n".join(
-                item
-                for item in [builtin_tools_description, discovered_tools_description]
-                if item
-            )
+
+            # 工具目录只在 MCP 服务、skill 或内置工具变化时重建
+            catalog = await ToolCatalogService.current()
+            logger.debug(f"工具目录 version={catalog.version} hash={catalog.cache_key}, 共 {len(catalog.tools)} 个工具")
+            candidate_description = None
+            if len(catalog.tools) > TOOL_RETRIEVAL_MIN_CATALOG:
+                # 工具较多时只给出按任务检索到的候选工具，system 中保留内置工具，前缀仍可命中缓存
+                candidates = catalog.index.retrieve_for_plan(task_plan)
+                logger.info(f"从 {len(catalog.tools)} 个工具中检索到 {len(candidates)} 个候选工具: {[tool.name for tool in candidates]}")
+                candidate_description = "\n".join(tool.format_for_llm() for tool in candidates)
+                tools_description = catalog.builtin_text
+            else:
+                tools_description = catalog.text
                 
             # Create selection prompt
             logger.debug("生成工具选择提示词")
-            prompt = cls.TOOL_SELECTION_PROMPT.format(
-                tool_capabilities=tools_description,
-                task_plan=json.dumps(task_plan, ensure_ascii=False, indent=2),
-                student_profile=format_student_profile_for_prompt(),
+            messages = selector_messages(
+                task_plan,
+                tools_description,
+                format_student_profile_for_prompt(),
+                candidate_tools=candidate_description,
             )
-            logger.debug(f"提示词长度: {len(prompt)} 字符")
+            logger.debug(f"提示词长度: {sum(len(item['content']) for item in messages)} 字符, 模板: {SELECTOR_PROMPT.key}")
             
             # Use selection LLM to select tools
             logger.info("初始化工具选择 LLM 模型")
-            llm = await LLMService.get_llm(model_name=MAIN_AGENT_MODEL, temperature=0.1)
+            llm = await LLMService.get_llm(model_name=MAIN_AGENT_MODEL, temperature=0.1, json_mode=True)
             
             logger.info("向 LLM 发送工具选择请求")
-            selection_response = await llm.ainvoke([
-                {"role": "system", "content": prompt}
-            ])
+            selection_response = await llm.ainvoke(messages)
             logger.debug("已收到 LLM 响应")
+            log_prompt_cache_usage("selector", selection_response, f"{SELECTOR_PROMPT.key}#{catalog.cache_key}")
             
-            # Extract JSON from response
+            # 严格解析失败时先本地修复，再按 ToolSelectionPlan 校验
             response_text = selection_response.content
-            json_match = response_text.strip()
             logger.debug("开始解析工具选择响应")
-            
-            # Parse the selections
-            if "```json" in json_match:
-                logger.debug("检测到 JSON 代码块，进行提取")
-                json_match = json_match.split("```json")[1].split("```")[0]
-            
-            tool_selections = json.loads(json_match)
+            tool_selections = parse_tool_selections(response_text)
             num_selections = len(tool_selections.get("tool_selections", []))
             logger.info(f"成功生成工具选择方案，共 {num_selections} 个工具选择")
             logger.debug(f"工具选择详情: {json.dumps(tool_selections, ensure_ascii=False, indent=2)}")
@@ -162,8 +102,8 @@ class ToolSelector:
             
             return tool_selections
             
-        except json.JSONDecodeError as je:
-            logger.error(f"工具选择 JSON 解析错误: {str(je)}")
+        except StructuredOutputError as se:
+            logger.error(f"工具选择解析错误: {str(se)}")
             logger.debug(f"导致解析错误的响应内容: {response_text}")
             return await cls._get_default_selections(task_plan)
         except Exception as e:
@@ -176,6 +116,7 @@ class ToolSelector:
         生成默认的工具选择方案 - 异步版本
         """
         logger.warning("使用默认工具选择方案")
+        PIPELINE_METRICS.record_structured_output("selector", "fallback")
         default_selections = {
             "tool_selections": [
                 {
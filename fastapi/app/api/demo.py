@@ -1,11 +1,12 @@
 import os
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
+from app.api.pagination import MESSAGE_PAGE_SIZE, SESSION_PAGE_SIZE, keyset_paginate, split_page
 from app.db import models
 from app.db.session import get_db
 from app.core.env import load_app_env
@@ -33,23 +34,31 @@ def serialize_session(session: models.ChatSession) -> dict[str, Any]:
     }
 
 
-def serialize_message(message: models.ChatMessage) -> dict[str, Any]:
-    process_info = message.process_infos
-    return {
+def serialize_message(message: models.ChatMessage, include_process_info: bool = True) -> dict[str, Any]:
+    data = {
         "id": message.id,
         "content": message.content,
         "is_user": message.is_user,
         "created_at": message.created_at.isoformat() if message.created_at else None,
         "session_id": message.session_id,
-        "process_info": {
-            "steps": process_info.steps,
-            "task_plan": process_info.task_plan,
-            "tool_selection": process_info.tool_selections,
-            "task_results": process_info.task_results,
-        }
-        if process_info
-        else None,
     }
+    if include_process_info:
+        process_info = message.process_infos
+        data["process_info"] = (
+            {
+                "steps": process_info.steps,
+                "task_plan": process_info.task_plan,
+                "tool_selection": process_info.tool_selections,
+                "task_results": process_info.task_results,
+            }
+            if process_info
+            else None
+        )
+    return data
+
+
+def parse_include(include: str | None) -> set[str]:
+    return {field.strip() for field in (include or "").split(",") if field.strip()}
 
 
 @router.get("/csrf/")
@@ -86,15 +95,22 @@ async def llm_config_status():
 
 @router.get("/chat/sessions/")
 async def list_sessions(
+    limit: int = Query(SESSION_PAGE_SIZE, ge=1, le=200),
+    cursor: str | None = None,
     db: AsyncSession = Depends(get_db),
     access: AccessPrincipal = Depends(current_access),
 ):
     result = await db.execute(
-        select(models.ChatSession)
-        .where(models.ChatSession.user_id == access.user_id)
-        .order_by(models.ChatSession.updated_at.desc())
+        keyset_paginate(
+            select(models.ChatSession).where(models.ChatSession.user_id == access.user_id),
+            models.ChatSession.updated_at,
+            models.ChatSession.id,
+            limit,
+            cursor,
+        )
     )
-    return ok([serialize_session(session) for session in result.scalars().all()])
+    sessions, next_cursor = split_page(result.all(), limit)
+    return ok([serialize_session(session) for session in sessions], next_cursor=next_cursor)
 
 
 @router.post("/chat/sessions/")
@@ -112,20 +128,32 @@ async def create_session(
 @router.get("/chat/sessions/{session_id}/messages/")
 async def list_messages(
     session_id: str,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=500),
+    cursor: str | None = None,
+    include: str | None = Query(None, description="逗号分隔的可选字段，目前支持 process_info"),
     db: AsyncSession = Depends(get_db),
     access: AccessPrincipal = Depends(current_access),
 ):
-    result = await db.execute(
+    # 从最新的消息往前翻页，next_cursor 指向更早的消息；每页内仍按时间正序返回
+    include_process_info = "process_info" in parse_include(include)
+    query = (
         select(models.ChatMessage)
         .join(models.ChatSession)
-        .options(selectinload(models.ChatMessage.process_infos))
         .where(
             models.ChatMessage.session_id == session_id,
             models.ChatSession.user_id == access.user_id,
         )
-        .order_by(models.ChatMessage.created_at)
     )
-    return ok([serialize_message(message) for message in result.scalars().all()])
+    if include_process_info:
+        query = query.options(selectinload(models.ChatMessage.process_infos))
+    result = await db.execute(
+        keyset_paginate(query, models.ChatMessage.created_at, models.ChatMessage.id, limit, cursor)
+    )
+    messages, next_cursor = split_page(result.all(), limit)
+    return ok(
+        [serialize_message(message, include_process_info) for message in reversed(messages)],
+        next_cursor=next_cursor,
+    )
 
 
 @router.get("/chat/sessions/{session_id}/documents/")
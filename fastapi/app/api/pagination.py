@@ -0,0 +1,92 @@
+"""
+基于 ``(时间戳, id)`` 游标的 keyset 分页。
+
+游标中的时间戳保存数据库里的原始文本而不是 Python datetime：SQLite 中由
+``CURRENT_TIMESTAMP`` 写入的时间不带微秒，而 SQLAlchemy 绑定 datetime 时总会带上
+微秒，两者按文本比较会把边界行重复返回。
+"""
+import base64
+import binascii
+import json
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import String, tuple_, type_coerce
+from sqlalchemy.sql import Select
+
+
+# 未传 limit 时的默认页大小
+SESSION_PAGE_SIZE = 50
+MESSAGE_PAGE_SIZE = 100
+
+
+def encode_cursor(timestamp: str, key: Any) -> str:
+    raw = json.dumps([timestamp, key], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, key = json.loads(base64.urlsafe_b64decode(padded).decode("utf-8"))
+        if not isinstance(timestamp, str) or not isinstance(key, (int, str)):
+            raise ValueError("invalid cursor values")
+        return timestamp, key
+    except (binascii.Error, TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise HTTPException(status_code=400, detail="分页游标无效") from exc
+
+
+def keyset_paginate(
+    query: Select,
+    timestamp_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    descending: bool = True,
+) -> Select:
+    """
+    为查询追加 keyset 条件、排序和 limit
+
+    查询会多取一行用于判断是否还有下一页，并在每行末尾追加原始时间戳文本，
+    结果交给 ``split_page`` 处理。
+
+    Args:
+        query: 已包含过滤条件的查询
+        timestamp_column: 排序用的时间列
+        id_column: 同一时间下的次级排序列
+        limit: 每页数量
+        cursor: 上一页返回的游标
+        descending: 是否按时间倒序
+
+    Returns:
+        分页后的查询
+    """
+    raw_timestamp = type_coerce(timestamp_column, String)
+    query = query.add_columns(raw_timestamp.label("cursor_timestamp"))
+    if cursor:
+        timestamp, key = decode_cursor(cursor)
+        position = tuple_(raw_timestamp, id_column)
+        boundary = tuple_(timestamp, key)
+        query = query.where(position < boundary if descending else position > boundary)
+
+    if descending:
+        query = query.order_by(timestamp_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(timestamp_column, id_column)
+    return query.limit(limit + 1)
+
+
+def split_page(
+    rows: Sequence[Any],
+    limit: int,
+    key_of: Callable[[Any], Any] = lambda item: item.id,
+) -> Tuple[List[Any], Optional[str]]:
+    """把 ``keyset_paginate`` 查询的结果拆成本页数据与下一页游标"""
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [row[0] for row in rows]
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1][-1], key_of(items[-1]))
+    return items, next_cursor
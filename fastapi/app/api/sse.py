@@ -0,0 +1,140 @@
+"""
+SSE 帧编码。
+
+事件用 orjson 序列化，pydantic 模型与 MCP 结果对象（如 ``CallToolResult``）
+经 ``default`` 钩子转换；token 帧按固定模板拼接，不为每个 token 构造字典。
+编码结果直接是 bytes，StreamingResponse 无需再做一次 UTF-8 编码。
+
+``coalesce_tokens`` 按字符数与时间窗口合并细碎的 token，通过
+``SSE_COALESCE_MAX_CHARS``、``SSE_COALESCE_MAX_DELAY_MS`` 配置。
+"""
+import asyncio
+import contextlib
+import os
+from typing import Any, AsyncIterator, List, Optional
+
+import orjson
+
+
+FRAME_PREFIX = b"data: "
+FRAME_END = b"\n\n"
+TOKEN_FRAME_PREFIX = b'data: {"content":'
+TOKEN_FRAME_END = b"}\n\n"
+
+# 与 json.dumps 一致，允许整数等非字符串字典键
+_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+SSE_COALESCE_MAX_CHARS = int(os.getenv("SSE_COALESCE_MAX_CHARS", "32"))
+SSE_COALESCE_MAX_DELAY_MS = float(os.getenv("SSE_COALESCE_MAX_DELAY_MS", "50"))
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "__dict__"):
+        return obj.__dict__
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=_OPTIONS)
+
+
+def encode_event(event: Any) -> bytes:
+    """编码一条流水线事件帧"""
+    return FRAME_PREFIX + dumps(event) + FRAME_END
+
+
+def encode_token(chunk: str) -> bytes:
+    """编码一条 ``{"content": chunk}`` token 帧"""
+    return TOKEN_FRAME_PREFIX + orjson.dumps(chunk) + TOKEN_FRAME_END
+
+
+_DONE = object()
+
+
+async def coalesce_tokens(
+    chunks: AsyncIterator[Any],
+    max_chars: int = SSE_COALESCE_MAX_CHARS,
+    max_delay_ms: float = SSE_COALESCE_MAX_DELAY_MS,
+) -> AsyncIterator[Any]:
+    """
+    合并细碎的 token，减少 SSE 帧与写入次数
+
+    第一个非空 token 立即输出；之后的 token 先缓存，累计达到 ``max_chars``
+    个字符或距缓存第一个 token 超过 ``max_delay_ms`` 毫秒时一起输出。
+    上游在独立任务中迭代，上游停顿时已缓存的内容仍会按时输出。
+    上游中夹杂的非字符串项（如流水线事件）先输出已缓存的 token 再原样输出，
+    保持先后顺序。
+
+    Args:
+        chunks: 上游 token 流，可夹杂事件
+        max_chars: 缓存字符数上限，小于等于 1 时不合并
+        max_delay_ms: 缓存时间上限（毫秒）
+    """
+    if max_chars <= 1:
+        async for chunk in chunks:
+            if chunk:
+                yield chunk
+        return
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce() -> None:
+        try:
+            async for chunk in chunks:
+                if chunk:
+                    queue.put_nowait(chunk)
+        except Exception as exc:
+            queue.put_nowait(exc)
+        finally:
+            queue.put_nowait(_DONE)
+
+    producer = asyncio.create_task(produce())
+    buffer: List[str] = []
+    size = 0
+    deadline: Optional[float] = None
+    first = True
+    try:
+        while True:
+            if deadline is None:
+                item = await queue.get()
+            else:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    yield "".join(buffer)
+                    buffer, size, deadline = [], 0, None
+                    continue
+
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            if not isinstance(item, str):
+                if buffer:
+                    yield "".join(buffer)
+                    buffer, size, deadline = [], 0, None
+                yield item
+                continue
+            if first:
+                first = False
+                yield item
+                continue
+
+            buffer.append(item)
+            size += len(item)
+            if deadline is None:
+                deadline = loop.time() + max_delay_ms / 1000
+            if size >= max_chars:
+                yield "".join(buffer)
+                buffer, size, deadline = [], 0, None
+
+        if buffer:
+            yield "".join(buffer)
+    finally:
+        if not producer.done():
+            producer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await producer
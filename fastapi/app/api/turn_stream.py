@@ -0,0 +1,222 @@
+"""
+可续传的 SSE 对话轮次。
+
+每轮回复在后台任务中生成，编码好的帧按序编号写入有界环形缓冲，并带上
+``id: <turn_id>:<seq>`` 行。客户端断线后携带 ``Last-Event-ID`` 重连，从缓冲中
+续传之后的帧，不再重新执行智能体流程，也不重复扣减调用次数。
+生成结束后缓冲保留一段时间再清理。
+
+所有订阅者都断开且超过宽限期仍无人重连时，取消生成任务；取消沿 await 链传到
+任务规划、工具调用与 LLM 流式请求，上游 HTTP 请求随之中止。
+
+缓冲在进程内存中，多 worker 部署时续传请求需落在同一 worker，否则按过期处理。
+通过 ``SSE_REPLAY_BUFFER_SIZE``、``SSE_REPLAY_TTL_SECONDS``、
+``SSE_ABANDON_GRACE_SECONDS``、``SSE_DISCONNECT_POLL_SECONDS`` 配置。
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+SSE_REPLAY_BUFFER_SIZE = int(os.getenv("SSE_REPLAY_BUFFER_SIZE", "2048"))
+SSE_REPLAY_TTL_SECONDS = float(os.getenv("SSE_REPLAY_TTL_SECONDS", "300"))
+SSE_ABANDON_GRACE_SECONDS = float(os.getenv("SSE_ABANDON_GRACE_SECONDS", "15"))
+SSE_DISCONNECT_POLL_SECONDS = float(os.getenv("SSE_DISCONNECT_POLL_SECONDS", "1"))
+
+TURN_ID_HEADER = "X-Turn-Id"
+
+
+class ReplayGap(Exception):
+    """请求续传的帧已被环形缓冲淘汰"""
+
+
+def format_event_id(turn_id: str, seq: int) -> str:
+    return f"{turn_id}:{seq}"
+
+
+def parse_event_id(value: str) -> Optional[Tuple[str, int]]:
+    """解析 ``<turn_id>:<seq>``，格式不正确时返回 None"""
+    turn_id, sep, seq = value.strip().rpartition(":")
+    if not sep or not turn_id or not seq.isdigit():
+        return None
+    return turn_id, int(seq)
+
+
+class TurnStream:
+    """一轮回复的帧缓冲，可被多次订阅"""
+
+    def __init__(
+        self,
+        turn_id: str,
+        user_id: int,
+        session_id: str,
+        maxlen: int,
+        abandon_after: float = SSE_ABANDON_GRACE_SECONDS,
+    ) -> None:
+        self.turn_id = turn_id
+        self.user_id = user_id
+        self.session_id = session_id
+        self.abandon_after = abandon_after
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        self._frames: Deque[Tuple[int, bytes]] = deque(maxlen=maxlen)
+        self._seq = 0
+        self._changed = asyncio.Event()
+        self._abandon_timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def append(self, frame: bytes) -> None:
+        self._seq += 1
+        event_id = format_event_id(self.turn_id, self._seq).encode()
+        self._frames.append((self._seq, b"id: " + event_id + b"\n" + frame))
+        self._notify()
+
+    def finish(self) -> None:
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._cancel_abandon_timer()
+        self._notify()
+
+    def cancel(self) -> None:
+        """取消仍在进行的生成任务"""
+        if self.task is not None and not self.task.done():
+            logger.info(f"客户端已断开，取消生成: turn={self.turn_id} seq={self._seq}")
+            self.task.cancel()
+
+    def can_replay(self, after: int) -> bool:
+        """``after`` 之后的帧是否都还在缓冲中"""
+        if after > self._seq:
+            return False
+        oldest = self._frames[0][0] if self._frames else self._seq + 1
+        return after >= oldest - 1
+
+    async def subscribe(
+        self,
+        after: int = 0,
+        is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        poll_interval: float = SSE_DISCONNECT_POLL_SECONDS,
+    ) -> AsyncIterator[bytes]:
+        """
+        依次输出序号大于 ``after`` 的帧，追上后等待新帧，直到本轮结束
+
+        Args:
+            after: 已收到的最后一帧序号
+            is_disconnected: 检测客户端是否断开，等待新帧期间每 ``poll_interval`` 秒检查一次
+            poll_interval: 断开检测间隔（秒）
+
+        Raises:
+            ReplayGap: 需要的帧已被淘汰
+        """
+        self._attach()
+        try:
+            if not self.can_replay(after):
+                raise ReplayGap(format_event_id(self.turn_id, after))
+            while True:
+                # 序号连续，按与最早保留帧的偏移直接定位，不复制也不从头扫描缓冲；
+                # yield 期间缓冲可能写入或淘汰帧，因此每帧都重新检查
+                while after < self._seq:
+                    if not self.can_replay(after):
+                        raise ReplayGap(format_event_id(self.turn_id, after))
+                    after += 1
+                    yield self._frames[after - self._frames[0][0]][1]
+                if self.done:
+                    return
+                if is_disconnected is None:
+                    await self._changed.wait()
+                    continue
+                try:
+                    await asyncio.wait_for(self._changed.wait(), poll_interval)
+                except asyncio.TimeoutError:
+                    if await is_disconnected():
+                        return
+        finally:
+            self._detach()
+
+    def _attach(self) -> None:
+        self.subscribers += 1
+        self._cancel_abandon_timer()
+
+    def _detach(self) -> None:
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done:
+            self._abandon_timer = asyncio.get_running_loop().call_later(self.abandon_after, self.cancel)
+
+    def _cancel_abandon_timer(self) -> None:
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+            self._abandon_timer = None
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class TurnRegistry:
+    """进程内的对话轮次表"""
+
+    def __init__(
+        self,
+        maxlen: int = SSE_REPLAY_BUFFER_SIZE,
+        ttl_seconds: float = SSE_REPLAY_TTL_SECONDS,
+        abandon_after: float = SSE_ABANDON_GRACE_SECONDS,
+    ) -> None:
+        self.maxlen = maxlen
+        self.ttl_seconds = ttl_seconds
+        self.abandon_after = abandon_after
+        self._turns: Dict[str, TurnStream] = {}
+
+    def start(self, frames: AsyncIterator[bytes], user_id: int, session_id: str) -> TurnStream:
+        """在后台任务中消费 ``frames``，返回可订阅的轮次"""
+        self.sweep()
+        turn = TurnStream(uuid.uuid4().hex, user_id, session_id, self.maxlen, self.abandon_after)
+        self._turns[turn.turn_id] = turn
+        turn.task = asyncio.create_task(self._drive(turn, frames))
+        return turn
+
+    def get(self, turn_id: str, user_id: int) -> Optional[TurnStream]:
+        self.sweep()
+        turn = self._turns.get(turn_id)
+        if turn is None or turn.user_id != user_id:
+            return None
+        return turn
+
+    def sweep(self) -> None:
+        """清理结束超过 TTL 的轮次"""
+        deadline = time.monotonic() - self.ttl_seconds
+        expired = [
+            turn_id
+            for turn_id, turn in self._turns.items()
+            if turn.finished_at is not None and turn.finished_at <= deadline
+        ]
+        for turn_id in expired:
+            del self._turns[turn_id]
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    @staticmethod
+    async def _drive(turn: TurnStream, frames: AsyncIterator[bytes]) -> None:
+        try:
+            async for frame in frames:
+                turn.append(frame)
+        except asyncio.CancelledError:
+            logger.info(f"对话流已取消: turn={turn.turn_id}")
+            raise
+        except Exception as e:
+            logger.error(f"生成对话流失败: turn={turn.turn_id} {str(e)}", exc_info=True)
+        finally:
+            turn.finish()
+
+
+TURN_STREAMS = TurnRegistry()
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import logging
+import re
 
 from ...db.session import get_db
 from ...schemas import agent_data as schemas
 from ...services.agent_data_service import AgentDataService
+from ...services.blob_store import BlobNotFound
 from ...services.access_service import AccessPrincipal, current_access
 
 router = APIRouter()
@@ -31,9 +34,74 @@ async def create_agent_data(
         raise HTTPException(status_code=500, detail="创建AgentData失败")
 
 
+def _batch_response(action: str, data=None, ids=None, failures=None) -> schemas.AgentDataBatchResponse:
+    data = data or []
+    ids = ids or [item.id for item in data]
+    failures = failures or []
+    if not failures:
+        status = "success"
+    elif ids:
+        status = "partial"
+    else:
+        status = "error"
+    return schemas.AgentDataBatchResponse(
+        status=status,
+        message=f"{action}成功 {len(ids)} 条，失败 {len(failures)} 条",
+        data=[schemas.AgentData.model_validate(item) for item in data],
+        ids=ids,
+        failures=failures,
+    )
+
+
+@router.post("/batch", response_model=schemas.AgentDataBatchResponse)
+async def create_agent_data_batch(
+    payload: schemas.AgentDataBatchCreate,
+    db: AsyncSession = Depends(get_db),
+    access: AccessPrincipal = Depends(current_access),
+):
+    """在一个事务中批量创建AgentData，失败的条目在 failures 中逐条返回"""
+    try:
+        created, failures = await AgentDataService.create_agent_data_batch(db, payload.items, access.user_id)
+        return _batch_response("创建", data=created, failures=failures)
+    except Exception as e:
+        logger.error(f"批量创建AgentData失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="批量创建AgentData失败")
+
+
+@router.put("/batch", response_model=schemas.AgentDataBatchResponse)
+async def update_agent_data_batch(
+    payload: schemas.AgentDataBatchUpdate,
+    db: AsyncSession = Depends(get_db),
+    access: AccessPrincipal = Depends(current_access),
+):
+    """在一个事务中批量更新AgentData，失败的条目在 failures 中逐条返回"""
+    try:
+        updated, failures = await AgentDataService.update_agent_data_batch(db, payload.items, access.user_id)
+        return _batch_response("更新", data=updated, failures=failures)
+    except Exception as e:
+        logger.error(f"批量更新AgentData失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="批量更新AgentData失败")
+
+
+@router.post("/batch/delete", response_model=schemas.AgentDataBatchResponse)
+async def delete_agent_data_batch(
+    payload: schemas.AgentDataBatchDelete,
+    db: AsyncSession = Depends(get_db),
+    access: AccessPrincipal = Depends(current_access),
+):
+    """批量删除AgentData，不存在的ID在 failures 中逐条返回"""
+    try:
+        deleted, failures = await AgentDataService.delete_agent_data_batch(db, payload.ids, access.user_id)
+        return _batch_response("删除", ids=deleted, failures=failures)
+    except Exception as e:
+        logger.error(f"批量删除AgentData失败: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail="批量删除AgentData失败")
+
+
 @router.get("/{agent_data_id}", response_model=schemas.AgentDataResponse)
 async def get_agent_data(
     agent_data_id: str,
+    inline: bool = Query(False, description="是否内联返回外置到 blob 存储的内容"),
     db: AsyncSession = Depends(get_db),
     access: AccessPrincipal = Depends(current_access),
 ):
@@ -43,9 +111,12 @@ async def get_agent_data(
         if not db_agent_data:
             raise HTTPException(status_code=404, detail="AgentData不存在")
         
+        data = schemas.AgentData.from_orm(db_agent_data)
+        if inline and db_agent_data.content_ref:
+            data.content = await AgentDataService.load_content(db_agent_data)
         return schemas.AgentDataResponse(
             status="success",
-            data=schemas.AgentData.from_orm(db_agent_data)
+            data=data
         )
     except HTTPException:
         raise
@@ -54,6 +125,57 @@ async def get_agent_data(
         raise HTTPException(status_code=500, detail="获取AgentData失败")
 
 
+def _parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """解析单段 Range 请求头，返回闭区间 (start, end)；不支持多段区间"""
+    if not header:
+        return None
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        raise HTTPException(status_code=416, detail="无效的Range请求", headers={"Content-Range": f"bytes */{size}"})
+    first, last = match.groups()
+    if first == "":
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range超出内容范围", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+@router.get("/{agent_data_id}/content")
+async def get_agent_data_content(
+    agent_data_id: str,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    access: AccessPrincipal = Depends(current_access),
+):
+    """流式返回AgentData的完整内容，支持单段 Range 请求"""
+    db_agent_data = await AgentDataService.get_agent_data_by_id(db, agent_data_id, access.user_id)
+    if not db_agent_data:
+        raise HTTPException(status_code=404, detail="AgentData不存在")
+
+    try:
+        size, read_range = AgentDataService.open_content(db_agent_data)
+    except BlobNotFound:
+        logger.error(f"AgentData {agent_data_id} 引用的内容 {db_agent_data.content_ref} 不存在")
+        raise HTTPException(status_code=404, detail="内容不存在")
+    media_type = db_agent_data.content_type or "application/json"
+
+    headers = {"Accept-Ranges": "bytes"}
+    if db_agent_data.content_ref:
+        headers["ETag"] = f'"{db_agent_data.content_ref}"'
+    byte_range = _parse_range(request.headers.get("range"), size) if size else None
+    if byte_range is None:
+        start, end, status_code = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(read_range(start, end), status_code=status_code, media_type=media_type, headers=headers)
+
+
 @router.get("/", response_model=schemas.AgentDataListResponse)
 async def get_agent_data_list(
     skip: int = Query(0, ge=0, description="跳过的记录数"),
@@ -65,8 +187,8 @@ async def get_agent_data_list(
 ):
     """获取AgentData列表"""
     try:
-        # 获取数据列表
-        agent_data_list = await AgentDataService.get_agent_data_list(
+        # 列表与总数在同一条查询中获取，关联关系不序列化，不加载
+        agent_data_list, total = await AgentDataService.get_agent_data_page(
             db=db,
             skip=skip,
             limit=limit,
@@ -75,14 +197,6 @@ async def get_agent_data_list(
             data_type=data_type
         )
         
-        # 获取总数
-        total = await AgentDataService.get_agent_data_count(
-            db=db,
-            user_id=access.user_id,
-            session_id=session_id,
-            data_type=data_type
-        )
-        
         return schemas.AgentDataListResponse(
             status="success",
             data=[schemas.AgentData.from_orm(item) for item in agent_data_list],
@@ -104,15 +218,12 @@ async def update_agent_data(
 ):
     """更新AgentData"""
     try:
-        # 检查AgentData是否存在
-        existing_agent_data = await AgentDataService.get_agent_data_by_id(db, agent_data_id, access.user_id)
-        if not existing_agent_data:
-            raise HTTPException(status_code=404, detail="AgentData不存在")
-        
-        # 更新AgentData
+        # UPDATE ... RETURNING 同时完成存在性检查
         updated_agent_data = await AgentDataService.update_agent_data(
             db, agent_data_id, agent_data_update, access.user_id
         )
+        if not updated_agent_data:
+            raise HTTPException(status_code=404, detail="AgentData不存在")
         
         return schemas.AgentDataResponse(
             status="success",
@@ -134,15 +245,10 @@ async def delete_agent_data(
 ):
     """删除AgentData"""
     try:
-        # 检查AgentData是否存在
-        existing_agent_data = await AgentDataService.get_agent_data_by_id(db, agent_data_id, access.user_id)
-        if not existing_agent_data:
-            raise HTTPException(status_code=404, detail="AgentData不存在")
-        
-        # 删除AgentData
+        # 删除条数为 0 说明不存在或不属于当前用户
         success = await AgentDataService.delete_agent_data(db, agent_data_id, access.user_id)
         if not success:
-            raise HTTPException(status_code=500, detail="删除AgentData失败")
+            raise HTTPException(status_code=404, detail="AgentData不存在")
         
         return schemas.AgentDataResponse(
             status="success",
@@ -1,5 +1,4 @@
 import os
-from collections import defaultdict
 from datetime import datetime, timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, Request, Response
@@ -16,14 +15,15 @@ from app.services.access_service import (
     current_access,
     hash_trial_token,
 )
+from app.services.rate_limit_service import create_login_rate_limiter
 
 
 router = APIRouter()
-FAILED_ATTEMPTS: dict[str, list[datetime]] = defaultdict(list)
 MAX_FAILED_ATTEMPTS = int(os.getenv("MAX_FAILED_ACCESS_ATTEMPTS", "5"))
 FAILED_ATTEMPT_WINDOW = timedelta(
     minutes=int(os.getenv("FAILED_ACCESS_WINDOW_MINUTES", "15"))
 )
+LOGIN_RATE_LIMITER = create_login_rate_limiter(MAX_FAILED_ATTEMPTS, FAILED_ATTEMPT_WINDOW)
 
 
 class AccessCodeRequest(BaseModel):
@@ -38,11 +38,7 @@ async def login(
     db: AsyncSession = Depends(get_db),
 ):
     client_ip = (request.headers.get("X-Forwarded-For") or request.client.host).split(",")[0].strip()
-    cutoff = datetime.utcnow() - FAILED_ATTEMPT_WINDOW
-    FAILED_ATTEMPTS[client_ip] = [
-        attempt for attempt in FAILED_ATTEMPTS[client_ip] if attempt > cutoff
-    ]
-    if len(FAILED_ATTEMPTS[client_ip]) >= MAX_FAILED_ATTEMPTS:
+    if await LOGIN_RATE_LIMITER.is_limited(client_ip):
         raise HTTPException(status_code=429, detail="访问码尝试次数过多，请稍后再试")
 
     result = await db.execute(
@@ -53,12 +49,12 @@ async def login(
     access = result.scalars().first()
     now = datetime.utcnow()
     if not access or not access.is_active or access.expires_at <= now:
-        FAILED_ATTEMPTS[client_ip].append(now)
+        await LOGIN_RATE_LIMITER.record_failure(client_ip)
         raise HTTPException(status_code=401, detail="访问码错误或已过期")
     if access.calls_used >= access.max_calls:
         raise HTTPException(status_code=429, detail="该访问码的试用调用额度已用完")
 
-    FAILED_ATTEMPTS.pop(client_ip, None)
+    await LOGIN_RATE_LIMITER.reset(client_ip)
 
     response.set_cookie(
         key=COOKIE_NAME,
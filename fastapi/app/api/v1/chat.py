@@ -1,43 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response
 from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Dict, Any, Optional
+from sqlalchemy.orm import selectinload
+from typing import Callable, List, Dict, Optional
 import json
 import logging
 import asyncio
-from ...db.session import get_db
+import time
+from ...db.session import async_session, get_db
 from ...db import models
+from ..pagination import MESSAGE_PAGE_SIZE, SESSION_PAGE_SIZE, keyset_paginate, split_page
+from ..sse import coalesce_tokens, dumps, encode_event, encode_token
+from ..turn_stream import TURN_ID_HEADER, TURN_STREAMS, parse_event_id
 from ...schemas import chat as schemas
-from ...agent.LLMController import get_process_info
+from ...agent.LLMController import ProcessInfoRecorder, get_process_info
+from ...agent.SpeculativeResponder import SPECULATIVE_RESPONSE_ENABLED, SpeculativeResponder
 from ...agent.ResponseGenerator import ResponseGenerator
 from ...services.chat_history_manager import ChatHistoryManager
 from ...services.access_service import AccessPrincipal, consume_call, current_access
-import pydantic
-
-# Custom JSON encoder to handle CallToolResult and other non-serializable types
-class CustomJSONEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if hasattr(obj, 'model_dump'):
-            # Handle pydantic models
-            return obj.model_dump()
-        elif hasattr(obj, '__dict__'):
-            # Handle custom classes with __dict__
-            return obj.__dict__
-        # Let the base class handle the rest or raise TypeError
-        return super().default(obj)
+from ...services.pipeline_metrics import PIPELINE_METRICS
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+EXPORT_BATCH_SIZE = 500
+
 @router.post("/", response_model=schemas.ChatResponse)
 async def chat(
     request: schemas.ChatRequest, 
-    db: AsyncSession = Depends(get_db),
+    http_request: Request,
     access: AccessPrincipal = Depends(current_access),
+    last_event_id: Optional[str] = Header(None),
 ):
     """
     处理用户的聊天请求，加工用户的信息，检索相关的文档，生成回复
+
+    数据库操作只在流式生成前后的短会话中进行，生成期间不占用连接。
+    回复在后台生成并缓冲，断线后携带 ``Last-Event-ID`` 重发同一请求即从断点续传
     """
     try:
         # 获取请求体中的数据
@@ -51,46 +52,57 @@ async def chat(
                 status="error",
                 message="消息内容和会话ID不能为空"
             )
+
+        if last_event_id:
+            return resume_streaming_response(last_event_id, session_id, access, http_request)
         
-        session_result = await db.execute(
-            select(models.ChatSession).where(
-                models.ChatSession.id == session_id,
-                models.ChatSession.user_id == access.user_id,
+        async with async_session() as db:
+            session_result = await db.execute(
+                select(models.ChatSession).where(
+                    models.ChatSession.id == session_id,
+                    models.ChatSession.user_id == access.user_id,
+                )
             )
-        )
-        if not session_result.scalars().first():
-            raise HTTPException(status_code=404, detail="会话不存在")
+            if not session_result.scalars().first():
+                raise HTTPException(status_code=404, detail="会话不存在")
 
-        await consume_call(db, access)
+            await consume_call(db, access)
 
-        # 记录请求信息
-        logger.info("="*50)
-        logger.info("新的聊天请求")
-        logger.info(f"用户输入: {message}")
-        logger.info(f"会话ID: {session_id}")
-        logger.info("-"*30)
+            # 记录请求信息
+            logger.info("="*50)
+            logger.info("新的聊天请求")
+            logger.info(f"用户输入: {message}")
+            logger.info(f"会话ID: {session_id}")
+            logger.info("-"*30)
 
-        user_message = await ChatHistoryManager.save_message(
-            session_id=session_id,
-            content=message,
-            is_user=True,
-            db=db,
-        )
-        if not user_message:
-            raise HTTPException(status_code=500, detail="更新聊天历史请求失败")
+            user_message = await ChatHistoryManager.save_message(
+                session_id=session_id,
+                content=message,
+                is_user=True,
+                db=db,
+            )
+            if not user_message:
+                raise HTTPException(status_code=500, detail="更新聊天历史请求失败")
 
-        chat_history = await ChatHistoryManager.get_chat_history(session_id, db)
+            chat_history = await ChatHistoryManager.get_chat_history(session_id, db)
         
         try:
             # 使用流式响应
+            turn = TURN_STREAMS.start(
+                generate_streaming_response(message, session_id, chat_history, is_agent),
+                user_id=access.user_id,
+                session_id=session_id,
+            )
             return StreamingResponse(
-                generate_streaming_response(message, session_id, chat_history, db, is_agent),
-                media_type="text/event-stream"
+                turn.subscribe(is_disconnected=_disconnect_probe(http_request)),
+                media_type="text/event-stream",
+                headers={TURN_ID_HEADER: turn.turn_id},
             )
         except Exception as e:
             logger.warning(f"流式响应失败，切换到普通对话模式: {str(e)}")
             # 使用普通响应
-            return await generate_standard_response(message, session_id, chat_history, db)
+            async with async_session() as db:
+                return await generate_standard_response(message, session_id, chat_history, db)
             
     except HTTPException:
         raise
@@ -101,25 +113,82 @@ async def chat(
             message="服务器内部错误"
         )
 
+def resume_streaming_response(
+    last_event_id: str,
+    session_id: str,
+    access: AccessPrincipal,
+    http_request: Optional[Request] = None,
+) -> StreamingResponse:
+    """
+    从轮次缓冲续传 ``Last-Event-ID`` 之后的帧
+
+    轮次不存在、已过期或不属于当前用户时返回 404，需要的帧已被淘汰时返回 410，
+    客户端应去掉 ``Last-Event-ID`` 重新发送
+    """
+    parsed = parse_event_id(last_event_id)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail="Last-Event-ID 无效")
+    turn_id, after = parsed
+    turn = TURN_STREAMS.get(turn_id, access.user_id)
+    if turn is None or turn.session_id != session_id:
+        raise HTTPException(status_code=404, detail="对话流不存在或已过期")
+    if not turn.can_replay(after):
+        raise HTTPException(status_code=410, detail="断点之后的内容已过期")
+
+    logger.info(f"续传对话流: turn={turn_id} after={after} last={turn.last_seq}")
+    return StreamingResponse(
+        turn.subscribe(after, is_disconnected=_disconnect_probe(http_request)),
+        media_type="text/event-stream",
+        headers={TURN_ID_HEADER: turn.turn_id},
+    )
+
+
+def _disconnect_probe(http_request: Optional[Request]):
+    """客户端断开检测；直接调用路由函数时没有请求对象"""
+    return http_request.is_disconnected if http_request is not None else None
+
+
+@router.get("/metrics")
+async def pipeline_metrics():
+    """
+    进程内的流水线计数：断开取消的生成及其省下的工作、当前缓冲的对话轮次
+    """
+    return {
+        "status": "success",
+        "data": {**PIPELINE_METRICS.snapshot(), "active_turns": len(TURN_STREAMS)},
+    }
+
+
 @router.get("/sessions", response_model=List[schemas.ChatSession])
 async def get_chat_sessions(
+    response: Response,
+    limit: int = Query(SESSION_PAGE_SIZE, ge=1, le=200),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     access: AccessPrincipal = Depends(current_access),
 ):
     """
-    获取所有聊天会话
+    分页获取聊天会话，按更新时间倒序；下一页游标放在 X-Next-Cursor 响应头中
     """
     try:
         result = await db.execute(
-            select(models.ChatSession).where(
-                models.ChatSession.user_id == access.user_id
-            ).order_by(
-                models.ChatSession.updated_at.desc()
+            keyset_paginate(
+                select(models.ChatSession).where(
+                    models.ChatSession.user_id == access.user_id
+                ),
+                models.ChatSession.updated_at,
+                models.ChatSession.id,
+                limit,
+                cursor,
             )
         )
-        sessions = result.scalars().all()
+        sessions, next_cursor = split_page(result.all(), limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
         return sessions
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"获取聊天会话失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="获取聊天会话失败")
@@ -127,25 +196,37 @@ async def get_chat_sessions(
 @router.get("/sessions/{session_id}/messages", response_model=List[schemas.ChatMessage])
 async def get_session_messages(
     session_id: str,
+    response: Response,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=500),
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     access: AccessPrincipal = Depends(current_access),
 ):
     """
-    获取指定会话的所有消息
+    从最新的消息往前分页获取会话消息，每页按时间正序返回；
+    更早一页的游标放在 X-Next-Cursor 响应头中
     """
     try:
         result = await db.execute(
-            select(models.ChatMessage)
-            .join(models.ChatSession)
-            .where(
-                models.ChatMessage.session_id == session_id,
-                models.ChatSession.user_id == access.user_id,
+            keyset_paginate(
+                select(models.ChatMessage)
+                .join(models.ChatSession)
+                .where(
+                    models.ChatMessage.session_id == session_id,
+                    models.ChatSession.user_id == access.user_id,
+                ),
+                models.ChatMessage.created_at,
+                models.ChatMessage.id,
+                limit,
+                cursor,
             )
-            .order_by(models.ChatMessage.created_at)
         )
-        messages = result.scalars().all()
+        messages, next_cursor = split_page(result.all(), limit)
+        messages.reverse()
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         
-        if not messages:
+        if not messages and not cursor:
             raise HTTPException(status_code=404, detail="会话不存在或没有消息")
             
         return messages
@@ -155,6 +236,68 @@ async def get_session_messages(
         logger.error(f"获取会话消息失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="获取会话消息失败")
 
+@router.get("/sessions/{session_id}/export")
+async def export_session_messages(
+    session_id: str,
+    include: Optional[str] = Query(None, description="逗号分隔的可选字段，目前支持 process_info"),
+    db: AsyncSession = Depends(get_db),
+    access: AccessPrincipal = Depends(current_access),
+):
+    """
+    以 NDJSON 流式导出会话的全部消息（按时间正序，每行一条）
+
+    按批次 keyset 读取，每批使用独立的短会话，导出大会话时内存占用与批次大小相关
+    """
+    result = await db.execute(
+        select(models.ChatSession.id).where(
+            models.ChatSession.id == session_id,
+            models.ChatSession.user_id == access.user_id,
+        )
+    )
+    if result.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="会话不存在")
+
+    include_process_info = "process_info" in {
+        field.strip() for field in (include or "").split(",")
+    }
+    return StreamingResponse(
+        iter_session_export(session_id, include_process_info),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{session_id}.ndjson"'},
+    )
+
+async def iter_session_export(session_id: str, include_process_info: bool = False):
+    """逐批读取会话消息并生成 NDJSON 行"""
+    cursor = None
+    while True:
+        query = select(models.ChatMessage).where(models.ChatMessage.session_id == session_id)
+        if include_process_info:
+            query = query.options(selectinload(models.ChatMessage.process_infos))
+        async with async_session() as db:
+            result = await db.execute(
+                keyset_paginate(
+                    query,
+                    models.ChatMessage.created_at,
+                    models.ChatMessage.id,
+                    EXPORT_BATCH_SIZE,
+                    cursor,
+                    descending=False,
+                )
+            )
+            messages, cursor = split_page(result.all(), EXPORT_BATCH_SIZE)
+        for message in messages:
+            item = schemas.ChatMessage.model_validate(message).model_dump(mode="json")
+            if include_process_info:
+                process_info = message.process_infos
+                item["process_info"] = (
+                    schemas.ProcessInfo.model_validate(process_info).model_dump(mode="json")
+                    if process_info
+                    else None
+                )
+            yield dumps(item) + b"\n"
+        if not cursor:
+            break
+
 @router.get("/process-info/{session_id}", response_model=List[schemas.ProcessInfo])
 async def aget_process_info(
     session_id: str,
@@ -181,99 +324,115 @@ async def aget_process_info(
         logger.error(f"获取处理过程信息失败: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="获取处理过程信息失败")
 
-async def generate_streaming_response(message: str, session_id: str, chat_history: List[Dict[str, str]], db: AsyncSession, is_agent: bool):
+async def generate_streaming_response(
+    message: str,
+    session_id: str,
+    chat_history: List[Dict[str, str]],
+    is_agent: bool,
+    session_factory: Optional[Callable[[], AsyncSession]] = None,
+):
     """
     生成流式响应并持久化
+
+    生成期间不持有数据库会话，结束后在新的短会话中保存回复与处理过程
     
     Args:
         message: 用户消息
         session_id: 会话ID
         chat_history: 聊天历史
-        db: 数据库会话
         is_agent: 是否使用智能代理模式
+        session_factory: 持久化使用的会话工厂，默认为 async_session
     """
     full_response = ""
     ai_message = None
     process_info = None
+    # 汇总处理过程并记录当前阶段，被取消时据此统计省下的工作
+    recorder = ProcessInfoRecorder(message)
+    started_at = time.monotonic()
+    responding = not is_agent
 
     try:
         if is_agent:
             # 智能代理模式：使用完整的处理流程
-            process_steps = []
-            task_plan = None
-            tool_selections = None
-            task_results = {}
-
-            # 使用异步生成器获取处理过程信息
-            async for event in get_process_info(message):
-                # 处理事件数据
-                if isinstance(event, pydantic.BaseModel):
-                    result = event.model_dump()
-                else:
-                    result = event  # 如果不是pydantic模型，直接使用原始事件
+            opening = ""
+            if SPECULATIVE_RESPONSE_ENABLED:
+                # 推测模式：部分任务有结果后先输出回复开头，与剩余任务并行
+                # 开头的 token 与最终回复一样合并后再编码，事件按原顺序穿插输出
+                responder = SpeculativeResponder(message, chat_history)
+                recorder = responder.recorder
+                async for item in coalesce_tokens(item async for _, item in responder.run()):
+                    if isinstance(item, str):
+                        full_response += item
+                        yield encode_token(item)
+                        continue
+                    yield encode_event(item)
+                    logger.info("发送事件: type=%s subtype=%s", item.get("type"), item.get("subtype"))
+                    logger.debug("事件内容: %s", item)
+                opening = responder.opening
+            else:
+                # 使用异步生成器获取处理过程信息
+                async for event in get_process_info(message):
+                    result = recorder.add(event)
+                    yield encode_event(result)
                     
-                # 使用自定义编码器转换为JSON字符串并发送
-                yield f"data: {json.dumps(result, cls=CustomJSONEncoder)}\n\n"
-                
-                # 记录事件数据 - 使用result而不是event
-                if result.get("type") == "step":
-                    process_steps.append(result.get("content"))
-                elif result.get("type") == "data":
-                    if result.get("subtype") == "task_plan":
-                        task_plan = result.get("content")
-                    elif result.get("subtype") == "task_result":
-                        task_results[result.get("content", {}).get("task_id")] = result.get("content", {}).get("result")
-                    elif result.get("subtype") == "tool_selections":
-                        tool_selections = result.get("content")
-                
-                logger.info(f"发送事件: {result}")
+                    # 完整事件内容只在 DEBUG 级别按需格式化
+                    logger.info("发送事件: type=%s subtype=%s", result.get("type"), result.get("subtype"))
+                    logger.debug("事件内容: %s", result)
             
             # 获取处理过程信息
-            process_info = {
-                "user_input": message,
-                "steps": process_steps,
-                "task_planning": {"tasks": task_plan} if task_plan else {},
-                "tool_selection": {"tool_selections": tool_selections} if tool_selections else {},
-                "task_execution": task_results
-            }
+            process_info = recorder.process_info()
             
-            # 生成最终响应
-            async for chunk in ResponseGenerator.create_streaming_response(message, process_info, chat_history):
+            # 生成最终响应，已输出开头时只续写其余部分
+            # 合并细碎的 token 后再编码为 SSE 帧，首个 token 立即发送
+            responding = True
+            async for chunk in coalesce_tokens(
+                ResponseGenerator.create_streaming_response(message, process_info, chat_history, opening=opening)
+            ):
                 if chunk:
                     full_response += chunk
-                    yield f"data: {json.dumps({'content': chunk})}\n\n"
+                    yield encode_token(chunk)
         else:
             # 普通模式：直接生成简单回复
-            async for chunk in ResponseGenerator.create_simple_streaming_response(message, chat_history):
+            async for chunk in coalesce_tokens(
+                ResponseGenerator.create_simple_streaming_response(message, chat_history)
+            ):
                 if chunk:
                     full_response += chunk
-                    yield f"data: {json.dumps({'content': chunk})}\n\n"
+                    yield encode_token(chunk)
+    except asyncio.CancelledError:
+        # 客户端断开后生成任务被取消，取消已沿 await 链中止进行中的 LLM 与工具调用
+        stage = "response" if responding else recorder.stage
+        tasks_skipped = recorder.pending_tasks if is_agent else 0
+        PIPELINE_METRICS.record_cancelled(stage, tasks_skipped, time.monotonic() - started_at)
+        logger.info(f"生成已取消: session={session_id} stage={stage} 跳过任务数={tasks_skipped}")
+        raise
     finally:
         if full_response:
-            try:
-                ai_message = await ChatHistoryManager.save_message(
-                    session_id=session_id,
-                    content=full_response,
-                    is_user=False,
-                    db=db,
-                )
-                ai_message_id = ai_message.id if ai_message else None
-            except Exception as e:
-                logger.error(f"更新ai聊天历史失败: {str(e)}")
-                raise HTTPException(status_code=500, detail="更新ai聊天历史请求失败")
-            
-            # 只有在智能代理模式下才保存处理过程信息
-            if is_agent and process_info and ai_message_id:
+            async with (session_factory or async_session)() as db:
                 try:
-                    await ChatHistoryManager.save_process_info(
-                        message_id=ai_message_id,
+                    ai_message = await ChatHistoryManager.save_message(
                         session_id=session_id,
-                        process_info=process_info,
+                        content=full_response,
+                        is_user=False,
                         db=db,
                     )
+                    ai_message_id = ai_message.id if ai_message else None
                 except Exception as e:
-                    logger.error(f"保存处理过程信息失败: {str(e)}")
-                    raise HTTPException(status_code=500, detail="保存处理过程信息请求失败")
+                    logger.error(f"更新ai聊天历史失败: {str(e)}")
+                    raise HTTPException(status_code=500, detail="更新ai聊天历史请求失败")
+                
+                # 只有在智能代理模式下才保存处理过程信息
+                if is_agent and process_info and ai_message_id:
+                    try:
+                        await ChatHistoryManager.save_process_info(
+                            message_id=ai_message_id,
+                            session_id=session_id,
+                            process_info=process_info,
+                            db=db,
+                        )
+                    except Exception as e:
+                        logger.error(f"保存处理过程信息失败: {str(e)}")
+                        raise HTTPException(status_code=500, detail="保存处理过程信息请求失败")
 
 async def generate_standard_response(message: str, session_id: str, chat_history: List[Dict[str, str]], db: AsyncSession):
     """
@@ -1,4 +1,4 @@
 from .models import Base
-from .session import get_db, engine, async_session
+from .session import get_db, engine, read_engine, async_session
 
-__all__ = ["Base", "get_db", "engine", "async_session"]
\ No newline at end of file
+__all__ = ["Base", "get_db", "engine", "read_engine", "async_session"]
\ No newline at end of file
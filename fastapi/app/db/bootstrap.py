@@ -0,0 +1,176 @@
+"""
+数据库引擎引导：SQLite 连接 pragma、读写分离连接池与路由 Session。
+
+生产环境使用单个 SQLite 文件，写操作在同一时刻只能有一个连接持有写锁。
+这里为文件型 SQLite 创建两个引擎：
+
+- 写引擎：连接池只有 1 个连接，等待该连接的协程在连接池队列中排队，
+  相当于进程内的单写者队列，避免多个连接在 busy handler 中互相争抢写锁；
+- 读引擎：更大的连接池，连接开启 ``query_only``，借助 WAL 与写入并发执行。
+
+``RoutingSession`` 把 flush 和 INSERT/UPDATE/DELETE 路由到写引擎，普通 SELECT
+路由到读引擎；一旦当前事务已经用到写连接，后续语句也留在写连接上，保证事务内
+能读到自己尚未提交的写入。内存数据库或非 SQLite 数据库只使用一个引擎。
+"""
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.selectable import CompoundSelect, Select
+
+
+WRITE_ROLE = "write"
+READ_ROLE = "read"
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+@dataclass(frozen=True)
+class SQLitePragmas:
+    """每个新建 SQLite 连接上执行的 pragma。"""
+
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    cache_size_kib: int = 16384
+    mmap_size: int = 128 * 1024 * 1024
+    temp_store: str = "MEMORY"
+
+    @classmethod
+    def from_env(cls) -> "SQLitePragmas":
+        return cls(
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", cls.journal_mode),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", cls.synchronous),
+            busy_timeout_ms=_env_int("SQLITE_BUSY_TIMEOUT_MS", cls.busy_timeout_ms),
+            cache_size_kib=_env_int("SQLITE_CACHE_SIZE_KIB", cls.cache_size_kib),
+            mmap_size=_env_int("SQLITE_MMAP_SIZE", cls.mmap_size),
+            temp_store=os.getenv("SQLITE_TEMP_STORE", cls.temp_store),
+        )
+
+    def statements(self, query_only: bool = False) -> List[str]:
+        # journal_mode 需要在 query_only 之前设置，首次切换 WAL 会写文件头。
+        statements = [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA busy_timeout={self.busy_timeout_ms}",
+            # 负数表示以 KiB 为单位，而不是页数
+            f"PRAGMA cache_size=-{self.cache_size_kib}",
+            f"PRAGMA mmap_size={self.mmap_size}",
+            f"PRAGMA temp_store={self.temp_store}",
+        ]
+        if query_only:
+            statements.append("PRAGMA query_only=ON")
+        return statements
+
+
+def is_sqlite_url(url: Union[str, URL]) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def is_file_sqlite_url(url: Union[str, URL]) -> bool:
+    """是否为文件型 SQLite；内存库在不同连接间不共享数据，不能读写分离。"""
+    url = make_url(url)
+    if url.get_backend_name() != "sqlite":
+        return False
+    database = url.database or ""
+    if database in {"", ":memory:"} or database.startswith("file::memory:"):
+        return False
+    return url.query.get("mode") != "memory"
+
+
+def install_sqlite_pragmas(
+    engine: AsyncEngine,
+    pragmas: Optional[SQLitePragmas] = None,
+    query_only: bool = False,
+) -> None:
+    pragmas = pragmas or SQLitePragmas.from_env()
+    statements = pragmas.statements(query_only=query_only)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+
+def create_engine_for_role(
+    url: Union[str, URL],
+    role: str = WRITE_ROLE,
+    pragmas: Optional[SQLitePragmas] = None,
+    **engine_kwargs,
+) -> AsyncEngine:
+    """
+    按读/写角色创建异步引擎
+
+    Args:
+        url: 数据库连接地址
+        role: ``write`` 或 ``read``
+        pragmas: 覆盖默认的 SQLite pragma
+        engine_kwargs: 透传给 ``create_async_engine`` 的参数
+
+    Returns:
+        配置好连接池与 pragma 的引擎
+    """
+    if role not in {WRITE_ROLE, READ_ROLE}:
+        raise ValueError(f"未知的数据库引擎角色: {role}")
+
+    options = {"echo": False}
+    if is_file_sqlite_url(url):
+        pool_timeout = _env_int("DB_POOL_TIMEOUT_SECONDS", 30)
+        if role == WRITE_ROLE:
+            options.update(
+                pool_size=_env_int("DB_WRITE_POOL_SIZE", 1),
+                max_overflow=0,
+                pool_timeout=pool_timeout,
+            )
+        else:
+            options.update(
+                pool_size=_env_int("DB_READ_POOL_SIZE", 8),
+                max_overflow=_env_int("DB_READ_MAX_OVERFLOW", 8),
+                pool_timeout=pool_timeout,
+            )
+    options.update(engine_kwargs)
+
+    engine = create_async_engine(url, **options)
+    if is_file_sqlite_url(url):
+        install_sqlite_pragmas(engine, pragmas, query_only=role == READ_ROLE)
+    return engine
+
+
+def _is_plain_read(clause) -> bool:
+    if isinstance(clause, CompoundSelect):
+        return True
+    return isinstance(clause, Select) and clause._for_update_arg is None
+
+
+class RoutingSession(Session):
+    """
+    读写路由 Session
+
+    通过 ``sessionmaker(..., info={"read_bind": read_engine.sync_engine})`` 配置读引擎，
+    ``bind`` 为写引擎。未配置读引擎时行为与普通 Session 一致。
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        read_bind = self.info.get("read_bind")
+        if (
+            read_bind is None
+            or self._flushing
+            or self._holds_write_connection()
+            or not _is_plain_read(clause)
+        ):
+            return super().get_bind(mapper, clause=clause, **kw)
+        return read_bind
+
+    def _holds_write_connection(self) -> bool:
+        transaction = self.get_transaction()
+        return transaction is not None and self.bind in transaction._connections
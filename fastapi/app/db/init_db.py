@@ -2,11 +2,13 @@
 
 import asyncio
 from app.db.session import engine
+from app.db.migrations import run_migrations
 from app.db.models import Base
 
 async def init_models():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await run_migrations(engine)
 
 if __name__ == "__main__":
     asyncio.run(init_models())
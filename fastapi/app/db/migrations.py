@@ -0,0 +1,169 @@
+"""
+版本化数据库迁移。
+
+``Base.metadata.create_all`` 只会创建缺失的表，不会给已有的表补索引或字段，
+已部署的数据库因此拿不到模型上新增的结构。这里按版本号顺序执行迁移，
+已执行的版本记录在 ``schema_migrations`` 表中。
+
+新增迁移时在 ``MIGRATIONS`` 末尾追加，不要修改已发布的迁移；语句应当幂等
+（如 ``CREATE INDEX IF NOT EXISTS``），以便新库先由 ``create_all`` 建好结构后
+迁移仍可安全执行。SQLite 的 ``ADD COLUMN`` 没有 ``IF NOT EXISTS``，加列使用
+``add_column``。
+"""
+import logging
+from dataclasses import dataclass
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+Statement = Union[str, Callable[[Connection], None]]
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: Tuple[Statement, ...]
+
+
+def add_column(table: str, column: str, ddl: str) -> Callable[[Connection], None]:
+    """列不存在时执行 ALTER TABLE ... ADD COLUMN"""
+
+    def apply(conn: Connection) -> None:
+        columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in columns:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+    return apply
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        name="hot_path_indexes",
+        statements=(
+            "CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_id_updated_at "
+            "ON chat_sessions (user_id, updated_at)",
+            "CREATE INDEX IF NOT EXISTS ix_chat_messages_session_id_created_at "
+            "ON chat_messages (session_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_process_infos_session_id_created_at "
+            "ON process_infos (session_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_process_infos_message_id "
+            "ON process_infos (message_id)",
+            "CREATE INDEX IF NOT EXISTS ix_agent_data_user_id_created_at "
+            "ON agent_data (user_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_agent_data_user_id_session_id_created_at "
+            "ON agent_data (user_id, session_id, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_agent_data_user_id_type_created_at "
+            "ON agent_data (user_id, type, created_at)",
+            "CREATE INDEX IF NOT EXISTS ix_agent_data_message_id_created_at "
+            "ON agent_data (message_id, created_at)",
+        ),
+    ),
+    Migration(
+        version=2,
+        name="chat_sessions_keyset_index",
+        statements=(
+            # keyset 分页按 (updated_at, id) 排序，id 不是 rowid，需要显式放进索引
+            "CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_id_updated_at_id "
+            "ON chat_sessions (user_id, updated_at, id)",
+            "DROP INDEX IF EXISTS ix_chat_sessions_user_id_updated_at",
+        ),
+    ),
+    Migration(
+        version=3,
+        name="agent_data_blob_refs",
+        statements=(
+            add_column("agent_data", "content_ref", "VARCHAR(64)"),
+            add_column("agent_data", "content_size", "INTEGER"),
+            add_column("agent_data", "content_type", "VARCHAR"),
+        ),
+    ),
+]
+
+
+def _ensure_migrations_table(conn: Connection) -> None:
+    conn.execute(
+        text(
+            f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+            "version INTEGER PRIMARY KEY, "
+            "name VARCHAR NOT NULL, "
+            "applied_at DATETIME DEFAULT CURRENT_TIMESTAMP)"
+        )
+    )
+
+
+def applied_versions(conn: Connection) -> List[int]:
+    _ensure_migrations_table(conn)
+    result = conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE} ORDER BY version"))
+    return [row[0] for row in result]
+
+
+def _apply_migration(conn: Connection, migration: Migration) -> bool:
+    # 调用方已持有写锁，这里检查的已执行版本不会被其他进程并发修改
+    if migration.version in applied_versions(conn):
+        return False
+    for statement in migration.statements:
+        if callable(statement):
+            statement(conn)
+        else:
+            conn.execute(text(statement))
+    conn.execute(
+        text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (:version, :name)"),
+        {"version": migration.version, "name": migration.name},
+    )
+    return True
+
+
+def _apply_migration_locked(conn: Connection, migration: Migration) -> bool:
+    """
+    在 ``BEGIN IMMEDIATE`` 事务中执行迁移
+
+    pysqlite 不会为 SELECT 与 DDL 开启事务，默认模式下检查已执行版本与写入版本号
+    之间没有写锁，多个 worker 同时启动时都会执行 DDL，随后其中一个因版本号重复而
+    失败。连接以 AUTOCOMMIT 打开，由这里显式加写锁后再检查，只有第一个拿到锁的
+    进程真正执行，其余进程拿到锁时看到版本已存在而跳过。
+    """
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+    try:
+        applied = _apply_migration(conn, migration)
+    except BaseException:
+        conn.exec_driver_sql("ROLLBACK")
+        raise
+    conn.exec_driver_sql("COMMIT")
+    return applied
+
+
+async def run_migrations(engine: AsyncEngine, migrations: List[Migration] = None) -> List[int]:
+    """
+    执行尚未应用的迁移，每个迁移在单独的写事务中执行
+
+    Args:
+        engine: 写引擎
+        migrations: 迁移列表，默认为 ``MIGRATIONS``
+
+    Returns:
+        本次新应用的版本号
+    """
+    migrations = sorted(migrations if migrations is not None else MIGRATIONS, key=lambda item: item.version)
+    applied: List[int] = []
+    for migration in migrations:
+        if engine.dialect.name == "sqlite":
+            async with engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+                done = await conn.run_sync(_apply_migration_locked, migration)
+        else:
+            async with engine.begin() as conn:
+                done = await conn.run_sync(_apply_migration, migration)
+        if done:
+            applied.append(migration.version)
+            logger.info(f"已应用数据库迁移 {migration.version}: {migration.name}")
+    return applied
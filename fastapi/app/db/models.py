@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
 import uuid
@@ -53,8 +53,25 @@ class TrialAccess(Base):
     user = relationship("User")
 
 
+class LoginFailure(Base):
+    """登录失败记录，供多 worker 共享的登录限流使用"""
+    __tablename__ = "login_failures"
+    __table_args__ = (
+        # 滑动窗口计数：WHERE client_key = ? AND attempted_at > ?
+        Index("ix_login_failures_client_key_attempted_at", "client_key", "attempted_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    client_key = Column(String, nullable=False)
+    attempted_at = Column(DateTime, nullable=False, index=True)
+
+
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        # 会话列表：WHERE user_id = ? [AND (updated_at, id) < (?, ?)] ORDER BY updated_at DESC, id DESC
+        Index("ix_chat_sessions_user_id_updated_at_id", "user_id", "updated_at", "id"),
+    )
     
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     title = Column(String, index=True)
@@ -71,6 +88,10 @@ class ChatSession(Base):
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # 消息列表与聊天历史：WHERE session_id = ? ORDER BY created_at[, id]
+        Index("ix_chat_messages_session_id_created_at", "session_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     content = Column(Text)
@@ -86,6 +107,12 @@ class ChatMessage(Base):
 
 class ProcessInfo(Base):
     __tablename__ = "process_infos"
+    __table_args__ = (
+        # 处理过程列表：WHERE session_id = ? ORDER BY created_at DESC
+        Index("ix_process_infos_session_id_created_at", "session_id", "created_at"),
+        # 按消息加载处理过程：WHERE message_id IN (...)
+        Index("ix_process_infos_message_id", "message_id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     steps = Column(JSON)
@@ -103,11 +130,21 @@ class ProcessInfo(Base):
 
 class AgentData(Base):
     __tablename__ = "agent_data"
+    __table_args__ = (
+        # 列表查询均为 WHERE user_id = ? [AND 过滤条件] ORDER BY created_at DESC
+        Index("ix_agent_data_user_id_created_at", "user_id", "created_at"),
+        Index("ix_agent_data_user_id_session_id_created_at", "user_id", "session_id", "created_at"),
+        Index("ix_agent_data_user_id_type_created_at", "user_id", "type", "created_at"),
+        Index("ix_agent_data_message_id_created_at", "message_id", "created_at"),
+    )
     
     id = Column(String, primary_key=True, index=True, default=lambda: str(uuid.uuid4()))
     type = Column(String, index=True)  # table, form, image, code, text, chart, file, markdown
     title = Column(String, nullable=True)
-    content = Column(JSON)  # 存储各种类型的内容数据
+    content = Column(JSON)  # 存储各种类型的内容数据，外置到 blob 存储时为空
+    content_ref = Column(String(64), nullable=True)  # 外置内容的 sha256
+    content_size = Column(Integer, nullable=True)  # 外置内容序列化后的字节数
+    content_type = Column(String, nullable=True)  # 外置内容的媒体类型
     meta_data = Column(JSON, nullable=True)
     timestamp = Column(DateTime, server_default=func.now())
     created_at = Column(DateTime, server_default=func.now())
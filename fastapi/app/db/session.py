@@ -1,15 +1,27 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 import os
 from app.core.env import load_app_env
+from app.db.bootstrap import READ_ROLE, WRITE_ROLE, RoutingSession, create_engine_for_role, is_file_sqlite_url
 
 load_app_env()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./demo.db")
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+# 写引擎：文件型 SQLite 下只有一个连接，等待者在连接池中排队
+engine = create_engine_for_role(DATABASE_URL, WRITE_ROLE)
+# 读引擎：只读连接池，借助 WAL 与写入并发；内存库或其他数据库与写引擎共用
+read_engine = (
+    create_engine_for_role(DATABASE_URL, READ_ROLE)
+    if is_file_sqlite_url(DATABASE_URL)
+    else engine
+)
 async_session = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
+    engine,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+    expire_on_commit=False,
+    info={"read_bind": read_engine.sync_engine} if read_engine is not engine else {},
 )
 
 async def get_db():
@@ -1,18 +1,25 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
 from fastapi import FastAPI, HTTPException
 from app.api.v1 import agent_data, auth, campus_notice, capabilities, chat, course_schedule, student_profile, venues
 from app.api import demo
+from app.db.migrations import run_migrations
 from app.db.models import Base
 from app.db.session import engine
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.services.access_service import (
+    QUOTA_FLUSH_INTERVAL_SECONDS,
+    QUOTA_LEASES,
     authenticate_request,
     ensure_local_dev_access,
     trial_access_required,
 )
 from app.db.session import async_session
+from app.services.token_counter import TOKEN_COUNTER
+from app.skills import SkillRegistry
+from app.skills.registry import SKILL_RELOAD_INTERVAL_SECONDS
 import os
 import logging
 from logging.handlers import RotatingFileHandler
@@ -51,7 +58,27 @@ if not logger.hasHandlers():
 async def lifespan(app: FastAPI):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+    await run_migrations(engine)
+    # 在后台加载 tiktoken 编码，离线时下载编码文件不会阻塞启动，加载完成前按字符估算
+    TOKEN_COUNTER.load_in_background()
+    flush_task = None
+    if QUOTA_LEASES.enabled:
+        flush_task = asyncio.create_task(
+            QUOTA_LEASES.run_periodic_flush(async_session, QUOTA_FLUSH_INTERVAL_SECONDS)
+        )
+    # 定期检查 SKILL.md 变化并热加载，无需重启 worker
+    skill_watch_task = None
+    if SKILL_RELOAD_INTERVAL_SECONDS > 0:
+        skill_watch_task = asyncio.create_task(SkillRegistry.watch(SKILL_RELOAD_INTERVAL_SECONDS))
     yield
+    if skill_watch_task is not None:
+        skill_watch_task.cancel()
+    if flush_task is not None:
+        flush_task.cancel()
+        # 等待周期任务退出（进行中的归还会先完成），再做最后一次归还
+        with suppress(asyncio.CancelledError):
+            await flush_task
+        await QUOTA_LEASES.flush(async_session)
 
 
 app = FastAPI(
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, Field
 from typing import Optional, Dict, Any
 from datetime import datetime
 import uuid
@@ -30,6 +30,16 @@ class AgentDataUpdate(BaseModel):
 
 class AgentData(AgentDataBase):
     """完整的AgentData模式"""
+    # ORM 模型上的 metadata 是 SQLAlchemy 的 MetaData，元数据实际存放在 meta_data 列
+    metadata: Optional[Dict[str, Any]] = Field(
+        None,
+        validation_alias=AliasChoices("meta_data", "metadata"),
+        description="元数据",
+    )
+    content: Optional[Dict[str, Any]] = Field(None, description="内容数据，外置到 blob 存储时为空")
+    content_ref: Optional[str] = Field(None, description="外置内容的 sha256，通过 /{id}/content 读取")
+    content_size: Optional[int] = Field(None, description="外置内容的字节数")
+    content_type: Optional[str] = Field(None, description="外置内容的媒体类型")
     id: str = Field(..., description="唯一标识符")
     timestamp: datetime = Field(..., description="时间戳")
     created_at: datetime = Field(..., description="创建时间")
@@ -60,3 +70,42 @@ class AgentDataListResponse(BaseModel):
     total: Optional[int] = Field(None, description="总数量")
     page: Optional[int] = Field(None, description="当前页码")
     page_size: Optional[int] = Field(None, description="每页大小")
+
+
+AGENT_DATA_BATCH_LIMIT = 500
+
+
+class AgentDataBatchUpdateItem(AgentDataUpdate):
+    """批量更新中的单条更新"""
+    id: str = Field(..., description="要更新的AgentData ID")
+
+
+class AgentDataBatchCreate(BaseModel):
+    """批量创建AgentData的模式"""
+    items: list[AgentDataCreate] = Field(..., min_length=1, max_length=AGENT_DATA_BATCH_LIMIT)
+
+
+class AgentDataBatchUpdate(BaseModel):
+    """批量更新AgentData的模式"""
+    items: list[AgentDataBatchUpdateItem] = Field(..., min_length=1, max_length=AGENT_DATA_BATCH_LIMIT)
+
+
+class AgentDataBatchDelete(BaseModel):
+    """批量删除AgentData的模式"""
+    ids: list[str] = Field(..., min_length=1, max_length=AGENT_DATA_BATCH_LIMIT)
+
+
+class AgentDataBatchFailure(BaseModel):
+    """批量操作中失败的条目"""
+    index: int = Field(..., description="条目在请求中的下标")
+    id: Optional[str] = Field(None, description="条目ID")
+    error: str = Field(..., description="失败原因")
+
+
+class AgentDataBatchResponse(BaseModel):
+    """批量操作响应模式，status 为 success / partial / error"""
+    status: str = Field(..., description="响应状态")
+    message: Optional[str] = Field(None, description="响应消息")
+    data: list[AgentData] = Field(default_factory=list, description="成功写入的AgentData")
+    ids: list[str] = Field(default_factory=list, description="成功处理的ID（批量删除时使用）")
+    failures: list[AgentDataBatchFailure] = Field(default_factory=list, description="失败的条目")
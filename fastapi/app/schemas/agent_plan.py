@@ -0,0 +1,46 @@
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Optional, Dict, Any
+
+
+class PlannedTask(BaseModel):
+    id: int
+    task: str
+    input: Any = ""
+    depends_on: List[int] = []
+
+    class Config:
+        extra = "allow"
+
+    @field_validator("depends_on", mode="before")
+    @classmethod
+    def _none_as_empty(cls, value: Any) -> Any:
+        return [] if value is None else value
+
+
+class TaskPlan(BaseModel):
+    tasks: List[PlannedTask] = Field(min_length=1)
+
+    class Config:
+        extra = "allow"
+
+
+class ToolSelection(BaseModel):
+    task_id: int
+    tool: str
+    params: Dict[str, Any] = {}
+    reason: Optional[str] = ""
+
+    class Config:
+        extra = "allow"
+
+    @field_validator("params", mode="before")
+    @classmethod
+    def _none_as_empty(cls, value: Any) -> Any:
+        return {} if value is None else value
+
+
+class ToolSelectionPlan(BaseModel):
+    tool_selections: List[ToolSelection] = Field(min_length=1)
+
+    class Config:
+        extra = "allow"
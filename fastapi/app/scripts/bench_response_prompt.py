@@ -0,0 +1,64 @@
+"""
+最终回复 prompt 基准：对比旧的 ``json.dumps(indent=2)`` 全量嵌入与 ProcessContextBuilder
+在工具密集轮次下的处理过程上下文大小与构建耗时。
+
+样例包含 30 条带正文的通知、带 SKILL.md 全文的 activation 与工具选择理由。
+
+用法：
+    python -m app.scripts.bench_response_prompt --budget 3000
+"""
+import argparse
+import json
+import time
+
+from app.agent.ProcessContextBuilder import ProcessContextBuilder
+from app.services.token_counter import TOKEN_COUNTER
+
+
+def _sample_process_info():
+    notices = [
+        {"title": f"关于第 {index} 周教学安排的通知", "content": "各学院：根据学校安排，" * 120, "url": f"https://example.edu/notice/{index}"}
+        for index in range(30)
+    ]
+    activation = {"name": "campus-notice", "content": "<skill_content>" + "技能说明。" * 1500 + "</skill_content>"}
+    return {
+        "task_planning": {"tasks": [
+            {"id": 1, "task": "查询最新通知", "input": "最近的教学通知", "depends_on": []},
+            {"id": 2, "task": "查询场馆", "input": "明天下午可预约的羽毛球场", "depends_on": []},
+        ]},
+        "tool_selection": {"tool_selections": {
+            1: {"task_id": 1, "tool": "campus_notice", "params": {"limit": 30}, "reason": "用户想了解最近的通知，" * 10},
+            2: {"task_id": 2, "tool": "venue_booking", "params": {"sport": "羽毛球"}, "reason": "用户想预约场馆，" * 10},
+        }},
+        "task_execution": {
+            1: {"status": "success", "notices": notices, "activation": activation},
+            2: {"status": "success", "venues": [{"name": f"{index} 号场", "slots": ["14:00", "15:00", "16:00"]} for index in range(40)], "activation": activation},
+        },
+    }
+
+
+def _legacy(process_info):
+    return "\n\n".join(
+        json.dumps(process_info[key], ensure_ascii=False, indent=2)
+        for key in ("task_planning", "tool_selection", "task_execution")
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    process_info = _sample_process_info()
+    builder = ProcessContextBuilder(budget=args.budget)
+    for name, build in (("json.dumps(indent=2)", _legacy), ("ProcessContextBuilder", builder.build)):
+        started = time.perf_counter()
+        for _ in range(args.rounds):
+            text = build(process_info)
+        elapsed = (time.perf_counter() - started) / args.rounds * 1000
+        print(f"{name:24s} {len(text):>8d} 字符 {TOKEN_COUNTER.count(text):>7d} tokens {elapsed:7.2f} ms/次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+SQLite 并发吞吐基准：对比默认引擎与调优后的读写分离引擎。
+
+模拟多个并发聊天请求：每个 worker 循环写入一条消息并读取最近的历史消息。
+
+用法：
+    python -m app.scripts.bench_sqlite_concurrency --workers 32 --ops 50
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.bootstrap import READ_ROLE, WRITE_ROLE, RoutingSession, create_engine_for_role
+
+
+async def _worker(session_factory, worker_id: int, ops: int, stats: dict) -> None:
+    session_id = f"bench-{worker_id % 8}"
+    for index in range(ops):
+        try:
+            async with session_factory() as db:
+                db.add(
+                    models.ChatMessage(
+                        session_id=session_id,
+                        content=f"worker {worker_id} message {index}",
+                        is_user=True,
+                    )
+                )
+                await db.commit()
+                result = await db.execute(
+                    select(models.ChatMessage)
+                    .where(models.ChatMessage.session_id == session_id)
+                    .order_by(models.ChatMessage.created_at.desc())
+                    .limit(20)
+                )
+                result.scalars().all()
+            stats["ok"] += 1
+        except OperationalError:
+            stats["errors"] += 1
+
+
+async def _run_scenario(name: str, db_path: Path, workers: int, ops: int) -> dict:
+    url = f"sqlite+aiosqlite:///{db_path}"
+    if name == "baseline":
+        write_engine = read_engine = create_async_engine(url, echo=False)
+        session_factory = sessionmaker(write_engine, class_=AsyncSession, expire_on_commit=False)
+    else:
+        write_engine = create_engine_for_role(url, WRITE_ROLE)
+        read_engine = create_engine_for_role(url, READ_ROLE)
+        session_factory = sessionmaker(
+            write_engine,
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            expire_on_commit=False,
+            info={"read_bind": read_engine.sync_engine},
+        )
+
+    async with write_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+    stats = {"ok": 0, "errors": 0}
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_worker(session_factory, worker_id, ops, stats) for worker_id in range(workers))
+    )
+    elapsed = time.perf_counter() - started
+
+    await write_engine.dispose()
+    if read_engine is not write_engine:
+        await read_engine.dispose()
+
+    return {
+        "name": name,
+        "elapsed": elapsed,
+        "ok": stats["ok"],
+        "errors": stats["errors"],
+        "throughput": stats["ok"] / elapsed if elapsed else 0.0,
+    }
+
+
+async def run(workers: int, ops: int) -> list:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in ("baseline", "tuned"):
+            results.append(
+                await _run_scenario(name, Path(tmp_dir) / f"{name}.db", workers, ops)
+            )
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite 并发读写吞吐基准")
+    parser.add_argument("--workers", type=int, default=32, help="并发 worker 数")
+    parser.add_argument("--ops", type=int, default=50, help="每个 worker 的写+读次数")
+    args = parser.parse_args()
+    if args.workers < 1 or args.ops < 1:
+        parser.error("workers 和 ops 必须大于 0")
+
+    results = asyncio.run(run(args.workers, args.ops))
+    print(f"{'scenario':<10} {'ops/s':>10} {'ok':>8} {'errors':>8} {'seconds':>9}")
+    for item in results:
+        print(
+            f"{item['name']:<10} {item['throughput']:>10.1f} {item['ok']:>8} "
+            f"{item['errors']:>8} {item['elapsed']:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
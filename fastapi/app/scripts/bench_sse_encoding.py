@@ -0,0 +1,75 @@
+"""
+SSE 帧编码基准：对比 json.dumps 与 app.api.sse 的单核编码吞吐。
+
+token 帧模拟 DeepSeek 的小增量输出，事件帧模拟带 pydantic 结果对象的任务结果事件。
+
+用法：
+    python -m app.scripts.bench_sse_encoding --frames 200000
+"""
+import argparse
+import json
+import time
+
+import pydantic
+
+from app.api.sse import encode_event, encode_token
+
+
+class _ToolResult(pydantic.BaseModel):
+    status: str
+    content: list
+
+
+class _LegacyEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if hasattr(obj, "model_dump"):
+            return obj.model_dump()
+        if hasattr(obj, "__dict__"):
+            return obj.__dict__
+        return super().default(obj)
+
+
+TOKENS = ["你好", "，", "今天", "图书馆", "开放到", " 22:00", "。", "\n", "祝你", "学习顺利"]
+EVENT = {
+    "type": "data",
+    "subtype": "task_result",
+    "content": {
+        "task_id": "task2",
+        "result": _ToolResult(status="success", content=[{"type": "text", "text": "明天晴，18-26°C"}] * 4),
+    },
+}
+
+
+def _legacy_token(chunk: str) -> bytes:
+    return f"data: {json.dumps({'content': chunk})}\n\n".encode("utf-8")
+
+
+def _legacy_event(event) -> bytes:
+    return f"data: {json.dumps(event, cls=_LegacyEncoder)}\n\n".encode("utf-8")
+
+
+def _measure(encode, items, frames: int) -> float:
+    count = len(items)
+    started = time.perf_counter()
+    for index in range(frames):
+        encode(items[index % count])
+    return frames / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SSE 帧编码基准")
+    parser.add_argument("--frames", type=int, default=200000, help="每个场景编码的帧数")
+    args = parser.parse_args()
+
+    scenarios = [
+        ("token json.dumps", _legacy_token, TOKENS, args.frames),
+        ("token sse", encode_token, TOKENS, args.frames),
+        ("event json.dumps", _legacy_event, [EVENT], args.frames // 10),
+        ("event sse", encode_event, [EVENT], args.frames // 10),
+    ]
+    for name, encode, items, frames in scenarios:
+        print(f"{name:<18} {_measure(encode, items, frames):>12,.0f} 帧/秒")
+
+
+if __name__ == "__main__":
+    main()
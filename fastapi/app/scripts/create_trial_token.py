@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from sqlalchemy import select
 
 from app.db import models
+from app.db.migrations import run_migrations
 from app.db.session import async_session, engine
 from app.services.access_service import generate_trial_token, hash_trial_token
 
@@ -12,6 +13,7 @@ from app.services.access_service import generate_trial_token, hash_trial_token
 async def create_token(label: str, days: int, max_calls: int) -> str:
     async with engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
+    await run_migrations(engine)
 
     token = generate_trial_token()
     username = f"trial_{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
@@ -0,0 +1,18 @@
+import asyncio
+
+from app.db.session import async_session
+from app.services.agent_data_service import AgentDataService
+
+
+async def collect() -> int:
+    async with async_session() as db:
+        return await AgentDataService.collect_unreferenced_blobs(db)
+
+
+def main() -> None:
+    removed = asyncio.run(collect())
+    print(f"已删除 {removed} 个未被引用的 blob")
+
+
+if __name__ == "__main__":
+    main()
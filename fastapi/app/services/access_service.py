@@ -1,14 +1,20 @@
+import asyncio
 import base64
 import hashlib
 import hmac
 import json
+import logging
 import os
 import secrets
-from dataclasses import dataclass
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
+from typing import Callable, Dict, Hashable, Optional, Tuple
 
 from fastapi import HTTPException, Request, status
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import models
@@ -18,6 +24,8 @@ COOKIE_NAME = "xiaolin_trial_session"
 LOCAL_DEV_USER_ID = 1
 LOCAL_DEV_LABEL = "local-dev"
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass(frozen=True)
 class AccessPrincipal:
@@ -33,6 +41,67 @@ class AccessPrincipal:
         return max(self.max_calls - self.calls_used, 0)
 
 
+class PrincipalCache:
+    """
+    进程内的短 TTL 访问身份缓存
+
+    键为校验通过的会话 Cookie 载荷 ``(aid, uid, exp)``，命中时中间件无需再查询
+    TrialAccess。额度用完、或扣减时发现访问码已被停用时，通过 ``invalidate_access``
+    在本进程中显式失效。
+
+    应用中没有停用访问码的接口，停用只能直接修改数据库，因此各 worker 中的缓存
+    最多在 TTL（``PRINCIPAL_CACHE_TTL_SECONDS``）后才失效；这段时间内只读请求仍可
+    通过，扣减调用次数的请求则由数据库中的条件 UPDATE 拒绝并立即清除缓存。
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 1024) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple[AccessPrincipal, float]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[AccessPrincipal]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at <= time.monotonic() or principal.expires_at <= datetime.utcnow():
+            self._entries.pop(key, None)
+            return None
+        self._entries.move_to_end(key)
+        return principal
+
+    def set(self, key: Hashable, principal: AccessPrincipal) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        self._entries[key] = (principal, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def update_access(self, principal: AccessPrincipal) -> None:
+        """用最新的额度信息替换同一访问码的缓存条目，保留原有过期时间。"""
+        for key, (_, expires_at) in list(self._entries.items()):
+            if _cache_key_access_id(key) == principal.access_id:
+                self._entries[key] = (principal, expires_at)
+
+    def invalidate_access(self, access_id: int) -> None:
+        for key in [key for key in self._entries if _cache_key_access_id(key) == access_id]:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def _cache_key_access_id(key: Hashable) -> Optional[int]:
+    return key[0] if isinstance(key, tuple) and key else None
+
+
+PRINCIPAL_CACHE = PrincipalCache(
+    ttl_seconds=float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30")),
+    max_entries=int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "1024")),
+)
+
+
 def _secret(name: str) -> str:
     value = os.getenv(name, "")
     if not value:
@@ -54,6 +123,11 @@ def trial_access_required() -> bool:
 
 
 async def ensure_local_dev_access(db: AsyncSession) -> AccessPrincipal:
+    cache_key = (0, LOCAL_DEV_USER_ID)
+    cached = PRINCIPAL_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     result = await db.execute(
         select(models.User).where(models.User.id == LOCAL_DEV_USER_ID)
     )
@@ -69,7 +143,7 @@ async def ensure_local_dev_access(db: AsyncSession) -> AccessPrincipal:
         db.add(user)
         await db.commit()
 
-    return AccessPrincipal(
+    principal = AccessPrincipal(
         access_id=0,
         user_id=LOCAL_DEV_USER_ID,
         label=LOCAL_DEV_LABEL,
@@ -77,6 +151,8 @@ async def ensure_local_dev_access(db: AsyncSession) -> AccessPrincipal:
         max_calls=10**9,
         calls_used=0,
     )
+    PRINCIPAL_CACHE.set(cache_key, principal)
+    return principal
 
 
 def create_session_cookie(access: models.TrialAccess) -> str:
@@ -129,6 +205,11 @@ async def authenticate_request(request: Request, db: AsyncSession) -> AccessPrin
         raise HTTPException(status_code=401, detail="请先输入试用访问码")
 
     payload = decode_session_cookie(cookie)
+    cache_key = (payload["aid"], payload["uid"], payload["exp"])
+    cached = PRINCIPAL_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
     result = await db.execute(
         select(models.TrialAccess).where(models.TrialAccess.id == payload["aid"])
     )
@@ -142,7 +223,7 @@ async def authenticate_request(request: Request, db: AsyncSession) -> AccessPrin
     ):
         raise HTTPException(status_code=401, detail="访问码已失效")
 
-    return AccessPrincipal(
+    principal = AccessPrincipal(
         access_id=access.id,
         user_id=access.user_id,
         label=access.label,
@@ -150,6 +231,8 @@ async def authenticate_request(request: Request, db: AsyncSession) -> AccessPrin
         max_calls=access.max_calls,
         calls_used=access.calls_used,
     )
+    PRINCIPAL_CACHE.set(cache_key, principal)
+    return principal
 
 
 def current_access(request: Request) -> AccessPrincipal:
@@ -159,20 +242,175 @@ def current_access(request: Request) -> AccessPrincipal:
     return principal
 
 
-async def consume_call(db: AsyncSession, principal: AccessPrincipal) -> int:
-    if principal.access_id == 0:
-        return principal.calls_remaining
+async def _reserve_calls(
+    db: AsyncSession,
+    access_id: int,
+    count: int = 1,
+) -> Optional[Tuple[int, int]]:
+    """
+    用一条条件 UPDATE 原子地预占调用额度
 
+    Returns:
+        预占成功时返回 ``(calls_used, max_calls)``；访问码无效、过期或剩余额度
+        不足 ``count`` 时返回 None
+    """
+    table = models.TrialAccess
+    now = datetime.utcnow()
+    result = await db.execute(
+        update(table)
+        .where(
+            table.id == access_id,
+            table.is_active.is_(True),
+            table.expires_at > now,
+            table.calls_used + count <= table.max_calls,
+        )
+        .values(calls_used=table.calls_used + count, last_used_at=now)
+        .returning(table.calls_used, table.max_calls)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.first()
+    await db.commit()
+    if row is None:
+        return None
+    return row.calls_used, row.max_calls
+
+
+async def _reject_call(db: AsyncSession, principal: AccessPrincipal) -> None:
+    """预占失败后区分访问码失效（401）与额度用完（429）"""
+    PRINCIPAL_CACHE.invalidate_access(principal.access_id)
     result = await db.execute(
         select(models.TrialAccess).where(models.TrialAccess.id == principal.access_id)
     )
     access = result.scalars().first()
     if not access or not access.is_active or access.expires_at <= datetime.utcnow():
         raise HTTPException(status_code=401, detail="访问码已失效")
-    if access.calls_used >= access.max_calls:
-        raise HTTPException(status_code=429, detail="该访问码的试用调用额度已用完")
+    raise HTTPException(status_code=429, detail="该访问码的试用调用额度已用完")
 
-    access.calls_used += 1
-    access.last_used_at = datetime.utcnow()
-    await db.commit()
-    return max(access.max_calls - access.calls_used, 0)
+
+class QuotaLeases:
+    """
+    高频场景下的批量额度预占
+
+    每次访问数据库时一次性预占 ``batch_size`` 次调用（剩余不足时退回单次预占），
+    之后的调用在内存中扣减。额度上限仍由数据库中的条件 UPDATE 保证，多个 worker
+    不会超额；未用完的预占额度由 ``flush`` 定期归还。代价是访问码被停用后，
+    本进程最多还能消费手上剩余的预占额度。
+    """
+
+    def __init__(self, batch_size: int) -> None:
+        self.batch_size = batch_size
+        # access_id -> [未使用的预占次数, 数据库中剩余的未预占额度]
+        self._leases: Dict[int, list] = {}
+        # 只在有协程持有或等待时保留，之后随引用消失自动回收
+        self._locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    @property
+    def enabled(self) -> bool:
+        return self.batch_size > 1
+
+    def _take(self, principal: AccessPrincipal) -> Optional[int]:
+        lease = self._leases.get(principal.access_id)
+        if not lease or lease[0] <= 0 or principal.expires_at <= datetime.utcnow():
+            return None
+        lease[0] -= 1
+        return lease[0] + lease[1]
+
+    async def consume(self, db: AsyncSession, principal: AccessPrincipal) -> int:
+        remaining = self._take(principal)
+        if remaining is not None:
+            return remaining
+
+        # 同一访问码的并发请求只由一个协程去数据库预占，其余等待后直接扣减
+        lock = self._locks.get(principal.access_id)
+        if lock is None:
+            lock = self._locks[principal.access_id] = asyncio.Lock()
+        async with lock:
+            remaining = self._take(principal)
+            if remaining is not None:
+                return remaining
+
+            reserved = self.batch_size
+            row = await _reserve_calls(db, principal.access_id, reserved)
+            if row is None:
+                reserved = 1
+                row = await _reserve_calls(db, principal.access_id, reserved)
+            if row is None:
+                await _reject_call(db, principal)
+
+            calls_used, max_calls = row
+            lease = self._leases.setdefault(principal.access_id, [0, 0])
+            lease[0] += reserved - 1
+            lease[1] = max(max_calls - calls_used, 0)
+            return lease[0] + lease[1]
+
+    async def flush(self, session_factory: Callable[[], AsyncSession]) -> int:
+        """把未使用的预占额度归还数据库，返回归还的总次数"""
+        pending = {access_id: lease[0] for access_id, lease in self._leases.items() if lease[0] > 0}
+        self._leases.clear()
+        if not pending:
+            return 0
+
+        table = models.TrialAccess
+        try:
+            async with session_factory() as db:
+                for access_id, unused in pending.items():
+                    await db.execute(
+                        update(table)
+                        .where(table.id == access_id, table.calls_used >= unused)
+                        .values(calls_used=table.calls_used - unused)
+                        .execution_options(synchronize_session=False)
+                    )
+                await db.commit()
+        except Exception:
+            # 归还失败时放回内存，下次 flush 重试，避免丢失预占额度
+            for access_id, unused in pending.items():
+                self._leases.setdefault(access_id, [0, 0])[0] += unused
+            raise
+        return sum(pending.values())
+
+    async def run_periodic_flush(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        interval_seconds: float,
+    ) -> None:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            # 取消时先等进行中的归还完成再退出，避免与停机时的最后一次 flush 重叠
+            flush = asyncio.ensure_future(self._flush_logged(session_factory))
+            try:
+                await asyncio.shield(flush)
+            except asyncio.CancelledError:
+                await flush
+                raise
+
+    async def _flush_logged(self, session_factory: Callable[[], AsyncSession]) -> None:
+        try:
+            await self.flush(session_factory)
+        except Exception as e:
+            logger.warning(f"归还预占调用额度失败: {str(e)}", exc_info=True)
+
+
+QUOTA_LEASES = QuotaLeases(batch_size=int(os.getenv("QUOTA_BATCH_SIZE", "0")))
+QUOTA_FLUSH_INTERVAL_SECONDS = float(os.getenv("QUOTA_FLUSH_INTERVAL_SECONDS", "10"))
+
+
+async def consume_call(db: AsyncSession, principal: AccessPrincipal) -> int:
+    if principal.access_id == 0:
+        return principal.calls_remaining
+
+    if QUOTA_LEASES.enabled:
+        remaining = await QUOTA_LEASES.consume(db, principal)
+    else:
+        row = await _reserve_calls(db, principal.access_id)
+        if row is None:
+            await _reject_call(db, principal)
+        calls_used, max_calls = row
+        remaining = max(max_calls - calls_used, 0)
+
+    if remaining == 0:
+        PRINCIPAL_CACHE.invalidate_access(principal.access_id)
+    else:
+        PRINCIPAL_CACHE.update_access(
+            replace(principal, calls_used=principal.max_calls - remaining)
+        )
+    return remaining
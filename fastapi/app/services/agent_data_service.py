@@ -1,48 +1,217 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import selectinload
-from typing import List, Optional, Dict, Any
+from typing import Callable, Iterator, List, Optional, Dict, Any, Sequence, Tuple
 from datetime import datetime
+import asyncio
+import json
+import logging
+import os
 import uuid
 
 from ..db import models
 from ..schemas import agent_data as schemas
+from .blob_store import BLOB_STORE, BlobNotFound
+
+logger = logging.getLogger(__name__)
+
+# 批量创建时 ID 不可写入的统一错误，不区分已存在的数据属于谁
+ID_CONFLICT_ERROR = "ID冲突"
+WRITE_FAILED_ERROR = "写入失败"
+# 主键或唯一约束冲突：SQLite 的扩展错误名与标准 SQLSTATE
+UNIQUE_VIOLATION_NAMES = {"SQLITE_CONSTRAINT_PRIMARYKEY", "SQLITE_CONSTRAINT_UNIQUE"}
+UNIQUE_VIOLATION_SQLSTATE = "23505"
+
+# 可按需加载的关联关系；列表和详情接口都不序列化关联对象，默认不加载
+AGENT_DATA_RELATIONS = {
+    "user": models.AgentData.user,
+    "session": models.AgentData.session,
+    "message": models.AgentData.message,
+}
+
+# content 序列化后达到该字节数时外置到 blob 存储，0 表示全部内联保存
+BLOB_THRESHOLD_BYTES = int(os.getenv("AGENT_DATA_BLOB_THRESHOLD_BYTES", "65536"))
+CONTENT_MEDIA_TYPE = "application/json"
+
+
+def _is_unique_violation(exc: IntegrityError) -> bool:
+    orig = exc.orig
+    if getattr(orig, "sqlite_errorname", None) in UNIQUE_VIOLATION_NAMES:
+        return True
+    return (getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)) == UNIQUE_VIOLATION_SQLSTATE
+
+
+def encode_content(content: Any) -> bytes:
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+async def _externalize_content(values: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    大内容写入 blob 存储，行内只保留引用、大小与媒体类型
+
+    values 中包含 content 时总会同时写入引用列，内容变小后引用会被清空。
+    """
+    if values.get("content") is None:
+        return values
+    data = encode_content(values["content"])
+    if BLOB_THRESHOLD_BYTES <= 0 or len(data) < BLOB_THRESHOLD_BYTES:
+        values.update(content_ref=None, content_size=None, content_type=None)
+        return values
+    blob = await asyncio.to_thread(BLOB_STORE.put, data)
+    values.update(content=None, content_ref=blob.digest, content_size=blob.size, content_type=CONTENT_MEDIA_TYPE)
+    return values
+
 
 class AgentDataService:
     """与AgentData相关的业务逻辑"""
 
+    @staticmethod
+    def _with_relations(query, relations: Sequence[str] = ()):
+        """为查询追加指定关联关系的 selectinload"""
+        unknown = set(relations) - set(AGENT_DATA_RELATIONS)
+        if unknown:
+            raise ValueError(f"未知的AgentData关联关系: {', '.join(sorted(unknown))}")
+        return query.options(*(selectinload(AGENT_DATA_RELATIONS[name]) for name in relations))
+
+    @staticmethod
+    def _filter_conditions(
+        user_id: Optional[int],
+        session_id: Optional[str] = None,
+        data_type: Optional[str] = None,
+    ) -> list:
+        conditions = [models.AgentData.user_id == user_id]
+        if session_id:
+            conditions.append(models.AgentData.session_id == session_id)
+        if data_type:
+            conditions.append(models.AgentData.type == data_type)
+        return conditions
+
+    @staticmethod
+    def _create_values(agent_data: schemas.AgentDataCreate, user_id: int) -> Dict[str, Any]:
+        return {
+            "id": agent_data.id or str(uuid.uuid4()),
+            "type": agent_data.type,
+            "title": agent_data.title,
+            "content": agent_data.content,
+            "meta_data": agent_data.metadata,
+            "session_id": agent_data.session_id,
+            "message_id": agent_data.message_id,
+            "user_id": user_id,
+        }
+
+    @staticmethod
+    def _update_values(agent_data_update: schemas.AgentDataUpdate) -> Dict[str, Any]:
+        update_data = {}
+        if agent_data_update.type is not None:
+            update_data['type'] = agent_data_update.type
+        if agent_data_update.title is not None:
+            update_data['title'] = agent_data_update.title
+        if agent_data_update.content is not None:
+            update_data['content'] = agent_data_update.content
+        if agent_data_update.metadata is not None:
+            update_data['meta_data'] = agent_data_update.metadata
+        return update_data
+
     @staticmethod
     async def create_agent_data(db: AsyncSession, agent_data: schemas.AgentDataCreate, user_id: int) -> models.AgentData:
-        """创建新的AgentData"""
-        db_agent_data = models.AgentData(
-            id=agent_data.id or str(uuid.uuid4()),
-            type=agent_data.type,
-            title=agent_data.title,
-            content=agent_data.content,
-            meta_data=agent_data.metadata,
-            session_id=agent_data.session_id,
-            message_id=agent_data.message_id,
-            user_id=user_id
+        """创建新的AgentData，INSERT ... RETURNING 一次取回服务端默认值"""
+        values = await _externalize_content(AgentDataService._create_values(agent_data, user_id))
+        result = await db.scalars(
+            insert(models.AgentData).values(**values).returning(models.AgentData)
         )
-        db.add(db_agent_data)
+        db_agent_data = result.one()
         await db.commit()
-        await db.refresh(db_agent_data)
         return db_agent_data
 
+    @staticmethod
+    async def create_agent_data_batch(
+        db: AsyncSession,
+        items: Sequence[schemas.AgentDataCreate],
+        user_id: int,
+    ) -> Tuple[List[models.AgentData], List[schemas.AgentDataBatchFailure]]:
+        """
+        在一个事务中批量创建AgentData
+
+        批次内重复或数据库中已存在的ID记为失败，其余条目通过一条 executemany
+        形式的 INSERT ... RETURNING 写入。数据库仍拒绝写入时（如约束冲突），
+        回退为逐条 SAVEPOINT 写入以定位失败条目。
+
+        ID 全局唯一，已存在的 ID 无论属于哪个用户都只报告同一个通用错误，
+        不向调用方透露其他用户的数据是否存在。
+
+        Returns:
+            (按请求顺序创建的AgentData, 失败条目)
+        """
+        failures: List[schemas.AgentDataBatchFailure] = []
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+        seen = set()
+        for index, item in enumerate(items):
+            values = AgentDataService._create_values(item, user_id)
+            if values["id"] in seen:
+                failures.append(schemas.AgentDataBatchFailure(index=index, id=values["id"], error="批次内ID重复"))
+                continue
+            seen.add(values["id"])
+            pending.append((index, values))
+
+        if pending:
+            existing = set(
+                (
+                    await db.scalars(
+                        select(models.AgentData.id).where(
+                            models.AgentData.id.in_([values["id"] for _, values in pending])
+                        )
+                    )
+                ).all()
+            )
+            for index, values in pending:
+                if values["id"] in existing:
+                    failures.append(schemas.AgentDataBatchFailure(index=index, id=values["id"], error=ID_CONFLICT_ERROR))
+            pending = [(index, values) for index, values in pending if values["id"] not in existing]
+
+        for _, values in pending:
+            await _externalize_content(values)
+
+        created: List[models.AgentData] = []
+        if pending:
+            try:
+                # render_nulls 让值为 None 的条目与其他条目合并为同一批 executemany
+                result = await db.scalars(
+                    insert(models.AgentData).returning(models.AgentData, sort_by_parameter_order=True),
+                    [values for _, values in pending],
+                    execution_options={"render_nulls": True},
+                )
+                created = list(result.all())
+            except IntegrityError:
+                await db.rollback()
+                for index, values in pending:
+                    try:
+                        async with db.begin_nested():
+                            result = await db.scalars(
+                                insert(models.AgentData).values(**values).returning(models.AgentData)
+                            )
+                            created.append(result.one())
+                    except IntegrityError as exc:
+                        # 数据库错误中可能带有约束与其他行的信息，只记录日志；
+                        # 只有主键/唯一约束冲突报告为 ID 冲突，其余约束失败统一报告写入失败
+                        logger.warning(f"批量创建AgentData写入失败 id={values['id']}: {exc.orig}")
+                        error = ID_CONFLICT_ERROR if _is_unique_violation(exc) else WRITE_FAILED_ERROR
+                        failures.append(schemas.AgentDataBatchFailure(index=index, id=values["id"], error=error))
+            await db.commit()
+
+        failures.sort(key=lambda failure: failure.index)
+        return created, failures
+
     @staticmethod
     async def get_agent_data_by_id(
         db: AsyncSession,
         agent_data_id: str,
         user_id: int,
+        relations: Sequence[str] = (),
     ) -> Optional[models.AgentData]:
-        """根据ID获取AgentData"""
+        """根据ID获取AgentData，relations 指定需要一并加载的关联关系"""
         result = await db.execute(
-            select(models.AgentData)
-            .options(
-                selectinload(models.AgentData.user),
-                selectinload(models.AgentData.session),
-                selectinload(models.AgentData.message)
-            )
+            AgentDataService._with_relations(select(models.AgentData), relations)
             .where(
                 models.AgentData.id == agent_data_id,
                 models.AgentData.user_id == user_id,
@@ -57,21 +226,14 @@ class AgentDataService:
         limit: int = 100,
         user_id: Optional[int] = None,
         session_id: Optional[str] = None,
-        data_type: Optional[str] = None
+        data_type: Optional[str] = None,
+        relations: Sequence[str] = (),
     ) -> List[models.AgentData]:
-        """获取AgentData列表"""
-        query = select(models.AgentData).options(
-            selectinload(models.AgentData.user),
-            selectinload(models.AgentData.session),
-            selectinload(models.AgentData.message)
-        )
+        """获取AgentData列表，relations 指定需要一并加载的关联关系"""
+        query = AgentDataService._with_relations(select(models.AgentData), relations)
         
         # 添加过滤条件
-        query = query.where(models.AgentData.user_id == user_id)
-        if session_id:
-            query = query.where(models.AgentData.session_id == session_id)
-        if data_type:
-            query = query.where(models.AgentData.type == data_type)
+        query = query.where(*AgentDataService._filter_conditions(user_id, session_id, data_type))
         
         # 排序和分页
         query = query.order_by(models.AgentData.created_at.desc())
@@ -88,17 +250,52 @@ class AgentDataService:
         data_type: Optional[str] = None
     ) -> int:
         """获取AgentData总数"""
-        query = select(models.AgentData.id)
-        
-        # 添加过滤条件
-        query = query.where(models.AgentData.user_id == user_id)
-        if session_id:
-            query = query.where(models.AgentData.session_id == session_id)
-        if data_type:
-            query = query.where(models.AgentData.type == data_type)
-        
-        result = await db.execute(query)
-        return len(result.scalars().all())
+        result = await db.execute(
+            select(func.count())
+            .select_from(models.AgentData)
+            .where(*AgentDataService._filter_conditions(user_id, session_id, data_type))
+        )
+        return result.scalar_one()
+
+    @staticmethod
+    async def get_agent_data_page(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        user_id: Optional[int] = None,
+        session_id: Optional[str] = None,
+        data_type: Optional[str] = None,
+        relations: Sequence[str] = (),
+    ) -> Tuple[List[models.AgentData], int]:
+        """
+        一次查询同时获取AgentData列表与总数
+
+        总数作为不相关的标量子查询附在每一行上，SQLite 只计算一次且走覆盖索引；
+        ``COUNT(*) OVER ()`` 窗口函数会把所有匹配行（含 content）缓存后再排序，
+        结果集大时反而更慢。页为空时（如 skip 超出范围）退回单独的 COUNT 查询。
+        """
+        conditions = AgentDataService._filter_conditions(user_id, session_id, data_type)
+        total = (
+            select(func.count())
+            .select_from(models.AgentData)
+            .where(*conditions)
+            .scalar_subquery()
+        )
+        query = AgentDataService._with_relations(
+            select(models.AgentData, total.label("total")), relations
+        )
+        query = (
+            query.where(*conditions)
+            .order_by(models.AgentData.created_at.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        rows = (await db.execute(query)).all()
+        if rows:
+            return [row[0] for row in rows], rows[0][1]
+        if skip == 0:
+            return [], 0
+        return [], await AgentDataService.get_agent_data_count(db, user_id, session_id, data_type)
 
     @staticmethod
     async def update_agent_data(
@@ -107,17 +304,8 @@ class AgentDataService:
         agent_data_update: schemas.AgentDataUpdate,
         user_id: int,
     ) -> Optional[models.AgentData]:
-        """更新AgentData"""
-        # 构建更新数据字典
-        update_data = {}
-        if agent_data_update.type is not None:
-            update_data['type'] = agent_data_update.type
-        if agent_data_update.title is not None:
-            update_data['title'] = agent_data_update.title
-        if agent_data_update.content is not None:
-            update_data['content'] = agent_data_update.content
-        if agent_data_update.metadata is not None:
-            update_data['meta_data'] = agent_data_update.metadata
+        """更新AgentData，不存在或不属于当前用户时返回 None"""
+        update_data = await _externalize_content(AgentDataService._update_values(agent_data_update))
         
         if not update_data:
             # 如果没有要更新的数据，直接返回原数据
@@ -126,19 +314,75 @@ class AgentDataService:
         # 添加更新时间
         update_data['updated_at'] = datetime.utcnow()
         
-        # 执行更新
-        await db.execute(
+        # UPDATE ... RETURNING 同时完成存在性检查与取回更新后的数据
+        result = await db.execute(
             update(models.AgentData)
             .where(
                 models.AgentData.id == agent_data_id,
                 models.AgentData.user_id == user_id,
             )
             .values(**update_data)
+            .returning(models.AgentData)
+            .execution_options(populate_existing=True)
         )
+        db_agent_data = result.scalar_one_or_none()
         await db.commit()
-        
-        # 返回更新后的数据
-        return await AgentDataService.get_agent_data_by_id(db, agent_data_id, user_id)
+        return db_agent_data
+
+    @staticmethod
+    async def update_agent_data_batch(
+        db: AsyncSession,
+        items: Sequence[schemas.AgentDataBatchUpdateItem],
+        user_id: int,
+    ) -> Tuple[List[models.AgentData], List[schemas.AgentDataBatchFailure]]:
+        """
+        在一个事务中批量更新AgentData
+
+        一次查询确定当前用户拥有的ID，一次按主键的 executemany UPDATE 写入，
+        再一次查询取回更新后的数据，语句数量与条目数无关。
+
+        Returns:
+            (按请求顺序更新后的AgentData, 失败条目)
+        """
+        owned = set(
+            (
+                await db.scalars(
+                    select(models.AgentData.id).where(
+                        models.AgentData.id.in_([item.id for item in items]),
+                        models.AgentData.user_id == user_id,
+                    )
+                )
+            ).all()
+        )
+        failures: List[schemas.AgentDataBatchFailure] = []
+        updated_ids: List[str] = []
+        params: List[Dict[str, Any]] = []
+        now = datetime.utcnow()
+        for index, item in enumerate(items):
+            if item.id not in owned:
+                failures.append(schemas.AgentDataBatchFailure(index=index, id=item.id, error="AgentData不存在"))
+                continue
+            if item.id in updated_ids:
+                failures.append(schemas.AgentDataBatchFailure(index=index, id=item.id, error="批次内ID重复"))
+                continue
+            updated_ids.append(item.id)
+            update_data = await _externalize_content(AgentDataService._update_values(item))
+            if update_data:
+                params.append({"id": item.id, **update_data, "updated_at": now})
+
+        if params:
+            await db.execute(update(models.AgentData), params)
+            await db.commit()
+
+        if not updated_ids:
+            return [], failures
+        result = await db.scalars(
+            select(models.AgentData)
+            .where(models.AgentData.id.in_(updated_ids))
+            .execution_options(populate_existing=True)
+        )
+        by_id = {item.id: item for item in result.all()}
+        return [by_id[agent_data_id] for agent_data_id in updated_ids], failures
 
     @staticmethod
     async def delete_agent_data(
@@ -157,6 +401,35 @@ class AgentDataService:
         await db.commit()
         return result.rowcount > 0
 
+    @staticmethod
+    async def delete_agent_data_batch(
+        db: AsyncSession,
+        agent_data_ids: Sequence[str],
+        user_id: int,
+    ) -> Tuple[List[str], List[schemas.AgentDataBatchFailure]]:
+        """
+        用一条 DELETE ... RETURNING 批量删除AgentData
+
+        Returns:
+            (已删除的ID, 不存在或不属于当前用户的条目)
+        """
+        result = await db.execute(
+            delete(models.AgentData)
+            .where(
+                models.AgentData.id.in_(agent_data_ids),
+                models.AgentData.user_id == user_id,
+            )
+            .returning(models.AgentData.id)
+        )
+        deleted = set(result.scalars().all())
+        await db.commit()
+        failures = [
+            schemas.AgentDataBatchFailure(index=index, id=agent_data_id, error="AgentData不存在")
+            for index, agent_data_id in enumerate(agent_data_ids)
+            if agent_data_id not in deleted
+        ]
+        return [agent_data_id for agent_data_id in dict.fromkeys(agent_data_ids) if agent_data_id in deleted], failures
+
     @staticmethod
     async def get_agent_data_by_session(
         db: AsyncSession,
@@ -195,4 +468,41 @@ class AgentDataService:
         )
         return result.scalars().all()
 
-    
+    @staticmethod
+    async def load_content(agent_data: models.AgentData) -> Any:
+        """读取AgentData的完整内容，外置内容从 blob 存储读取"""
+        if not agent_data.content_ref:
+            return agent_data.content
+        data = await asyncio.to_thread(BLOB_STORE.read, agent_data.content_ref)
+        return json.loads(data)
+
+    @staticmethod
+    def open_content(agent_data: models.AgentData) -> Tuple[int, Callable[[int, int], Iterator[bytes]]]:
+        """
+        返回内容的字节数与按闭区间读取内容的函数
+
+        Raises:
+            BlobNotFound: 外置内容的 blob 文件不存在
+        """
+        if agent_data.content_ref:
+            digest = agent_data.content_ref
+            if not BLOB_STORE.exists(digest):
+                raise BlobNotFound(digest)
+            return agent_data.content_size, lambda start, end: BLOB_STORE.iter_range(digest, start, end)
+        data = encode_content(agent_data.content)
+        return len(data), lambda start, end: iter([data[start:end + 1]])
+
+    @staticmethod
+    async def collect_unreferenced_blobs(db: AsyncSession) -> int:
+        """
+        删除没有任何AgentData引用的 blob，返回删除数量
+
+        blob 按内容去重、可被多行共享，删除行时不会同步删除 blob；
+        刚写入或复用、引用行尚未提交的 blob 由宽限期保护，不会被删除。
+        """
+        result = await db.scalars(
+            select(models.AgentData.content_ref)
+            .where(models.AgentData.content_ref.is_not(None))
+            .distinct()
+        )
+        return await asyncio.to_thread(BLOB_STORE.collect_garbage, result.all())
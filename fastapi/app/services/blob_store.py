@@ -0,0 +1,183 @@
+"""
+按内容寻址的本地文件 blob 存储。
+
+blob 以未压缩内容的 sha256 命名，存放在 ``<root>/<前两位>/<sha256>[.zst]``，
+相同内容只保存一份。开启压缩时使用 zstd，压缩后不变小的内容仍以原样保存。
+写入先落到临时文件再原子重命名，并发写入同一内容也不会读到半个文件。
+
+``put`` 在引用它的行提交之前就已写入文件，垃圾回收跳过修改时间在宽限期内的
+blob；复用已有 blob 时会刷新其修改时间，避免刚被引用的旧文件被回收。
+
+通过 ``AGENT_DATA_BLOB_DIR``、``AGENT_DATA_BLOB_COMPRESSION=zstd|none``、
+``AGENT_DATA_BLOB_GC_GRACE_SECONDS`` 配置。
+"""
+import hashlib
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+import zstandard
+
+from app.core.env import FASTAPI_ROOT
+
+
+COMPRESSED_SUFFIX = ".zst"
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_GC_GRACE_SECONDS = 3600
+
+
+@dataclass(frozen=True)
+class BlobRef:
+    digest: str
+    size: int
+    stored_size: int
+
+
+class BlobNotFound(FileNotFoundError):
+    pass
+
+
+class BlobStore:
+    """按 sha256 去重的本地 blob 存储"""
+
+    def __init__(
+        self,
+        root: Path,
+        compress: bool = True,
+        level: int = 3,
+        gc_grace_seconds: float = DEFAULT_GC_GRACE_SECONDS,
+    ) -> None:
+        self.root = Path(root)
+        self.compress = compress
+        self.level = level
+        self.gc_grace_seconds = gc_grace_seconds
+
+    def put(self, data: bytes) -> BlobRef:
+        """写入内容并返回引用；内容已存在时直接复用"""
+        digest = hashlib.sha256(data).hexdigest()
+        existing = self._find(digest)
+        if existing is not None:
+            try:
+                # 刷新修改时间，复用的 blob 在宽限期内不会被回收
+                os.utime(existing)
+                return BlobRef(digest=digest, size=len(data), stored_size=existing.stat().st_size)
+            except FileNotFoundError:
+                # 恰好被垃圾回收删除，重新写入
+                pass
+
+        payload, suffix = data, ""
+        if self.compress:
+            compressed = zstandard.ZstdCompressor(level=self.level).compress(data)
+            if len(compressed) < len(data):
+                payload, suffix = compressed, COMPRESSED_SUFFIX
+
+        path = self._path(digest, suffix)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(payload)
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        return BlobRef(digest=digest, size=len(data), stored_size=len(payload))
+
+    def read(self, digest: str) -> bytes:
+        return b"".join(self.iter_range(digest))
+
+    def iter_range(
+        self,
+        digest: str,
+        start: int = 0,
+        end: Optional[int] = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> Iterator[bytes]:
+        """
+        按未压缩内容的字节区间 [start, end] 逐块读取
+
+        Args:
+            digest: blob 的 sha256
+            start: 起始偏移（含）
+            end: 结束偏移（含），None 表示读到末尾
+            chunk_size: 每块大小
+        """
+        path = self._find(digest)
+        if path is None:
+            raise BlobNotFound(digest)
+        remaining = None if end is None else end - start + 1
+
+        with path.open("rb") as raw:
+            if path.suffix == COMPRESSED_SUFFIX:
+                stream = zstandard.ZstdDecompressor().stream_reader(raw)
+                _skip(stream, start, chunk_size)
+            else:
+                stream = raw
+                stream.seek(start)
+            while remaining is None or remaining > 0:
+                size = chunk_size if remaining is None else min(chunk_size, remaining)
+                chunk = stream.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def exists(self, digest: str) -> bool:
+        return self._find(digest) is not None
+
+    def collect_garbage(self, referenced: Iterable[str]) -> int:
+        """
+        删除不再被引用的 blob，返回删除数量
+
+        修改时间在 ``gc_grace_seconds`` 内的 blob 即使未被引用也保留：
+        它们可能刚由 ``put`` 写入或复用，引用它们的行还没有提交。
+        """
+        keep = set(referenced)
+        cutoff = time.time() - self.gc_grace_seconds
+        removed = 0
+        for path in self.root.glob("*/*"):
+            if path.name.startswith(".tmp-"):
+                continue
+            digest = path.name[: -len(COMPRESSED_SUFFIX)] if path.suffix == COMPRESSED_SUFFIX else path.name
+            if digest in keep:
+                continue
+            try:
+                if path.stat().st_mtime > cutoff:
+                    continue
+            except FileNotFoundError:
+                continue
+            path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def _path(self, digest: str, suffix: str = "") -> Path:
+        return self.root / digest[:2] / f"{digest}{suffix}"
+
+    def _find(self, digest: str) -> Optional[Path]:
+        if len(digest) != 64 or any(char not in "0123456789abcdef" for char in digest):
+            return None
+        for suffix in ("", COMPRESSED_SUFFIX):
+            path = self._path(digest, suffix)
+            if path.exists():
+                return path
+        return None
+
+
+def _skip(stream, count: int, chunk_size: int) -> None:
+    while count > 0:
+        chunk = stream.read(min(chunk_size, count))
+        if not chunk:
+            break
+        count -= len(chunk)
+
+
+BLOB_STORE = BlobStore(
+    Path(os.getenv("AGENT_DATA_BLOB_DIR", str(FASTAPI_ROOT / "blobs"))),
+    compress=os.getenv("AGENT_DATA_BLOB_COMPRESSION", "zstd").lower() == "zstd",
+    gc_grace_seconds=float(os.getenv("AGENT_DATA_BLOB_GC_GRACE_SECONDS", str(DEFAULT_GC_GRACE_SECONDS))),
+)
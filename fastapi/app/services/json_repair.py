@@ -0,0 +1,116 @@
+"""
+LLM 输出的宽松 JSON 解析。
+
+先按严格 JSON 解析；失败时做一次本地修复再解析：
+
+- 取出 ```json 代码块或第一个 ``{``/``[`` 开始的 JSON 片段，丢弃前后的说明文字
+- 删除字符串之外的 ``//``、``/* */`` 注释与 ``}``、``]`` 前的尾随逗号
+- 把字符串之外的 ``True``/``False``/``None`` 换成 JSON 字面量
+- 输出被截断时补齐未闭合的字符串与括号
+
+修复只处理上述常见问题，仍无法解析时抛出 ``json.JSONDecodeError``。
+"""
+import json
+import re
+from typing import Any, List, Tuple
+
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)(?:```|$)", re.DOTALL | re.IGNORECASE)
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_CLOSING = {"{": "}", "[": "]"}
+
+
+def _extract(text: str) -> str:
+    fence = _FENCE.search(text)
+    if fence and ("{" in fence.group(1) or "[" in fence.group(1)):
+        text = fence.group(1)
+    starts = [index for index in (text.find("{"), text.find("[")) if index >= 0]
+    return text[min(starts):] if starts else text
+
+
+def repair_json(text: str) -> str:
+    """返回修复后的 JSON 文本，只做与字符串内容无关的结构修复"""
+    source = _extract(text)
+    output: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escaped = False
+    index = 0
+    while index < len(source):
+        char = source[index]
+        if in_string:
+            output.append(char)
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            index += 1
+            continue
+
+        if source.startswith("//", index):
+            newline = source.find("\n", index)
+            index = len(source) if newline < 0 else newline
+            continue
+        if source.startswith("/*", index):
+            end = source.find("*/", index + 2)
+            index = len(source) if end < 0 else end + 2
+            continue
+
+        if char == '"':
+            in_string = True
+        elif char in _CLOSING:
+            stack.append(_CLOSING[char])
+        elif char in "}]":
+            _strip_trailing_comma(output)
+            if stack and stack[-1] == char:
+                stack.pop()
+            if not stack:
+                output.append(char)
+                break
+        elif char.isalpha():
+            end = index
+            while end < len(source) and source[end].isalnum():
+                end += 1
+            word = source[index:end]
+            output.append(_PYTHON_LITERALS.get(word, word))
+            index = end
+            continue
+        output.append(char)
+        index += 1
+
+    # 输出被截断：补齐字符串与括号
+    if in_string:
+        if escaped:
+            output.pop()
+        output.append('"')
+    while stack:
+        _strip_trailing_comma(output)
+        output.append(stack.pop())
+    return "".join(output).strip()
+
+
+def _strip_trailing_comma(output: List[str]) -> None:
+    position = len(output) - 1
+    while position >= 0 and output[position].isspace():
+        position -= 1
+    if position >= 0 and output[position] == ",":
+        del output[position]
+
+
+def loads_tolerant(text: str) -> Tuple[Any, bool]:
+    """
+    解析 LLM 输出的 JSON
+
+    Returns:
+        (解析结果, 是否经过修复)
+
+    Raises:
+        json.JSONDecodeError: 修复后仍无法解析
+    """
+    try:
+        return json.loads(text.strip()), False
+    except json.JSONDecodeError:
+        pass
+    return json.loads(repair_json(text)), True
@@ -1,13 +1,19 @@
 from langchain_openai import ChatOpenAI
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
+import logging
 import os
+from typing import Any, Dict, Optional
 from ..core.env import load_app_env
 
 load_app_env()
 
+logger = logging.getLogger(__name__)
+
 DEEPSEEK_API_BASE = os.getenv("DEEPSEEK_API_BASE", "https://api.deepseek.com/v1")
 MAIN_AGENT_MODEL = os.getenv("AGENT_MAIN_MODEL", "deepseek-v4-flash")
 TOOL_LIBRARY_MODEL = os.getenv("TOOL_LIBRARY_MODEL", "deepseek-v4-flash")
+# 规划器与工具选择器请求 JSON 输出（response_format=json_object），不支持的模型自动忽略
+LLM_JSON_MODE_ENABLED = os.getenv("LLM_JSON_MODE", "true").lower() == "true"
 
 
 def _resolve_model_name(model_name: str) -> str:
@@ -18,6 +24,14 @@ def _resolve_model_name(model_name: str) -> str:
     return aliases.get(model_name, model_name)
 
 
+def supports_json_mode(model_name: str) -> bool:
+    """DeepSeek 对话模型与智谱 GLM 支持 response_format=json_object，推理模型不支持"""
+    model_name = _resolve_model_name(model_name)
+    if model_name.startswith("deepseek-"):
+        return "reasoner" not in model_name
+    return model_name == "chatglm"
+
+
 class LLMService:
     """
     LLM服务类，用于处理用户输入并生成响应
@@ -27,7 +41,7 @@ class LLMService:
     _llm_instances = {}
 
     @classmethod
-    async def get_llm(cls, model_name=MAIN_AGENT_MODEL, stream=False, temperature=0.7):
+    async def get_llm(cls, model_name=MAIN_AGENT_MODEL, stream=False, temperature=0.7, json_mode=False):
         """
         Get or create an LLM instance based on model_name and stream settings
         
@@ -35,14 +49,19 @@ class LLMService:
             model_name: Model to use ('deepseek-v4-pro', 'deepseek-v4-flash', 'chatglm', etc.)
             stream: Whether to enable streaming output
             temperature: 控制输出随机性的温度参数 (0.0-2.0)
+            json_mode: 要求输出 JSON 对象，prompt 中需要出现 "json" 字样
             
         Returns:
             LLM instance
         """
         model_name = _resolve_model_name(model_name)
-        cache_key = f"{model_name}_{stream}_{temperature}"
+        json_mode = json_mode and LLM_JSON_MODE_ENABLED and supports_json_mode(model_name)
+        cache_key = f"{model_name}_{stream}_{temperature}_{json_mode}"
         if cache_key not in cls._llm_instances:
-            cls._llm_instances[cache_key] = cls._create_llm(model_name, stream, temperature)
+            llm = cls._create_llm(model_name, stream, temperature)
+            if json_mode:
+                llm = llm.bind(response_format={"type": "json_object"})
+            cls._llm_instances[cache_key] = llm
         return cls._llm_instances[cache_key]
     
     @staticmethod
@@ -83,11 +102,50 @@ class LLMService:
             openai_api_base=url,
             temperature=temperature,
             streaming=stream,
+            # 流式输出时在最后一个分块返回 usage，用于统计上下文缓存命中
+            stream_usage=stream,
             callbacks=[StreamingStdOutCallbackHandler()] if stream else None
         )
         
         return llm
-    
+
+
+def log_prompt_cache_usage(role: str, message: Any, prompt_key: str = "") -> Optional[Dict[str, int]]:
+    """
+    记录一次调用的 prompt token 数与上下文缓存命中数
+
+    DeepSeek 在 usage 中返回 ``prompt_cache_hit_tokens``，兼容 OpenAI 的
+    ``prompt_tokens_details.cached_tokens``；流式输出时只有 ``usage_metadata``。
+
+    Args:
+        role: 调用方角色，如 planner、selector、responder
+        message: LLM 返回的消息或最后一个流式分块
+        prompt_key: prompt 模板版本
+
+    Returns:
+        {"prompt_tokens", "cached_tokens"}，没有 usage 信息时为 None
+    """
+    token_usage = (getattr(message, "response_metadata", None) or {}).get("token_usage") or {}
+    usage_metadata = getattr(message, "usage_metadata", None) or {}
+
+    prompt_tokens = token_usage.get("prompt_tokens") or usage_metadata.get("input_tokens")
+    if not prompt_tokens:
+        return None
+    cached_tokens = token_usage.get("prompt_cache_hit_tokens")
+    if cached_tokens is None:
+        cached_tokens = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+    if cached_tokens is None:
+        cached_tokens = (usage_metadata.get("input_token_details") or {}).get("cache_read")
+    cached_tokens = cached_tokens or 0
+
+    logger.info(
+        f"prompt 缓存: role={role} template={prompt_key or '-'} "
+        f"prompt_tokens={prompt_tokens} cached_tokens={cached_tokens} "
+        f"hit_rate={cached_tokens / prompt_tokens:.0%}"
+    )
+    return {"prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens}
+
+
 def create_llm(model_name=MAIN_AGENT_MODEL, stream=False):
     """
     创建并返回一个 LLM 实例
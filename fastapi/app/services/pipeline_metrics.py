@@ -0,0 +1,87 @@
+"""
+智能体流水线的进程内计数。
+
+记录客户端断开后被取消的生成：取消发生在哪个阶段、因此没有执行的任务数，
+以及按阶段估算省下的 LLM 调用次数（规划之后还有工具选择与最终回复两次调用）。
+
+另外记录规划器、工具选择器输出的解析结果：直接解析成功（parsed）、本地修复后
+成功（repaired）、改用降级方案（fallback）。降级会把任务交给 general_assistant，
+每个任务多一次 LLM 调用。
+"""
+import threading
+from typing import Dict
+
+
+# 各阶段被取消时，之后不再发起的 LLM 调用次数
+LLM_CALLS_REMAINING = {
+    "planning": 2,
+    "tool_selection": 1,
+    "task_execution": 1,
+    "response": 0,
+}
+
+STRUCTURED_OUTPUT_OUTCOMES = ("parsed", "repaired", "fallback")
+
+
+class PipelineMetrics:
+    """线程安全的计数器集合"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._cancelled_turns: Dict[str, int] = {stage: 0 for stage in LLM_CALLS_REMAINING}
+            self._tasks_skipped = 0
+            self._llm_calls_avoided = 0
+            self._cancelled_seconds = 0.0
+            self._structured_output: Dict[str, Dict[str, int]] = {}
+
+    def record_cancelled(self, stage: str, tasks_skipped: int = 0, elapsed_seconds: float = 0.0) -> None:
+        """
+        记录一次被取消的生成
+
+        Args:
+            stage: planning、tool_selection、task_execution 或 response
+            tasks_skipped: 计划中尚未执行的任务数
+            elapsed_seconds: 取消前已运行的时间
+        """
+        with self._lock:
+            self._cancelled_turns[stage] = self._cancelled_turns.get(stage, 0) + 1
+            self._tasks_skipped += max(tasks_skipped, 0)
+            self._llm_calls_avoided += LLM_CALLS_REMAINING.get(stage, 0)
+            self._cancelled_seconds += elapsed_seconds
+
+    def record_structured_output(self, role: str, outcome: str) -> None:
+        """
+        记录一次结构化输出的解析结果
+
+        Args:
+            role: planner 或 selector
+            outcome: parsed、repaired 或 fallback
+        """
+        with self._lock:
+            counts = self._structured_output.setdefault(role, dict.fromkeys(STRUCTURED_OUTPUT_OUTCOMES, 0))
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            structured_output = {}
+            for role, counts in self._structured_output.items():
+                total = sum(counts.values())
+                structured_output[role] = {
+                    **counts,
+                    "fallback_rate": round(counts["fallback"] / total, 4) if total else 0.0,
+                }
+            return {
+                "cancelled_turns": sum(self._cancelled_turns.values()),
+                "cancelled_turns_by_stage": dict(self._cancelled_turns),
+                "cancelled_tasks_skipped": self._tasks_skipped,
+                "cancelled_llm_calls_avoided": self._llm_calls_avoided,
+                "cancelled_elapsed_seconds": round(self._cancelled_seconds, 3),
+                "structured_output": structured_output,
+            }
+
+
+PIPELINE_METRICS = PipelineMetrics()
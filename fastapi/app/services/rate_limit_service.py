@@ -0,0 +1,149 @@
+"""
+登录失败限流存储。
+
+按客户端 key（通常是 IP）统计滑动窗口内的失败次数：
+
+- ``MemoryRateLimitStore``：进程内存储。每个 key 只保留最近 ``max_attempts`` 次
+  失败时间（定长环形缓冲），key 数量由 LRU 上限约束，并定期清理已过窗口的 key；
+- ``DatabaseRateLimitStore``：存储在应用数据库的 ``login_failures`` 表中，
+  多个 uvicorn worker 共享同一份计数。
+
+通过 ``LOGIN_RATE_LIMIT_BACKEND=memory|database`` 选择后端。
+"""
+import logging
+import os
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Callable, Deque, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import models
+
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryRateLimitStore:
+    """固定内存的进程内滑动窗口计数"""
+
+    def __init__(
+        self,
+        max_attempts: int,
+        window: timedelta,
+        max_keys: int = 10000,
+        sweep_interval: timedelta = timedelta(minutes=1),
+    ) -> None:
+        self.max_attempts = max_attempts
+        self.window_seconds = window.total_seconds()
+        self.max_keys = max_keys
+        self.sweep_interval_seconds = sweep_interval.total_seconds()
+        self._attempts: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._next_sweep = 0.0
+
+    async def is_limited(self, key: str) -> bool:
+        now = time.time()
+        self._maybe_sweep(now)
+        attempts = self._attempts.get(key)
+        if not attempts:
+            return False
+        cutoff = now - self.window_seconds
+        return sum(1 for attempt in attempts if attempt > cutoff) >= self.max_attempts
+
+    async def record_failure(self, key: str) -> None:
+        attempts = self._attempts.get(key)
+        if attempts is None:
+            attempts = deque(maxlen=self.max_attempts)
+            self._attempts[key] = attempts
+        attempts.append(time.time())
+        self._attempts.move_to_end(key)
+        while len(self._attempts) > self.max_keys:
+            self._attempts.popitem(last=False)
+
+    async def reset(self, key: str) -> None:
+        self._attempts.pop(key, None)
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        """删除窗口内已没有失败记录的 key，返回删除数量"""
+        cutoff = (now if now is not None else time.time()) - self.window_seconds
+        expired = [key for key, attempts in self._attempts.items() if not attempts or attempts[-1] <= cutoff]
+        for key in expired:
+            del self._attempts[key]
+        return len(expired)
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now >= self._next_sweep:
+            self._next_sweep = now + self.sweep_interval_seconds
+            self.sweep(now)
+
+    def __len__(self) -> int:
+        return len(self._attempts)
+
+
+class DatabaseRateLimitStore:
+    """基于应用数据库的滑动窗口计数，多个 worker 进程共享"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        max_attempts: int,
+        window: timedelta,
+        sweep_interval: timedelta = timedelta(minutes=1),
+    ) -> None:
+        self.session_factory = session_factory
+        self.max_attempts = max_attempts
+        self.window = window
+        self.sweep_interval_seconds = sweep_interval.total_seconds()
+        self._next_sweep = 0.0
+
+    async def is_limited(self, key: str) -> bool:
+        cutoff = datetime.utcnow() - self.window
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(func.count())
+                .select_from(models.LoginFailure)
+                .where(
+                    models.LoginFailure.client_key == key,
+                    models.LoginFailure.attempted_at > cutoff,
+                )
+            )
+            return result.scalar_one() >= self.max_attempts
+
+    async def record_failure(self, key: str) -> None:
+        async with self.session_factory() as db:
+            await self._maybe_sweep(db)
+            db.add(models.LoginFailure(client_key=key, attempted_at=datetime.utcnow()))
+            await db.commit()
+
+    async def reset(self, key: str) -> None:
+        async with self.session_factory() as db:
+            await db.execute(delete(models.LoginFailure).where(models.LoginFailure.client_key == key))
+            await db.commit()
+
+    async def _maybe_sweep(self, db: AsyncSession) -> None:
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval_seconds
+        await db.execute(
+            delete(models.LoginFailure).where(
+                models.LoginFailure.attempted_at <= datetime.utcnow() - self.window
+            )
+        )
+
+
+def create_login_rate_limiter(max_attempts: int, window: timedelta):
+    backend = os.getenv("LOGIN_RATE_LIMIT_BACKEND", "memory").lower()
+    if backend == "database":
+        from app.db.session import async_session
+
+        return DatabaseRateLimitStore(async_session, max_attempts, window)
+    if backend != "memory":
+        logger.warning(f"未知的登录限流后端 {backend}，使用进程内存储")
+    return MemoryRateLimitStore(
+        max_attempts,
+        window,
+        max_keys=int(os.getenv("LOGIN_RATE_LIMIT_MAX_KEYS", "10000")),
+    )
@@ -0,0 +1,100 @@
+"""
+提示词 token 计数。
+
+优先使用 tiktoken（编码由 ``TIKTOKEN_ENCODING`` 指定，默认 cl100k_base，
+与 DeepSeek 的分词器不完全一致，只用于预算估计）。编码文件无法加载时
+（例如离线部署且未设置 ``TIKTOKEN_CACHE_DIR``）退回按字符估算：
+CJK 字符每个计 1 个 token，其余字符每 4 个计 1 个 token。
+
+首次加载编码可能需要下载编码文件，服务启动时用 ``load_in_background`` 在后台
+线程加载，加载完成前同样按字符估算，不会阻塞启动或事件循环。
+"""
+import logging
+import math
+import os
+import re
+import threading
+from typing import Optional
+
+
+logger = logging.getLogger(__name__)
+
+TIKTOKEN_ENCODING = os.getenv("TIKTOKEN_ENCODING", "cl100k_base")
+TRUNCATION_MARK = "…(已截断)"
+
+_CJK_CHARS = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = len(_CJK_CHARS.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class TokenCounter:
+    """延迟加载编码的 token 计数器，加载失败后固定使用估算"""
+
+    def __init__(self, encoding_name: Optional[str] = TIKTOKEN_ENCODING) -> None:
+        self.encoding_name = encoding_name
+        self._encoding = None
+        self._loaded = encoding_name is None
+        self._loading = False
+        self._lock = threading.Lock()
+
+    @property
+    def encoding(self):
+        if not self._loaded:
+            if self._loading:
+                # 后台仍在加载（可能正在下载编码文件），先按字符估算
+                return None
+            self._load()
+        return self._encoding
+
+    def load_in_background(self) -> Optional[threading.Thread]:
+        """在后台线程加载编码，返回加载线程；已加载时返回 None"""
+        if self._loaded or self._loading:
+            return None
+        self._loading = True
+        thread = threading.Thread(target=self._load, name="tiktoken-load", daemon=True)
+        thread.start()
+        return thread
+
+    def _load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                import tiktoken
+
+                self._encoding = tiktoken.get_encoding(self.encoding_name)
+            except Exception as e:
+                logger.warning(f"无法加载 tiktoken 编码 {self.encoding_name}，改用字符估算: {str(e)}")
+            self._loaded = True
+            self._loading = False
+
+    def count(self, text: str) -> int:
+        encoding = self.encoding
+        if encoding is None:
+            return estimate_tokens(text)
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """截断到不超过 ``max_tokens``（含截断标记），结果是确定的"""
+        if self.count(text) <= max_tokens:
+            return text
+        budget = max(max_tokens - self.count(TRUNCATION_MARK), 0)
+        encoding = self.encoding
+        if encoding is not None:
+            return encoding.decode(encoding.encode(text, disallowed_special=())[:budget]) + TRUNCATION_MARK
+
+        # 估算模式下二分查找能放下的最长前缀
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if estimate_tokens(text[:middle]) <= budget:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low] + TRUNCATION_MARK
+
+
+TOKEN_COUNTER = TokenCounter()
@@ -0,0 +1,174 @@
+"""
+工具目录快照。
+
+MCP 工具、本地 skill 与 CampusToolHub 内置工具合成一个只读的 ``ToolCatalog``，
+包含给 LLM 的工具说明、``/api/v1/capabilities`` 使用的 JSON 结构、内容哈希
+与参数校验器。
+工具选择与能力接口共用同一份快照，只有来源发生变化时才重建：
+
+- ``ServerManager._cached_tools`` 在服务初始化或清理时整体替换
+- ``SkillRegistry._skills`` 在重新发现 skill 时整体替换
+- ``CampusToolHub._tool_info`` 初始化后不再变化
+
+因此按来源对象的身份判断是否需要重建，无需每次重新格式化。内容哈希变化时
+``version`` 单调递增，哈希可作为工具选择 prompt 的缓存键。
+"""
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+
+from .campus_tool_hub import CampusToolHub
+from .server_manager import ServerManager
+from .tool_index import ToolIndex
+from .tool_params import ParamValidator, compile_validators
+from ..skills import SkillRegistry
+
+logger = logging.getLogger(__name__)
+
+
+def _serialize_schema(schema: Any) -> Dict[str, Any]:
+    if isinstance(schema, dict):
+        return schema
+    return {}
+
+
+def serialize_skill(skill: Any) -> Dict[str, Any]:
+    activation = SkillRegistry.activate_skill(skill.name)
+    return {
+        "name": skill.name,
+        "description": skill.description,
+        "source": "local-skill",
+        "location": skill.location,
+        "directory": skill.directory,
+        "has_handler": skill.handler is not None,
+        "resources": activation.get("resources", []),
+        "metadata": skill.metadata,
+    }
+
+
+def serialize_tool(tool: Any, server_name: str) -> Dict[str, Any]:
+    return {
+        "name": getattr(tool, "name", ""),
+        "description": getattr(tool, "description", ""),
+        "source": "mcp-tool",
+        "server": server_name,
+        "input_schema": _serialize_schema(getattr(tool, "input_schema", {})),
+    }
+
+
+@dataclass(frozen=True)
+class ToolCatalog:
+    """某一版本的工具目录，构建后只读"""
+
+    version: int
+    digest: str
+    builtin_text: str
+    # MCP 工具与 skill，按名称排序
+    tools: Tuple[Any, ...]
+    tool_items: List[Dict[str, Any]] = field(default_factory=list)
+    skill_items: List[Dict[str, Any]] = field(default_factory=list)
+
+    @cached_property
+    def discovered_text(self) -> str:
+        return "\n".join(tool.format_for_llm() for tool in self.tools)
+
+    @cached_property
+    def text(self) -> str:
+        """完整的工具说明：内置工具在前，其余工具按名称排序"""
+        return "\n".join(item for item in [self.builtin_text, self.discovered_text] if item)
+
+    @cached_property
+    def index(self) -> ToolIndex:
+        return ToolIndex(self.tools)
+
+    @cached_property
+    def validators(self) -> Dict[str, ParamValidator]:
+        """按工具名称索引的参数校验器，随目录版本一起编译"""
+        return compile_validators(self.tools)
+
+    def validator(self, tool_name: str) -> Optional[ParamValidator]:
+        return self.validators.get(tool_name)
+
+    @property
+    def cache_key(self) -> str:
+        return self.digest[:12]
+
+
+class ToolCatalogService:
+    """维护当前工具目录快照"""
+
+    _catalog: Optional[ToolCatalog] = None
+    _sources: Tuple[Any, ...] = ()
+
+    @classmethod
+    def _current_sources(cls) -> Tuple[Any, ...]:
+        SkillRegistry.list_tools()
+        mcp_tools = ServerManager._cached_tools if ServerManager._initialized else None
+        return (mcp_tools, SkillRegistry._skills, CampusToolHub._tool_info)
+
+    @classmethod
+    async def current(cls) -> ToolCatalog:
+        """
+        返回当前工具目录，来源变化时重建
+
+        不会主动初始化 MCP 服务，调用方需要时先调用 ``ServerManager.get_instance()``
+        """
+        await CampusToolHub.get_tool_info_for_planner()
+        sources = cls._current_sources()
+        catalog = cls._catalog
+        if catalog is not None and len(sources) == len(cls._sources) and all(
+            current is previous for current, previous in zip(sources, cls._sources)
+        ):
+            return catalog
+
+        catalog = cls._build(*sources)
+        cls._catalog, cls._sources = catalog, sources
+        return catalog
+
+    @classmethod
+    def _build(cls, mcp_tools: Optional[List[Any]], skills: Dict[str, Any], builtin_text: str) -> ToolCatalog:
+        mcp_tools = list(mcp_tools or [])
+        skill_records = list(skills.values())
+        tool_items = [
+            serialize_tool(tool, getattr(tool, "server_name", "已连接服务"))
+            for tool in mcp_tools
+        ]
+        skill_items = [serialize_skill(skill) for skill in skill_records]
+
+        content = json.dumps(
+            {"builtin": builtin_text, "tools": tool_items, "skills": skill_items},
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+        previous = cls._catalog
+        if previous is None:
+            version = 1
+        elif previous.digest == digest:
+            version = previous.version
+        else:
+            version = previous.version + 1
+
+        catalog = ToolCatalog(
+            version=version,
+            digest=digest,
+            builtin_text=builtin_text,
+            tools=tuple(sorted([*mcp_tools, *skill_records], key=lambda tool: tool.name)),
+            tool_items=tool_items,
+            skill_items=skill_items,
+        )
+        logger.info(
+            f"工具目录已构建: version={version} hash={catalog.cache_key} "
+            f"MCP 工具 {len(tool_items)} 个, skill {len(skill_items)} 个"
+        )
+        return catalog
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """强制下次读取时重建，版本号只在内容变化时递增"""
+        cls._sources = ()
@@ -0,0 +1,132 @@
+"""
+本地工具检索索引。
+
+对工具名、描述与参数名建立 BM25 索引，按任务计划检索最相关的 top-k 工具，
+只把这些工具的说明放进工具选择 prompt。纯本地计算，不访问网络。
+
+中文按相邻两字切分（bigram），英文与数字按单词切分，工具名中的 ``_``、``-``
+视为分隔符，并对工具名词项加权。
+
+通过 ``TOOL_RETRIEVAL_TOP_K``（每个任务检索的工具数）、
+``TOOL_RETRIEVAL_MAX_TOOLS``（合并后的上限）、
+``TOOL_RETRIEVAL_MIN_CATALOG``（工具总数超过该值才启用检索）配置。
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+
+TOOL_RETRIEVAL_TOP_K = int(os.getenv("TOOL_RETRIEVAL_TOP_K", "5"))
+TOOL_RETRIEVAL_MAX_TOOLS = int(os.getenv("TOOL_RETRIEVAL_MAX_TOOLS", "12"))
+TOOL_RETRIEVAL_MIN_CATALOG = int(os.getenv("TOOL_RETRIEVAL_MIN_CATALOG", "12"))
+
+NAME_WEIGHT = 3
+
+_CJK_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff]+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文取 bigram（单字词保留原字），英文数字取小写单词"""
+    text = (text or "").lower()
+    tokens: List[str] = []
+    for run in _CJK_RUN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[index:index + 2] for index in range(len(run) - 1))
+    tokens.extend(_WORD.findall(_CJK_RUN.sub(" ", text)))
+    return tokens
+
+
+def tool_argument_names(tool: Any) -> List[str]:
+    schema = getattr(tool, "input_schema", None) or {}
+    return list((schema.get("properties") or {}).keys())
+
+
+def tool_document(tool: Any) -> List[str]:
+    """工具的检索词项：名称（加权）、描述、参数名"""
+    name = getattr(tool, "name", "")
+    terms = tokenize(name.replace("_", " ").replace("-", " ")) * NAME_WEIGHT
+    terms += tokenize(getattr(tool, "description", "") or "")
+    for argument in tool_argument_names(tool):
+        terms += tokenize(argument.replace("_", " "))
+    return terms
+
+
+class ToolIndex:
+    """BM25 工具索引，构建后只读"""
+
+    def __init__(self, tools: Sequence[Any], k1: float = 1.5, b: float = 0.75) -> None:
+        self.tools = list(tools)
+        self.k1 = k1
+        self.b = b
+        self._term_counts = [Counter(tool_document(tool)) for tool in self.tools]
+        self._lengths = [sum(counts.values()) for counts in self._term_counts]
+        self._average_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+        document_frequency: Counter = Counter()
+        for counts in self._term_counts:
+            document_frequency.update(counts.keys())
+        total = len(self.tools)
+        self._idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequency.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def search(self, query: str, k: int = TOOL_RETRIEVAL_TOP_K) -> List[Tuple[Any, float]]:
+        """返回得分大于 0 的前 ``k`` 个工具，得分相同按名称排序"""
+        query_terms = set(tokenize(query)) & self._idf.keys()
+        if not query_terms:
+            return []
+
+        scored = []
+        for tool, counts, length in zip(self.tools, self._term_counts, self._lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self._average_length)
+            for term in query_terms:
+                frequency = counts.get(term)
+                if frequency:
+                    score += self._idf[term] * frequency * (self.k1 + 1) / (frequency + norm)
+            if score > 0:
+                scored.append((tool, score))
+        scored.sort(key=lambda item: (-item[1], getattr(item[0], "name", "")))
+        return scored[:k]
+
+    def retrieve_for_plan(
+        self,
+        task_plan: Dict[str, Any],
+        k: int = TOOL_RETRIEVAL_TOP_K,
+        limit: int = TOOL_RETRIEVAL_MAX_TOOLS,
+    ) -> List[Any]:
+        """
+        为任务计划中的每个任务分别检索，按任务顺序与得分合并去重
+
+        Args:
+            task_plan: TaskPlanner 生成的任务计划
+            k: 每个任务检索的工具数
+            limit: 合并后的工具数上限
+        """
+        selected: List[Any] = []
+        seen = set()
+        for query in _plan_queries(task_plan):
+            for tool, _ in self.search(query, k):
+                name = getattr(tool, "name", "")
+                if name not in seen:
+                    seen.add(name)
+                    selected.append(tool)
+                if len(selected) >= limit:
+                    return selected
+        return selected
+
+
+def _plan_queries(task_plan: Dict[str, Any]) -> Iterable[str]:
+    for task in (task_plan or {}).get("tasks", []):
+        if isinstance(task, dict):
+            yield f"{task.get('task', '')} {task.get('input', '')}"
+
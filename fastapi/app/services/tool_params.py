@@ -0,0 +1,270 @@
+"""
+工具参数校验。
+
+MCP 工具的 ``input_schema`` 与 skill 在 SKILL.md frontmatter 中声明的
+``input_schema`` 在工具目录构建时编译为校验函数，执行任务前在本地校验 LLM
+生成的参数，不合法的调用不再经过远程调用与重试才失败。
+
+只支持工具 schema 中常用的 JSON Schema 子集：``type``、``properties``、
+``required``、``enum``、``minimum``/``maximum``、``items`` 与
+``additionalProperties: false``。校验时做低成本的修正：
+
+- 数字字符串转为 integer / number，数字与布尔值转为 string
+- 只含一段数字的文本转为 integer，如 ``"100人"``、``"约80"``、``"1,000"``
+- ``"true"``、``"是"`` 等转为 boolean，单个值包装为 array
+- ``format: weekday`` 按 ``normalize_day`` 解析 ``周一``、``星期三``、``明天`` 等
+- ``additionalProperties: false`` 时丢弃未声明的参数
+
+skill 的 schema 额外按宽容模式校验，与处理函数本身的容错一致：超出
+``minimum``/``maximum`` 的数字截断到边界；属性声明了 ``default`` 时，无法修正的值
+换成默认值，``default: null`` 表示丢弃该参数。MCP 工具的 schema 不做这两种修正，
+越界或不合法的参数直接报错。修正后仍不合法的参数返回错误列表，由调用方直接返回错误。
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .course_schedule_service import normalize_day
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_TRUE_TEXT = {"true", "yes", "1", "是", "对"}
+_FALSE_TEXT = {"false", "no", "0", "否", "不"}
+_DIGIT_RUN = re.compile(r"\d+")
+
+# (修正后的值, 错误信息)，错误为 None 表示通过
+Checker = Callable[[Any, str], Tuple[Any, Optional[str]]]
+
+
+@dataclass
+class ParamValidationResult:
+    params: Dict[str, Any]
+    errors: List[str] = field(default_factory=list)
+    # 被修正或丢弃的参数路径
+    repaired: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def _coerce_integer(value: Any, schema: Dict[str, Any]) -> Any:
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if text.lstrip("+-").isdigit():
+            return int(text)
+        # "100人"、"约80"：只有一段数字时取出来；"1.5"、"3到5" 不处理
+        runs = _DIGIT_RUN.findall(text.replace(",", "").replace("，", ""))
+        if len(runs) == 1 and "." not in text:
+            return int(runs[0])
+    return _MISSING
+
+
+def _coerce_number(value: Any, schema: Dict[str, Any]) -> Any:
+    if isinstance(value, str):
+        try:
+            number = float(value.strip())
+        except ValueError:
+            return _MISSING
+        return int(number) if number.is_integer() else number
+    return _MISSING
+
+
+def _coerce_string(value: Any, schema: Dict[str, Any]) -> Any:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return _MISSING
+
+
+def _coerce_boolean(value: Any, schema: Dict[str, Any]) -> Any:
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE_TEXT:
+            return True
+        if text in _FALSE_TEXT:
+            return False
+    return _MISSING
+
+
+def _coerce_array(value: Any, schema: Dict[str, Any]) -> Any:
+    if value is None or isinstance(value, (dict, list)):
+        return _MISSING
+    return [value]
+
+
+_TYPE_CHECKS: Dict[str, Callable[[Any], bool]] = {
+    "string": lambda value: isinstance(value, str),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "array": lambda value: isinstance(value, list),
+    "object": lambda value: isinstance(value, dict),
+    "null": lambda value: value is None,
+}
+_COERCIONS = {
+    "integer": _coerce_integer,
+    "number": _coerce_number,
+    "string": _coerce_string,
+    "boolean": _coerce_boolean,
+    "array": _coerce_array,
+}
+
+
+def _compile(schema: Any, lenient: bool = False) -> Checker:
+    if not isinstance(schema, dict):
+        return lambda value, path: (value, None)
+
+    types = schema.get("type")
+    if isinstance(types, str):
+        types = [types]
+    types = [name for name in types or [] if name in _TYPE_CHECKS]
+    checks = [_TYPE_CHECKS[name] for name in types]
+    coercions = [_COERCIONS[name] for name in types if name in _COERCIONS]
+    weekday = schema.get("format") == "weekday"
+    enum = schema.get("enum")
+    minimum = schema.get("minimum")
+    maximum = schema.get("maximum")
+    has_default = "default" in schema
+    default = _MISSING if schema.get("default") is None else schema.get("default")
+    item_checker = _compile(schema["items"], lenient) if isinstance(schema.get("items"), dict) else None
+    object_checker = _compile_object(schema, lenient) if "object" in types or "properties" in schema else None
+
+    def invalid(value: Any, message: str) -> Tuple[Any, Optional[str]]:
+        if lenient and has_default:
+            return default, None
+        return value, message
+
+    def check(value: Any, path: str) -> Tuple[Any, Optional[str]]:
+        if weekday:
+            day = normalize_day(value)
+            if day is None:
+                return invalid(value, f"{path} 不是有效的星期: {value!r}")
+            value = day
+        if checks and not any(matches(value) for matches in checks):
+            for coerce in coercions:
+                coerced = coerce(value, schema)
+                if coerced is not _MISSING:
+                    value = coerced
+                    break
+            else:
+                return invalid(value, f"{path} 应为 {'/'.join(types)}，实际为 {value!r}")
+
+        if enum is not None and value not in enum:
+            return invalid(value, f"{path} 应为 {enum} 之一，实际为 {value!r}")
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            if minimum is not None and value < minimum:
+                if not lenient:
+                    return value, f"{path} 应不小于 {minimum}，实际为 {value!r}"
+                value = minimum
+            if maximum is not None and value > maximum:
+                if not lenient:
+                    return value, f"{path} 应不大于 {maximum}，实际为 {value!r}"
+                value = maximum
+        if item_checker is not None and isinstance(value, list):
+            items = []
+            for index, item in enumerate(value):
+                item, error = item_checker(item, f"{path}[{index}]")
+                if error:
+                    return value, error
+                if item is not _MISSING:
+                    items.append(item)
+            value = items
+        if object_checker is not None and isinstance(value, dict):
+            return object_checker(value, path)
+        return value, None
+
+    return check
+
+
+def _compile_object(schema: Dict[str, Any], lenient: bool = False) -> Checker:
+    properties = {
+        name: _compile(property_schema, lenient)
+        for name, property_schema in (schema.get("properties") or {}).items()
+    }
+    required = list(schema.get("required") or [])
+    closed = schema.get("additionalProperties") is False
+
+    def check(value: Dict[str, Any], path: str) -> Tuple[Any, Optional[str]]:
+        missing = [name for name in required if value.get(name) in (None, "")]
+        if missing:
+            return value, f"{path} 缺少必填参数 {', '.join(missing)}"
+        result = {}
+        for name, item in value.items():
+            checker = properties.get(name)
+            if checker is None:
+                if not closed:
+                    result[name] = item
+                continue
+            if item is None and name not in required:
+                continue
+            item, error = checker(item, f"{path}.{name}")
+            if error:
+                return value, error
+            if item is not _MISSING:
+                result[name] = item
+        return result, None
+
+    return check
+
+
+class ParamValidator:
+    """由工具 schema 编译得到的参数校验器，``lenient`` 开启截断边界与默认值替换"""
+
+    def __init__(self, tool_name: str, schema: Dict[str, Any], lenient: bool = False) -> None:
+        self.tool_name = tool_name
+        self.schema = schema
+        self.lenient = lenient
+        self._check = _compile_object(schema, lenient)
+
+    def validate(self, params: Dict[str, Any]) -> ParamValidationResult:
+        """
+        校验并修正参数，不修改传入的字典
+
+        Args:
+            params: 已替换占位符的工具参数
+
+        Returns:
+            修正后的参数、错误列表与被修正的参数
+        """
+        params = params or {}
+        checked, error = self._check(params, "params")
+        if error:
+            return ParamValidationResult(params=params, errors=[error])
+        repaired = sorted(
+            name for name in set(params) | set(checked)
+            if params.get(name, _MISSING) != checked.get(name, _MISSING)
+            or type(params.get(name)) is not type(checked.get(name))
+        )
+        return ParamValidationResult(params=checked, repaired=repaired)
+
+
+def tool_input_schema(tool: Any) -> Optional[Dict[str, Any]]:
+    """MCP 工具读取 ``input_schema``，skill 读取 frontmatter 中的 ``input_schema``"""
+    schema = getattr(tool, "input_schema", None)
+    if schema is None:
+        schema = (getattr(tool, "metadata", None) or {}).get("input_schema")
+    if not isinstance(schema, dict) or not (schema.get("properties") or schema.get("required")):
+        return None
+    return schema
+
+
+def compile_validators(tools: Any) -> Dict[str, ParamValidator]:
+    """为声明了参数 schema 的工具编译校验器，schema 不合法的工具跳过校验"""
+    validators = {}
+    for tool in tools:
+        schema = tool_input_schema(tool)
+        if schema is None:
+            continue
+        # 只有 skill 的 schema 来自 frontmatter，按处理函数的宽容程度校验
+        lenient = getattr(tool, "input_schema", None) is None
+        try:
+            validators[tool.name] = ParamValidator(tool.name, schema, lenient=lenient)
+        except Exception as e:
+            logger.warning(f"工具 {tool.name} 的参数 schema 无法编译，跳过校验: {str(e)}")
+    return validators
@@ -1,9 +1,13 @@
+import asyncio
+import hashlib
 import inspect
 import logging
 import os
+import threading
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
 
 try:
     import yaml
@@ -19,6 +23,11 @@ logger = logging.getLogger(__name__)
 
 SkillHandler = Callable[[Dict[str, Any]], Union[Awaitable[Dict[str, Any]], Dict[str, Any]]]
 
+RESOURCE_DIRS = ("scripts", "references", "assets")
+IGNORED_RESOURCE_DIRS = {"__pycache__", ".git"}
+# Seconds between skill directory scans, 0 disables hot reload.
+SKILL_RELOAD_INTERVAL_SECONDS = float(os.getenv("SKILL_RELOAD_INTERVAL_SECONDS", "5"))
+
 
 @dataclass
 class SkillRecord:
@@ -71,18 +80,121 @@ class SkillRegistry:
         "campus-notice": query_campus_notice,
         "venue-booking": query_or_reserve_venue,
     }
+    # Static aliases plus `aliases` declared in SKILL.md frontmatter, rebuilt on reload.
+    _alias_table: Dict[str, str] = dict(_aliases)
+    # SKILL.md path -> ((mtime, size), parsed record, parse diagnostics)
+    _files: Dict[str, Tuple[Tuple[int, int], Optional[SkillRecord], List[str]]] = {}
+    # skill name -> (mtime stamp, activation payload)
+    _activations: Dict[str, Tuple[Tuple[Any, ...], Dict[str, Any]]] = {}
+    _last_reload: Dict[str, Any] = {}
+    _reload_lock = threading.Lock()
     _initialized = False
 
     @classmethod
     def _ensure_initialized(cls) -> None:
         if cls._initialized:
             return
+        cls.reload()
+
+    @classmethod
+    def reload(cls) -> Dict[str, Any]:
+        """Rescan the search paths and swap in the new skill tables.
+
+        Only SKILL.md files whose mtime or size changed are parsed again. The
+        skill, alias and diagnostics tables are built aside and each is swapped
+        in with a single assignment, so concurrent readers see either the old
+        or the new table, never a partial one.
+        """
+        with cls._reload_lock:
+            previous = cls._skills if cls._initialized else {}
+            files: Dict[str, Tuple[Tuple[int, int], Optional[SkillRecord], List[str]]] = {}
+            skills: Dict[str, SkillRecord] = {}
+            diagnostics: List[str] = []
+            parsed: List[str] = []
+            for skills_dir in cls._skill_search_paths():
+                for skill_file in cls._skill_files(skills_dir):
+                    try:
+                        stat = skill_file.stat()
+                    except OSError as exc:
+                        diagnostics.append(f"failed to stat {skill_file}: {exc}")
+                        continue
+                    stamp = (stat.st_mtime_ns, stat.st_size)
+                    entry = cls._files.get(str(skill_file))
+                    if entry is None or entry[0] != stamp:
+                        file_diagnostics: List[str] = []
+                        skill = cls._parse_skill_file(skill_file, file_diagnostics)
+                        entry = (stamp, skill, file_diagnostics)
+                        parsed.append(str(skill_file))
+                    files[str(skill_file)] = entry
+                    diagnostics.extend(entry[2])
+
+                    skill = entry[1]
+                    if skill is None:
+                        continue
+                    existing = skills.get(skill.name)
+                    if existing:
+                        diagnostics.append(
+                            f"skill name collision: {skill.name} at {skill.location} overrides {existing.location}"
+                        )
+                    skill.handler = cls._handlers.get(skill.name)
+                    skills[skill.name] = skill
+
+            aliases = dict(cls._aliases)
+            for skill in skills.values():
+                declared = skill.metadata.get("aliases") or []
+                for alias in [declared] if isinstance(declared, str) else declared:
+                    aliases[str(alias)] = skill.name
+
+            report = {
+                "reloaded_at": time.time(),
+                "added": sorted(set(skills) - set(previous)),
+                "updated": sorted(
+                    name for name, skill in skills.items()
+                    if name in previous and previous[name] is not skill
+                ),
+                "removed": sorted(set(previous) - set(skills)),
+                "parsed_files": parsed,
+                "diagnostics": diagnostics,
+            }
+            changed = report["added"] or report["updated"] or report["removed"]
+            if changed or not cls._initialized or diagnostics != cls._diagnostics:
+                stale = set(report["updated"]) | set(report["removed"])
+                # watch() runs this in a worker thread while activate_skill inserts
+                # on the event loop without the lock, so iterate over a snapshot.
+                # Build every table before assigning any of them.
+                activations = {
+                    name: activation for name, activation in list(cls._activations.items()) if name not in stale
+                }
+                cls._skills = skills
+                cls._alias_table = aliases
+                cls._diagnostics = diagnostics
+                cls._activations = activations
+            cls._files = files
+            if changed and cls._initialized:
+                logger.info(
+                    "Skills reloaded: added=%s updated=%s removed=%s",
+                    report["added"], report["updated"], report["removed"],
+                )
+            for diagnostic in set(diagnostics) - set(cls._last_reload.get("diagnostics", [])):
+                logger.warning("Skill diagnostic: %s", diagnostic)
+            cls._last_reload = report
+            cls._initialized = True
+            return report
+
+    @classmethod
+    async def watch(cls, interval_seconds: float) -> None:
+        """Poll the search paths and hot-reload changed skills, off the event loop."""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(cls.reload)
+            except Exception as exc:
+                logger.warning("Skill reload failed: %s", exc, exc_info=True)
 
-        cls._skills = {}
-        cls._diagnostics = []
-        for skills_dir in cls._skill_search_paths():
-            cls._discover_from_directory(skills_dir)
-        cls._initialized = True
+    @classmethod
+    def reload_status(cls) -> Dict[str, Any]:
+        cls._ensure_initialized()
+        return dict(cls._last_reload)
 
     @classmethod
     def _skill_search_paths(cls) -> List[Path]:
@@ -105,49 +217,40 @@ class SkillRegistry:
         return paths
 
     @classmethod
-    def _discover_from_directory(cls, skills_dir: Path) -> None:
-        for child in sorted(skills_dir.iterdir()):
-            if not child.is_dir() or child.name in {"__pycache__", ".git", "node_modules"}:
-                continue
-
-            skill_file = child / "SKILL.md"
-            if not skill_file.exists():
-                continue
-
-            skill = cls._parse_skill_file(skill_file)
-            if skill is None:
-                continue
-
-            existing = cls._skills.get(skill.name)
-            if existing:
-                cls._diagnostics.append(
-                    f"skill name collision: {skill.name} at {skill.location} overrides {existing.location}"
-                )
-
-            skill.handler = cls._handlers.get(skill.name)
-            cls._skills[skill.name] = skill
+    def _skill_files(cls, skills_dir: Path) -> List[Path]:
+        try:
+            children = sorted(skills_dir.iterdir())
+        except OSError:
+            return []
+        return [
+            child / "SKILL.md"
+            for child in children
+            if child.is_dir()
+            and child.name not in {"__pycache__", ".git", "node_modules"}
+            and (child / "SKILL.md").exists()
+        ]
 
     @classmethod
-    def _parse_skill_file(cls, skill_file: Path) -> Optional[SkillRecord]:
+    def _parse_skill_file(cls, skill_file: Path, diagnostics: List[str]) -> Optional[SkillRecord]:
         try:
             content = skill_file.read_text(encoding="utf-8")
         except OSError as exc:
-            cls._diagnostics.append(f"failed to read {skill_file}: {exc}")
+            diagnostics.append(f"failed to read {skill_file}: {exc}")
             return None
 
         if not content.startswith("---"):
-            cls._diagnostics.append(f"missing frontmatter in {skill_file}")
+            diagnostics.append(f"missing frontmatter in {skill_file}")
             return None
 
         parts = content.split("---", 2)
         if len(parts) < 3:
-            cls._diagnostics.append(f"malformed frontmatter in {skill_file}")
+            diagnostics.append(f"malformed frontmatter in {skill_file}")
             return None
 
         frontmatter_text = parts[1].strip()
         body = parts[2].strip()
 
-        frontmatter = cls._parse_frontmatter(frontmatter_text, skill_file)
+        frontmatter = cls._parse_frontmatter(frontmatter_text, skill_file, diagnostics)
         if frontmatter is None:
             return None
 
@@ -155,13 +258,13 @@ class SkillRegistry:
         description = str(frontmatter.get("description", "")).strip()
 
         if not name:
-            cls._diagnostics.append(f"missing name in {skill_file}")
+            diagnostics.append(f"missing name in {skill_file}")
             return None
         if not description:
-            cls._diagnostics.append(f"missing description in {skill_file}")
+            diagnostics.append(f"missing description in {skill_file}")
             return None
         if name != skill_file.parent.name:
-            cls._diagnostics.append(
+            diagnostics.append(
                 f"skill name {name} does not match directory {skill_file.parent.name}"
             )
 
@@ -178,15 +281,17 @@ class SkillRegistry:
         )
 
     @classmethod
-    def _parse_frontmatter(cls, frontmatter_text: str, skill_file: Path) -> Optional[Dict[str, Any]]:
+    def _parse_frontmatter(
+        cls, frontmatter_text: str, skill_file: Path, diagnostics: List[str]
+    ) -> Optional[Dict[str, Any]]:
         if yaml is not None:
             try:
                 parsed = yaml.safe_load(frontmatter_text) or {}
             except yaml.YAMLError as exc:
-                cls._diagnostics.append(f"unparseable YAML in {skill_file}: {exc}")
+                diagnostics.append(f"unparseable YAML in {skill_file}: {exc}")
                 return None
             if not isinstance(parsed, dict):
-                cls._diagnostics.append(f"frontmatter is not a mapping in {skill_file}")
+                diagnostics.append(f"frontmatter is not a mapping in {skill_file}")
                 return None
             return parsed
 
@@ -196,7 +301,7 @@ class SkillRegistry:
             if not stripped or stripped.startswith("#"):
                 continue
             if ":" not in stripped:
-                cls._diagnostics.append(f"ignored malformed frontmatter line in {skill_file}: {stripped}")
+                diagnostics.append(f"ignored malformed frontmatter line in {skill_file}: {stripped}")
                 continue
             key, value = stripped.split(":", 1)
             parsed[key.strip()] = value.strip().strip("\"'")
@@ -210,7 +315,7 @@ class SkillRegistry:
     @classmethod
     def get_tool(cls, name: str) -> Optional[SkillRecord]:
         cls._ensure_initialized()
-        canonical_name = cls._aliases.get(name, name)
+        canonical_name = cls._alias_table.get(name, name)
         return cls._skills.get(canonical_name)
 
     @classmethod
@@ -219,36 +324,74 @@ class SkillRegistry:
 
     @classmethod
     def activate_skill(cls, name: str) -> Dict[str, Any]:
+        """Return the activation payload: SKILL.md body plus bundled resources.
+
+        Payloads are memoized per skill and rebuilt when the mtime of the skill
+        directory, SKILL.md or any directory under a resource directory changes,
+        so files added or removed in nested directories are picked up too.
+        ``version`` is a content hash that results use to reference the payload.
+        """
         skill = cls.get_tool(name)
         if skill is None:
             return {"error": f"未知 skill: {name}", "tool": name}
 
+        stamp = cls._activation_stamp(skill)
+        cached = cls._activations.get(skill.name)
+        if cached is None or cached[0] != stamp:
+            cached = (stamp, cls._build_activation(skill))
+            cls._activations[skill.name] = cached
+        return dict(cached[1])
+
+    @classmethod
+    def _activation_stamp(cls, skill: SkillRecord) -> Tuple[Any, ...]:
+        skill_dir = Path(skill.directory)
+        paths = [skill_dir, Path(skill.location)]
+        for subdir_name in RESOURCE_DIRS:
+            paths.append(skill_dir / subdir_name)
+            # Same directories _list_bundled_resources walks; a directory's mtime
+            # changes when an entry is added, removed or renamed in it.
+            for root, dirs, _ in os.walk(skill_dir / subdir_name):
+                dirs[:] = [directory for directory in dirs if directory not in IGNORED_RESOURCE_DIRS]
+                paths.extend(Path(root, directory) for directory in sorted(dirs))
+        # Ties the payload to the parsed record contents; str caches its hash.
+        stamp: List[Any] = [skill.location, hash((skill.description, skill.body))]
+        for path in paths:
+            try:
+                stamp.append((str(path), path.stat().st_mtime_ns))
+            except OSError:
+                stamp.append((str(path), None))
+        return tuple(stamp)
+
+    @classmethod
+    def _build_activation(cls, skill: SkillRecord) -> Dict[str, Any]:
         resources = cls._list_bundled_resources(Path(skill.directory))
+        content = (
+            f'<skill_content name="{skill.name}">\n'
+            f"{skill.body}\n\n"
+            f"Skill directory: {skill.directory}\n"
+            "Relative paths in this skill are relative to the skill directory.\n"
+            f"{cls._format_resources(resources)}\n"
+            "</skill_content>"
+        )
         return {
             "name": skill.name,
+            "version": hashlib.sha256(content.encode("utf-8")).hexdigest()[:12],
             "description": skill.description,
             "location": skill.location,
             "directory": skill.directory,
-            "content": (
-                f'<skill_content name="{skill.name}">\n'
-                f"{skill.body}\n\n"
-                f"Skill directory: {skill.directory}\n"
-                "Relative paths in this skill are relative to the skill directory.\n"
-                f"{cls._format_resources(resources)}\n"
-                "</skill_content>"
-            ),
+            "content": content,
             "resources": resources,
         }
 
     @classmethod
     def _list_bundled_resources(cls, skill_dir: Path, limit: int = 200) -> List[str]:
         resources: List[str] = []
-        for subdir_name in ("scripts", "references", "assets"):
+        for subdir_name in RESOURCE_DIRS:
             subdir = skill_dir / subdir_name
             if not subdir.exists() or not subdir.is_dir():
                 continue
             for root, dirs, files in os.walk(subdir):
-                dirs[:] = [directory for directory in dirs if directory not in {"__pycache__", ".git"}]
+                dirs[:] = [directory for directory in dirs if directory not in IGNORED_RESOURCE_DIRS]
                 for filename in sorted(files):
                     relative_path = Path(root, filename).relative_to(skill_dir)
                     resources.append(str(relative_path))
@@ -290,7 +433,8 @@ class SkillRegistry:
 
         if isinstance(result, dict):
             result["skill"] = skill.name
-            result["activation"] = activation
+            # Reference the activation instead of inlining it; activate_skill returns the full payload.
+            result["activation"] = {"name": skill.name, "version": activation["version"]}
         return result
 
     @classmethod
@@ -0,0 +1,281 @@
+import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.bootstrap import READ_ROLE, WRITE_ROLE, RoutingSession, create_engine_for_role
+from app.services import access_service
+from app.services.access_service import (
+    COOKIE_NAME,
+    PRINCIPAL_CACHE,
+    AccessPrincipal,
+    QuotaLeases,
+    authenticate_request,
+    consume_call,
+    create_session_cookie,
+    ensure_local_dev_access,
+)
+
+
+def _execute_result(first_value=None):
+    scalars = MagicMock()
+    scalars.first.return_value = first_value
+    result = MagicMock()
+    result.scalars.return_value = scalars
+    return result
+
+
+def _trial_access(**overrides):
+    values = {
+        "id": 7,
+        "user_id": 42,
+        "label": "tester",
+        "expires_at": datetime.utcnow() + timedelta(days=1),
+        "max_calls": 3,
+        "calls_used": 1,
+        "is_active": True,
+        "last_used_at": None,
+    }
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+@pytest.fixture(autouse=True)
+def session_secret(monkeypatch):
+    monkeypatch.setenv("SESSION_SECRET", "test-session-secret")
+    PRINCIPAL_CACHE.clear()
+    yield
+    PRINCIPAL_CACHE.clear()
+
+
+def _request_for(access):
+    return SimpleNamespace(cookies={COOKIE_NAME: create_session_cookie(access)})
+
+
+@pytest.mark.asyncio
+async def test_authenticate_request_caches_principal():
+    access = _trial_access()
+    db = AsyncMock()
+    db.execute.return_value = _execute_result(access)
+    request = _request_for(access)
+
+    first = await authenticate_request(request, db)
+    second = await authenticate_request(request, db)
+
+    assert first == second
+    assert second.calls_remaining == 2
+    db.execute.assert_awaited_once()
+
+
+@pytest_asyncio.fixture
+async def trial_db(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'access.db'}"
+    write_engine = create_engine_for_role(url, WRITE_ROLE)
+    read_engine = create_engine_for_role(url, READ_ROLE)
+    async with write_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    session_factory = sessionmaker(
+        write_engine,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        expire_on_commit=False,
+        info={"read_bind": read_engine.sync_engine},
+    )
+    async with session_factory() as db:
+        db.add(models.User(id=42, username="tester", email="tester@trial.local", password="!"))
+        db.add(
+            models.TrialAccess(
+                id=7,
+                label="tester",
+                token_hash="0" * 64,
+                user_id=42,
+                expires_at=datetime.utcnow() + timedelta(days=1),
+                max_calls=20,
+                calls_used=0,
+            )
+        )
+        await db.commit()
+    yield session_factory
+    await write_engine.dispose()
+    await read_engine.dispose()
+
+
+async def _principal(session_factory):
+    async with session_factory() as db:
+        access = await db.get(models.TrialAccess, 7)
+    return AccessPrincipal(
+        access_id=access.id,
+        user_id=access.user_id,
+        label=access.label,
+        expires_at=access.expires_at,
+        max_calls=access.max_calls,
+        calls_used=access.calls_used,
+    )
+
+
+async def _calls_used(session_factory):
+    async with session_factory() as db:
+        return (await db.get(models.TrialAccess, 7)).calls_used
+
+
+async def _hammer(session_factory, principal, attempts):
+    async def attempt():
+        async with session_factory() as db:
+            try:
+                return await consume_call(db, principal)
+            except HTTPException as exc:
+                return exc.status_code
+
+    return await asyncio.gather(*(attempt() for _ in range(attempts)))
+
+
+@pytest.mark.asyncio
+async def test_consume_call_refreshes_and_invalidates_cached_principal(trial_db):
+    principal = await _principal(trial_db)
+    PRINCIPAL_CACHE.set((7, 42, 0), principal)
+
+    async with trial_db() as db:
+        assert await consume_call(db, principal) == 19
+    assert PRINCIPAL_CACHE.get((7, 42, 0)).calls_used == 1
+
+    async with trial_db() as db:
+        await db.execute(
+            update(models.TrialAccess).where(models.TrialAccess.id == 7).values(calls_used=19)
+        )
+        await db.commit()
+        assert await consume_call(db, principal) == 0
+    # 额度用完后缓存失效，下一次请求重新查询数据库
+    assert PRINCIPAL_CACHE.get((7, 42, 0)) is None
+
+    async with trial_db() as db:
+        with pytest.raises(HTTPException) as exc_info:
+            await consume_call(db, principal)
+    assert exc_info.value.status_code == 429
+
+
+@pytest.mark.asyncio
+async def test_concurrent_consume_call_never_exceeds_quota(trial_db):
+    principal = await _principal(trial_db)
+
+    results = await _hammer(trial_db, principal, 50)
+
+    assert sum(1 for result in results if result == 429) == 30
+    assert sorted(result for result in results if result != 429) == list(range(20))
+    assert await _calls_used(trial_db) == 20
+
+
+@pytest.mark.asyncio
+async def test_quota_leases_batch_reservations_and_flush(trial_db, monkeypatch):
+    leases = QuotaLeases(batch_size=8)
+    monkeypatch.setattr(access_service, "QUOTA_LEASES", leases)
+    principal = await _principal(trial_db)
+
+    results = await _hammer(trial_db, principal, 5)
+    assert all(result != 429 for result in results)
+    assert await _calls_used(trial_db) == 8
+
+    assert await leases.flush(trial_db) == 3
+    assert await _calls_used(trial_db) == 5
+
+    results = await _hammer(trial_db, principal, 40)
+    assert sum(1 for result in results if result == 429) == 25
+    assert await _calls_used(trial_db) == 20
+
+
+@pytest.mark.asyncio
+async def test_quota_lease_locks_are_released_after_use(trial_db, monkeypatch):
+    import gc
+
+    leases = QuotaLeases(batch_size=8)
+    monkeypatch.setattr(access_service, "QUOTA_LEASES", leases)
+    principal = await _principal(trial_db)
+
+    await _hammer(trial_db, principal, 5)
+    gc.collect()
+
+    assert len(leases._locks) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_periodic_flush_finishes_before_final_flush(trial_db, monkeypatch):
+    leases = QuotaLeases(batch_size=8)
+    monkeypatch.setattr(access_service, "QUOTA_LEASES", leases)
+    principal = await _principal(trial_db)
+    await _hammer(trial_db, principal, 5)
+
+    started, release = asyncio.Event(), asyncio.Event()
+    real_flush = leases.flush
+
+    async def slow_flush(session_factory):
+        started.set()
+        await release.wait()
+        return await real_flush(session_factory)
+
+    monkeypatch.setattr(leases, "flush", slow_flush)
+    task = asyncio.create_task(leases.run_periodic_flush(trial_db, 0))
+    await started.wait()
+    task.cancel()
+    await asyncio.sleep(0)
+    # 进行中的归还完成前任务不会退出
+    assert not task.done()
+
+    release.set()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert await real_flush(trial_db) == 0
+    assert await _calls_used(trial_db) == 5
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_unused_leases(trial_db, monkeypatch):
+    leases = QuotaLeases(batch_size=8)
+    monkeypatch.setattr(access_service, "QUOTA_LEASES", leases)
+    principal = await _principal(trial_db)
+    await _hammer(trial_db, principal, 5)
+
+    def broken_session():
+        raise RuntimeError("database is locked")
+
+    with pytest.raises(RuntimeError):
+        await leases.flush(broken_session)
+
+    assert await leases.flush(trial_db) == 3
+    assert await _calls_used(trial_db) == 5
+
+
+@pytest.mark.asyncio
+async def test_consume_call_rejects_inactive_access(trial_db):
+    principal = await _principal(trial_db)
+    PRINCIPAL_CACHE.set((7, 42, 0), principal)
+    async with trial_db() as db:
+        await db.execute(
+            update(models.TrialAccess).where(models.TrialAccess.id == 7).values(is_active=False)
+        )
+        await db.commit()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await consume_call(db, principal)
+
+    assert exc_info.value.status_code == 401
+    assert PRINCIPAL_CACHE.get((7, 42, 0)) is None
+    assert await _calls_used(trial_db) == 0
+
+
+@pytest.mark.asyncio
+async def test_local_dev_access_skips_user_lookup_when_cached():
+    db = AsyncMock()
+    db.execute.return_value = _execute_result(SimpleNamespace(id=1))
+
+    await ensure_local_dev_access(db)
+    principal = await ensure_local_dev_access(db)
+
+    assert principal.user_id == access_service.LOCAL_DEV_USER_ID
+    db.execute.assert_awaited_once()
@@ -0,0 +1,276 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.bootstrap import WRITE_ROLE, create_engine_for_role
+from app.schemas import agent_data as schemas
+from app.services import agent_data_service
+from app.services.agent_data_service import AgentDataService, encode_content
+from app.services.blob_store import BlobStore
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_engine_for_role(f"sqlite+aiosqlite:///{tmp_path / 'agent_data.db'}", WRITE_ROLE)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        db.add(models.User(id=1, username="tester", email="tester@trial.local", password="!"))
+        db.add(models.ChatSession(id="session-1", user_id=1))
+        start = datetime(2026, 1, 1)
+        for index in range(30):
+            db.add(
+                models.AgentData(
+                    id=f"data-{index:02d}",
+                    type="table" if index % 3 == 0 else "text",
+                    content={"index": index},
+                    meta_data={"source": "test"},
+                    session_id="session-1",
+                    user_id=1,
+                    created_at=start + timedelta(minutes=index),
+                )
+            )
+        db.add(models.AgentData(id="foreign", type="table", content={}, user_id=2))
+        await db.commit()
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def statements(engine):
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+def _session(engine):
+    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)()
+
+
+@pytest.mark.asyncio
+async def test_count_uses_single_count_query(engine, statements):
+    async with _session(engine) as db:
+        assert await AgentDataService.get_agent_data_count(db, user_id=1) == 30
+        assert await AgentDataService.get_agent_data_count(db, user_id=1, data_type="table") == 10
+
+    assert len(statements) == 2
+    assert all("count(*)" in statement for statement in statements)
+
+
+@pytest.mark.asyncio
+async def test_page_returns_items_and_total_in_one_query(engine, statements):
+    async with _session(engine) as db:
+        items, total = await AgentDataService.get_agent_data_page(db, skip=5, limit=10, user_id=1)
+
+    assert total == 30
+    assert [item.id for item in items] == [f"data-{index:02d}" for index in range(24, 14, -1)]
+    assert len(statements) == 1
+    # 默认不加载关联关系，且结果可以直接转换为响应模式
+    assert {"user", "session", "message"} <= inspect(items[0]).unloaded
+    assert schemas.AgentData.model_validate(items[0]).metadata == {"source": "test"}
+
+
+@pytest.mark.asyncio
+async def test_page_past_the_end_still_reports_total(engine):
+    async with _session(engine) as db:
+        items, total = await AgentDataService.get_agent_data_page(
+            db, skip=50, limit=10, user_id=1, data_type="table"
+        )
+
+    assert items == []
+    assert total == 10
+
+
+@pytest.mark.asyncio
+async def test_relations_are_loaded_only_when_requested(engine):
+    async with _session(engine) as db:
+        plain = await AgentDataService.get_agent_data_by_id(db, "data-00", 1)
+        assert "session" in inspect(plain).unloaded
+
+    async with _session(engine) as db:
+        loaded = await AgentDataService.get_agent_data_by_id(db, "data-00", 1, relations=("session",))
+        assert loaded.session.id == "session-1"
+
+        with pytest.raises(ValueError):
+            await AgentDataService.get_agent_data_list(db, user_id=1, relations=("owner",))
+
+
+def _new(agent_data_id, **overrides):
+    values = {"id": agent_data_id, "type": "table", "content": {"rows": []}, "session_id": "session-1"}
+    values.update(overrides)
+    return schemas.AgentDataCreate(**values)
+
+
+@pytest.mark.asyncio
+async def test_batch_create_writes_in_one_insert_and_reports_failures(engine, statements):
+    items = [_new("new-1"), _new("data-00"), _new("new-2", title="图表"), _new("new-1")]
+
+    async with _session(engine) as db:
+        created, failures = await AgentDataService.create_agent_data_batch(db, items, user_id=1)
+
+    assert [item.id for item in created] == ["new-1", "new-2"]
+    assert created[1].title == "图表"
+    assert created[0].created_at is not None
+    assert [(failure.index, failure.error) for failure in failures] == [(1, "ID冲突"), (3, "批次内ID重复")]
+    inserts = [statement for statement in statements if statement.startswith("INSERT")]
+    assert len(inserts) == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_create_does_not_reveal_other_users_ids(engine):
+    async with _session(engine) as db:
+        _, failures = await AgentDataService.create_agent_data_batch(
+            db, [_new("data-00"), _new("foreign"), _new("missing")], user_id=1
+        )
+
+    # 自己的与其他用户的 ID 冲突报告同样的错误
+    assert [(failure.index, failure.error) for failure in failures] == [(0, "ID冲突"), (1, "ID冲突")]
+    async with _session(engine) as db:
+        assert await AgentDataService.get_agent_data_by_id(db, "foreign", 2) is not None
+
+
+@pytest.mark.asyncio
+async def test_batch_create_isolates_rows_rejected_by_database(engine):
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(
+            "CREATE TRIGGER reject_bad BEFORE INSERT ON agent_data WHEN NEW.title = 'bad' "
+            "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+        )
+        # 模拟预检查之后另一个请求抢先写入了相同 ID
+        await conn.exec_driver_sql(
+            "CREATE TRIGGER race BEFORE INSERT ON agent_data WHEN NEW.id = 'race-1' "
+            "BEGIN INSERT INTO agent_data (id, type, user_id) VALUES ('race-1', 'table', 2); END"
+        )
+
+    async with _session(engine) as db:
+        created, failures = await AgentDataService.create_agent_data_batch(
+            db, [_new("ok-1"), _new("bad-1", title="bad"), _new("race-1"), _new("ok-2")], user_id=1
+        )
+        assert [item.id for item in created] == ["ok-1", "ok-2"]
+        # 只有主键冲突报告为 ID 冲突，其他约束失败不混为 ID 冲突
+        assert [(failure.id, failure.error) for failure in failures] == [("bad-1", "写入失败"), ("race-1", "ID冲突")]
+        assert await AgentDataService.get_agent_data_count(db, user_id=1) == 32
+
+
+@pytest.mark.asyncio
+async def test_batch_update_uses_constant_number_of_statements(engine, statements):
+    items = [
+        schemas.AgentDataBatchUpdateItem(id=f"data-{index:02d}", title=f"标题 {index}")
+        for index in range(20)
+    ] + [schemas.AgentDataBatchUpdateItem(id="foreign", title="越权")]
+
+    async with _session(engine) as db:
+        updated, failures = await AgentDataService.update_agent_data_batch(db, items, user_id=1)
+
+    assert [item.title for item in updated] == [f"标题 {index}" for index in range(20)]
+    assert [(failure.index, failure.id) for failure in failures] == [(20, "foreign")]
+    assert len([statement for statement in statements if statement.startswith("SELECT")]) == 2
+    assert len([statement for statement in statements if statement.startswith("UPDATE")]) == 1
+
+
+@pytest.mark.asyncio
+async def test_single_update_and_batch_delete_skip_existence_queries(engine, statements):
+    async with _session(engine) as db:
+        updated = await AgentDataService.update_agent_data(
+            db, "data-01", schemas.AgentDataUpdate(metadata={"pinned": True}), user_id=1
+        )
+        missing = await AgentDataService.update_agent_data(
+            db, "foreign", schemas.AgentDataUpdate(title="越权"), user_id=1
+        )
+        deleted, failures = await AgentDataService.delete_agent_data_batch(
+            db, ["data-02", "data-03", "foreign"], user_id=1
+        )
+
+    assert updated.meta_data == {"pinned": True}
+    assert missing is None
+    assert deleted == ["data-02", "data-03"]
+    assert [failure.id for failure in failures] == ["foreign"]
+    assert not [statement for statement in statements if statement.startswith("SELECT")]
+
+
+@pytest.fixture
+def blob_store(tmp_path, monkeypatch):
+    store = BlobStore(tmp_path / "blobs", gc_grace_seconds=0)
+    monkeypatch.setattr(agent_data_service, "BLOB_STORE", store)
+    monkeypatch.setattr(agent_data_service, "BLOB_THRESHOLD_BYTES", 1024)
+    return store
+
+
+@pytest.mark.asyncio
+async def test_large_content_is_moved_to_blob_store(engine, blob_store):
+    rows = [[index, "值"] for index in range(500)]
+    async with _session(engine) as db:
+        created, failures = await AgentDataService.create_agent_data_batch(
+            db, [_new("big-1", content={"rows": rows}), _new("big-2", content={"rows": rows}), _new("small")], user_id=1
+        )
+        big, twin, small = created
+
+        assert not failures
+        assert big.content is None and big.content_type == "application/json"
+        assert big.content_ref == twin.content_ref
+        assert big.content_size == len(encode_content({"rows": rows}))
+        assert small.content == {"rows": []} and small.content_ref is None
+        assert await AgentDataService.load_content(big) == {"rows": rows}
+        assert schemas.AgentData.model_validate(big).content is None
+
+        # 内容变小后回到行内保存，引用随之清空
+        updated = await AgentDataService.update_agent_data(
+            db, "big-1", schemas.AgentDataUpdate(content={"rows": []}), user_id=1
+        )
+        assert updated.content == {"rows": []} and updated.content_ref is None
+
+        await AgentDataService.delete_agent_data(db, "big-2", user_id=1)
+        assert await AgentDataService.collect_unreferenced_blobs(db) == 1
+
+
+@pytest.mark.asyncio
+async def test_content_endpoint_serves_byte_ranges(engine, blob_store):
+    from fastapi import FastAPI
+    from httpx import ASGITransport, AsyncClient
+
+    from app.api.v1 import agent_data as agent_data_api
+    from app.db.session import get_db
+    from app.services.access_service import current_access
+
+    content = {"rows": [[index, "值"] for index in range(500)]}
+    async with _session(engine) as db:
+        await AgentDataService.create_agent_data(db, _new("big", content=content), user_id=1)
+
+    async def override_db():
+        async with _session(engine) as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(agent_data_api.router, prefix="/agent-data")
+    app.dependency_overrides[get_db] = override_db
+    app.dependency_overrides[current_access] = lambda: SimpleNamespace(user_id=1)
+    body = encode_content(content)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        full = await client.get("/agent-data/big/content")
+        partial = await client.get("/agent-data/big/content", headers={"Range": "bytes=10-29"})
+        suffix = await client.get("/agent-data/big/content", headers={"Range": "bytes=-5"})
+        invalid = await client.get("/agent-data/big/content", headers={"Range": f"bytes={len(body)}-"})
+        listed = await client.get("/agent-data/big")
+
+    assert full.status_code == 200, full.text
+    assert full.content == body
+    assert full.headers["accept-ranges"] == "bytes"
+    assert partial.status_code == 206 and partial.content == body[10:30]
+    assert partial.headers["content-range"] == f"bytes 10-29/{len(body)}"
+    assert suffix.content == body[-5:]
+    assert invalid.status_code == 416
+    assert listed.json()["data"]["content"] is None
+    assert listed.json()["data"]["content_size"] == len(body)
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import time
+
+import pytest
+
+from app.services.blob_store import BlobNotFound, BlobStore
+
+
+PAYLOAD = b'{"rows":[' + b",".join(b'["%d","value"]' % index for index in range(5000)) + b"]}"
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_put_deduplicates_and_reads_back(tmp_path, compress):
+    store = BlobStore(tmp_path, compress=compress)
+
+    first = store.put(PAYLOAD)
+    second = store.put(PAYLOAD)
+
+    assert first.digest == second.digest == hashlib.sha256(PAYLOAD).hexdigest()
+    assert first.size == len(PAYLOAD)
+    assert len([path for path in tmp_path.rglob("*") if path.is_file()]) == 1
+    assert (first.stored_size < len(PAYLOAD)) is compress
+    assert store.read(first.digest) == PAYLOAD
+
+
+@pytest.mark.parametrize("compress", [True, False])
+def test_iter_range_returns_uncompressed_slice(tmp_path, compress):
+    store = BlobStore(tmp_path, compress=compress)
+    digest = store.put(PAYLOAD).digest
+
+    chunks = list(store.iter_range(digest, 70000, 70099, chunk_size=32))
+
+    assert b"".join(chunks) == PAYLOAD[70000:70100]
+    assert b"".join(store.iter_range(digest, len(PAYLOAD) - 10)) == PAYLOAD[-10:]
+
+
+def test_incompressible_content_is_stored_raw(tmp_path):
+    store = BlobStore(tmp_path, compress=True)
+    data = hashlib.sha512(b"seed").digest()
+
+    blob = store.put(data)
+
+    assert blob.stored_size == len(data)
+    assert store.read(blob.digest) == data
+
+
+def test_missing_and_invalid_digests(tmp_path):
+    store = BlobStore(tmp_path)
+
+    assert not store.exists("0" * 64)
+    assert not store.exists("../../etc/passwd")
+    with pytest.raises(BlobNotFound):
+        list(store.iter_range("0" * 64))
+
+
+def test_collect_garbage_keeps_referenced_blobs(tmp_path):
+    store = BlobStore(tmp_path, gc_grace_seconds=0)
+    kept = store.put(b"kept" * 100).digest
+    dropped = store.put(b"dropped" * 100).digest
+
+    assert store.collect_garbage({kept}) == 1
+    assert store.exists(kept)
+    assert not store.exists(dropped)
+
+
+def test_collect_garbage_spares_recent_and_reused_blobs(tmp_path):
+    store = BlobStore(tmp_path, gc_grace_seconds=3600)
+    fresh = store.put(b"fresh" * 100).digest
+    reused = store.put(b"reused" * 100).digest
+    stale = store.put(b"stale" * 100).digest
+    long_ago = time.time() - 7200
+    for digest in (reused, stale):
+        os.utime(store._find(digest), (long_ago, long_ago))
+
+    # 再次写入相同内容会刷新修改时间，引用行提交前不会被回收
+    store.put(b"reused" * 100)
+
+    assert store.collect_garbage(set()) == 1
+    assert store.exists(fresh) and store.exists(reused)
+    assert not store.exists(stale)
@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.api.turn_stream import TurnRegistry
+from app.api.v1 import chat as chat_api
+from app.services.pipeline_metrics import PIPELINE_METRICS
+
+
+class Upstream:
+    """模拟挂起的上游调用，记录是否被取消"""
+
+    def __init__(self):
+        self.started = asyncio.Event()
+        self.cancelled = False
+
+    async def hang(self):
+        self.started.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+
+async def frames_then_hang(upstream):
+    yield b"data: 1\n\n"
+    await upstream.hang()
+    yield b"data: never\n\n"
+
+
+@pytest.mark.asyncio
+async def test_abandoned_turn_is_cancelled_after_grace():
+    upstream = Upstream()
+    registry = TurnRegistry(abandon_after=0)
+    turn = registry.start(frames_then_hang(upstream), user_id=1, session_id="s")
+
+    subscription = turn.subscribe()
+    await subscription.__anext__()
+    await upstream.started.wait()
+    await subscription.aclose()
+
+    with pytest.raises(asyncio.CancelledError):
+        await turn.task
+    assert upstream.cancelled
+    assert turn.done
+
+
+@pytest.mark.asyncio
+async def test_reconnect_within_grace_keeps_generation_running():
+    upstream = Upstream()
+    registry = TurnRegistry(abandon_after=0.05)
+    turn = registry.start(frames_then_hang(upstream), user_id=1, session_id="s")
+
+    subscription = turn.subscribe()
+    await subscription.__anext__()
+    await subscription.aclose()
+    resumed = turn.subscribe(after=1)
+    waiter = asyncio.create_task(resumed.__anext__())
+    await asyncio.sleep(0.1)
+
+    assert not upstream.cancelled
+    waiter.cancel()
+    turn.cancel()
+
+
+@pytest.mark.asyncio
+async def test_disconnect_probe_ends_subscription_and_cancels():
+    upstream = Upstream()
+    registry = TurnRegistry(abandon_after=0)
+    turn = registry.start(frames_then_hang(upstream), user_id=1, session_id="s")
+
+    async def disconnected():
+        return True
+
+    received = [frame async for frame in turn.subscribe(is_disconnected=disconnected, poll_interval=0.01)]
+
+    with pytest.raises(asyncio.CancelledError):
+        await turn.task
+    assert len(received) == 1
+    assert upstream.cancelled
+
+
+@pytest.mark.asyncio
+async def test_cancelled_pipeline_records_saved_work(monkeypatch):
+    PIPELINE_METRICS.reset()
+    upstream = Upstream()
+
+    async def process_info(message):
+        yield {"type": "data", "subtype": "task_plan", "content": [{"id": 1}, {"id": 2}, {"id": 3}]}
+        yield {"type": "data", "subtype": "tool_selections", "content": {}}
+        yield {"type": "data", "subtype": "task_result", "content": {"task_id": 1, "result": "ok"}}
+        await upstream.hang()
+
+    monkeypatch.setattr(chat_api, "get_process_info", process_info)
+    registry = TurnRegistry(abandon_after=0)
+    turn = registry.start(
+        chat_api.generate_streaming_response("问题", "s", [], True),
+        user_id=1,
+        session_id="s",
+    )
+    await upstream.started.wait()
+    turn.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await turn.task
+    metrics = PIPELINE_METRICS.snapshot()
+    assert upstream.cancelled
+    assert metrics["cancelled_turns_by_stage"]["task_execution"] == 1
+    assert metrics["cancelled_tasks_skipped"] == 2
+    assert metrics["cancelled_llm_calls_avoided"] == 1
+    PIPELINE_METRICS.reset()
@@ -1,6 +1,6 @@
 import pytest
 import json
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 from ..schemas import chat as schemas
@@ -132,7 +132,9 @@ async def test_generate_streaming_response():
     message = "测试消息"
     session_id = "test-session-id"
     chat_history = [{"role": "user", "content": "Previous message"}]
-    db = AsyncMock()
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_factory.return_value.__aexit__ = AsyncMock(return_value=False)
     
     # 模拟get_process_info
     async def mock_process_info(msg):
@@ -163,15 +165,17 @@ async def test_generate_streaming_response():
                side_effect=mock_save_process_info):
         
         # 调用函数并收集结果
-        generator = generate_streaming_response(message, session_id, chat_history, db)
+        generator = generate_streaming_response(message, session_id, chat_history, True, session_factory)
         results = []
         async for chunk in generator:
             results.append(chunk)
         
         # 验证结果
         assert len(results) > 0
-        assert any(b'Test step' in r.encode('utf-8') for r in results)
-        assert any(b'Chunk' in r.encode('utf-8') for r in results)
+        assert any(b'Test step' in r for r in results)
+        assert any(b'Chunk' in r for r in results)
+        # 持久化在生成结束后才打开会话
+        session_factory.assert_called_once()
 
 
 @pytest.mark.asyncio
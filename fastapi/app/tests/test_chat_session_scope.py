@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1 import chat as chat_api
+from app.db import models
+from app.db.bootstrap import WRITE_ROLE, create_engine_for_role
+from app.schemas import chat as schemas
+from app.services.access_service import AccessPrincipal
+
+
+PRINCIPAL = AccessPrincipal(
+    access_id=0,
+    user_id=1,
+    label="tester",
+    expires_at=datetime.utcnow() + timedelta(days=1),
+    max_calls=10,
+    calls_used=0,
+)
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    # 写引擎连接池只有 1 个连接，流式生成期间占着不放就会饿死其他请求
+    engine = create_engine_for_role(f"sqlite+aiosqlite:///{tmp_path / 'chat.db'}", WRITE_ROLE)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        db.add(models.User(id=1, username="tester", email="tester@trial.local", password="!"))
+        db.add(models.ChatSession(id="session-1", user_id=1))
+        await db.commit()
+    yield engine
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_streaming_chat_holds_no_connection_while_generating(engine, monkeypatch):
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(chat_api, "async_session", factory)
+    pool = engine.sync_engine.pool
+    checked_out = []
+
+    async def fake_stream(message, chat_history):
+        for chunk in ("你好", "，", "世界"):
+            checked_out.append(pool.checkedout())
+            # 生成期间其他请求仍能拿到连接
+            async with factory() as other:
+                await other.execute(select(models.ChatSession.id))
+            yield chunk
+
+    monkeypatch.setattr(chat_api.ResponseGenerator, "create_simple_streaming_response", fake_stream)
+    monkeypatch.setattr(chat_api, "coalesce_tokens", lambda chunks: chunks)
+
+    response = await chat_api.chat(
+        schemas.ChatRequest(message="问候", session_id="session-1", is_agent=False),
+        http_request=None,
+        access=PRINCIPAL,
+        last_event_id=None,
+    )
+    assert pool.checkedout() == 0
+
+    frames = [frame async for frame in response.body_iterator]
+
+    assert checked_out == [0, 0, 0]
+    assert len(frames) == 3
+    assert pool.checkedout() == 0
+    async with factory() as db:
+        rows = (
+            await db.execute(
+                select(models.ChatMessage.content, models.ChatMessage.is_user)
+                .where(models.ChatMessage.session_id == "session-1")
+                .order_by(models.ChatMessage.id)
+            )
+        ).all()
+    assert rows == [("问候", True), ("你好，世界", False)]
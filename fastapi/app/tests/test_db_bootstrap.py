@@ -0,0 +1,98 @@
+import pytest
+import pytest_asyncio
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.bootstrap import (
+    READ_ROLE,
+    WRITE_ROLE,
+    RoutingSession,
+    SQLitePragmas,
+    create_engine_for_role,
+    is_file_sqlite_url,
+)
+
+
+@pytest_asyncio.fixture
+async def engines(tmp_path):
+    url = f"sqlite+aiosqlite:///{tmp_path / 'bootstrap.db'}"
+    write_engine = create_engine_for_role(url, WRITE_ROLE)
+    read_engine = create_engine_for_role(url, READ_ROLE)
+    async with write_engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    yield write_engine, read_engine
+    await write_engine.dispose()
+    await read_engine.dispose()
+
+
+def _session_factory(write_engine, read_engine):
+    return sessionmaker(
+        write_engine,
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        expire_on_commit=False,
+        info={"read_bind": read_engine.sync_engine},
+    )
+
+
+def test_file_sqlite_detection():
+    assert is_file_sqlite_url("sqlite+aiosqlite:////data/xiaolin.db")
+    assert is_file_sqlite_url("sqlite+aiosqlite:///./demo.db")
+    assert not is_file_sqlite_url("sqlite+aiosqlite://")
+    assert not is_file_sqlite_url("sqlite+aiosqlite:///:memory:")
+    assert not is_file_sqlite_url("postgresql+asyncpg://user@localhost/db")
+
+
+def test_pragmas_mark_read_connections_query_only():
+    pragmas = SQLitePragmas(busy_timeout_ms=1234, cache_size_kib=2048)
+
+    assert "PRAGMA busy_timeout=1234" in pragmas.statements()
+    assert "PRAGMA cache_size=-2048" in pragmas.statements()
+    assert "PRAGMA query_only=ON" not in pragmas.statements()
+    assert pragmas.statements(query_only=True)[-1] == "PRAGMA query_only=ON"
+
+
+@pytest.mark.asyncio
+async def test_engines_apply_wal_and_pragmas(engines):
+    write_engine, read_engine = engines
+
+    async with write_engine.connect() as conn:
+        assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+        assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1
+        assert (await conn.execute(text("PRAGMA busy_timeout"))).scalar() == 5000
+        assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 0
+
+    async with read_engine.connect() as conn:
+        assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 1
+
+
+@pytest.mark.asyncio
+async def test_routing_session_sends_reads_to_read_pool(engines):
+    write_engine, read_engine = engines
+    session_factory = _session_factory(write_engine, read_engine)
+
+    async with session_factory() as db:
+        sync_session = db.sync_session
+        assert sync_session.get_bind(clause=select(models.ChatSession)) is read_engine.sync_engine
+        assert (
+            sync_session.get_bind(clause=select(models.ChatSession).with_for_update())
+            is write_engine.sync_engine
+        )
+        assert sync_session.get_bind(clause=text("SELECT 1")) is write_engine.sync_engine
+
+        db.add(models.ChatSession(id="session-1", title="新的对话"))
+        await db.flush()
+        # 同一事务内写入后的读取留在写连接上，能读到未提交的数据
+        result = await db.execute(
+            select(models.ChatSession).where(models.ChatSession.id == "session-1")
+        )
+        assert result.scalars().first() is not None
+        await db.commit()
+
+    async with session_factory() as db:
+        result = await db.execute(
+            select(models.ChatSession).where(models.ChatSession.id == "session-1")
+        )
+        assert result.scalars().first().title == "新的对话"
@@ -0,0 +1,129 @@
+import json
+from dataclasses import replace
+from datetime import datetime, timedelta
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.api import demo
+from app.api.pagination import decode_cursor, encode_cursor
+from app.api.v1 import chat as chat_api
+from app.db import models
+from app.db.bootstrap import WRITE_ROLE, create_engine_for_role
+from app.services.access_service import AccessPrincipal
+
+
+PRINCIPAL = AccessPrincipal(
+    access_id=0,
+    user_id=1,
+    label="tester",
+    expires_at=datetime.utcnow() + timedelta(days=1),
+    max_calls=10,
+    calls_used=0,
+)
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_engine_for_role(f"sqlite+aiosqlite:///{tmp_path / 'pages.db'}", WRITE_ROLE)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with factory() as db:
+        db.add(models.User(id=1, username="tester", email="tester@trial.local", password="!"))
+        db.add(models.User(id=2, username="other", email="other@trial.local", password="!"))
+        # 前 3 个会话的 updated_at 相同，由 id 决定先后
+        for index in range(7):
+            db.add(
+                models.ChatSession(
+                    id=f"session-{index}",
+                    title=f"对话 {index}",
+                    user_id=1,
+                    updated_at=datetime(2026, 1, 1) + timedelta(minutes=max(index - 2, 0)),
+                )
+            )
+        db.add(models.ChatSession(id="foreign", user_id=2))
+        for index in range(1, 6):
+            db.add(models.ChatMessage(id=index, content=f"消息 {index}", is_user=index % 2 == 1, session_id="session-0"))
+        db.add(models.ProcessInfo(message_id=2, session_id="session-0", steps=["检索"]))
+        await db.commit()
+        # 数据库默认值写入的时间不带微秒，并让两条消息时间相同
+        await db.execute(
+            text(
+                "UPDATE chat_messages SET created_at = CASE WHEN id <= 2 THEN '2026-01-01 10:00:00' "
+                "ELSE '2026-01-01 10:00:0' || id END"
+            )
+        )
+        await db.commit()
+    yield factory
+    await engine.dispose()
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    cursor = encode_cursor("2026-01-01 10:00:00", 5)
+
+    assert decode_cursor(cursor) == ("2026-01-01 10:00:00", 5)
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor("not-a-cursor")
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_list_sessions_walks_all_pages_without_duplicates(session_factory):
+    seen, cursor = [], None
+    async with session_factory() as db:
+        while True:
+            page = await demo.list_sessions(limit=2, cursor=cursor, db=db, access=PRINCIPAL)
+            seen.extend(session["id"] for session in page["data"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+
+    assert seen == ["session-6", "session-5", "session-4", "session-3", "session-2", "session-1", "session-0"]
+
+
+@pytest.mark.asyncio
+async def test_list_messages_pages_backwards_and_projects_process_info(session_factory):
+    async with session_factory() as db:
+        latest = await demo.list_messages("session-0", limit=3, cursor=None, include=None, db=db, access=PRINCIPAL)
+        older = await demo.list_messages(
+            "session-0",
+            limit=3,
+            cursor=latest["next_cursor"],
+            include="process_info",
+            db=db,
+            access=PRINCIPAL,
+        )
+
+    assert [message["id"] for message in latest["data"]] == [3, 4, 5]
+    assert "process_info" not in latest["data"][0]
+    assert [message["id"] for message in older["data"]] == [1, 2]
+    assert older["next_cursor"] is None
+    assert older["data"][0]["process_info"] is None
+    assert older["data"][1]["process_info"]["steps"] == ["检索"]
+
+
+@pytest.mark.asyncio
+async def test_list_messages_is_scoped_to_owner(session_factory):
+    other = replace(PRINCIPAL, user_id=2)
+    async with session_factory() as db:
+        page = await demo.list_messages("session-0", limit=10, cursor=None, include=None, db=db, access=other)
+
+    assert page["data"] == []
+
+
+@pytest.mark.asyncio
+async def test_export_streams_every_message_as_ndjson(session_factory, monkeypatch):
+    monkeypatch.setattr(chat_api, "async_session", session_factory)
+    monkeypatch.setattr(chat_api, "EXPORT_BATCH_SIZE", 2)
+
+    lines = [line async for line in chat_api.iter_session_export("session-0", include_process_info=True)]
+
+    rows = [json.loads(line) for line in lines]
+    assert [row["id"] for row in rows] == [1, 2, 3, 4, 5]
+    assert rows[1]["process_info"]["steps"] == ["检索"]
+    assert all(line.endswith(b"\n") for line in lines)
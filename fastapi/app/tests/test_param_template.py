@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from app.agent.ParamTemplate import compile_template, resolve_params
+from app.agent.TaskExecutor import TaskExecutor
+
+
+TASK_RESULTS = {
+    1: {"status": "success", "api_result": {"city": "杭州", "location": {"lng": 119.72, "lat": 30.26}}},
+    2: {"status": "success", "api_result": {"items": [{"link": "https://zafu.edu.cn/a", "endTime": "2026-10-20 10:00"}]}},
+    3: {"status": "error", "error": "超时"},
+}
+
+
+def test_multiple_placeholders_in_one_value_are_all_replaced():
+    params = {"query": "{TASK_1_RESULT.city} 到 {TASK_2_RESULT.items[0].link}"}
+
+    assert resolve_params(params, TASK_RESULTS) == {"query": "杭州 到 https://zafu.edu.cn/a"}
+
+
+def test_whole_value_placeholder_keeps_native_type():
+    params = {"location": "{TASK_1_RESULT.location}", "lng": "{TASK_1_RESULT.location.lng}", "items": "{TASK_2_RESULT.items}"}
+
+    resolved = resolve_params(params, TASK_RESULTS)
+
+    assert resolved["location"] == {"lng": 119.72, "lat": 30.26}
+    assert resolved["lng"] == 119.72
+    assert resolved["items"][0]["endTime"] == "2026-10-20 10:00"
+
+
+def test_embedded_structures_render_as_json_and_nested_params_resolve():
+    params = {"options": {"center": "中心点 {TASK_1_RESULT.location}"}, "list": ["{TASK_2_RESULT.items.0.endTime}"]}
+
+    resolved = resolve_params(params, TASK_RESULTS)
+
+    assert resolved["options"]["center"] == '中心点 {"lng": 119.72, "lat": 30.26}'
+    assert resolved["list"] == ["2026-10-20 10:00"]
+    # 原参数不被修改
+    assert params["list"] == ["{TASK_2_RESULT.items.0.endTime}"]
+
+
+@pytest.mark.parametrize("placeholder,expected", [
+    ("{TASK_3_RESULT.city}", "{TASK_3_RESULT_NOT_FOUND}"),
+    ("{TASK_9_RESULT}", "{TASK_9_RESULT_NOT_FOUND}"),
+    ("{TASK_1_RESULT.country}", "{KEY_country_NOT_FOUND}"),
+    ("{TASK_2_RESULT.items[5]}", "{KEY_5_NOT_FOUND}"),
+    ("{TASK_1_RESULT.city.name}", "{INVALID_KEY_PATH}"),
+    ("没有占位符", "没有占位符"),
+])
+def test_missing_values_keep_legacy_markers(placeholder, expected):
+    assert TaskExecutor.resolve_placeholder(placeholder, TASK_RESULTS) == expected
+
+
+def test_other_braces_are_left_alone():
+    script = "alert(`结束于${new Date('{TASK_2_RESULT.items[0].endTime}')}`)"
+
+    assert resolve_params(script, TASK_RESULTS) == "alert(`结束于${new Date('2026-10-20 10:00')}`)"
+
+
+def test_templates_are_compiled_once_and_resolve_fast():
+    text = "{TASK_1_RESULT.city} {TASK_2_RESULT.items[0].link}"
+    assert compile_template(text) is compile_template(text)
+
+    started = time.perf_counter()
+    for _ in range(10000):
+        resolve_params({"q": text}, TASK_RESULTS)
+    assert (time.perf_counter() - started) / 10000 < 50e-6
@@ -0,0 +1,135 @@
+import json
+import sys
+import threading
+import types
+
+import pydantic
+
+from app.agent.ProcessContextBuilder import ProcessContextBuilder, allocate_budget
+from app.agent.ResponseGenerator import ResponseGenerator
+from app.services.token_counter import TRUNCATION_MARK, TokenCounter, estimate_tokens
+
+
+COUNTER = TokenCounter(encoding_name=None)
+
+
+class TextContent(pydantic.BaseModel):
+    type: str = "text"
+    text: str
+    annotations: dict = None
+
+
+class ToolResult(pydantic.BaseModel):
+    content: list
+    isError: bool = False
+
+
+def tool_heavy_process_info():
+    notices = [{"title": f"通知 {index}", "content": "正文" * 400, "url": f"https://example.edu/{index}"} for index in range(30)]
+    return {
+        "user_input": "最近有什么通知，明天天气怎样",
+        "task_planning": {"tasks": [
+            {"id": 1, "task": "查询通知", "input": "最近通知", "depends_on": []},
+            {"id": 2, "task": "查询天气", "input": "明天", "depends_on": []},
+        ]},
+        "tool_selection": {"tool_selections": {
+            1: {"task_id": 1, "tool": "campus_notice", "params": {"limit": 30}, "reason": "用户询问通知" * 20},
+            2: {"task_id": 2, "tool": "get_weather", "params": {"city": "杭州"}, "reason": "用户询问天气"},
+        }},
+        "task_execution": {
+            1: {"status": "success", "notices": notices, "activation": {"content": "SKILL.md" * 1000}},
+            2: ToolResult(content=[TextContent(text="明天晴，15-24℃")]),
+        },
+    }
+
+
+def test_drops_selector_reasoning_and_activation_and_serializes_compactly():
+    context = ProcessContextBuilder(budget=100000, counter=COUNTER).build(tool_heavy_process_info())
+
+    assert "用户询问" not in context
+    assert "SKILL.md" not in context
+    assert "annotations" not in context
+    assert '"tool":"get_weather"' in context
+    assert '2: {"content":[{"type":"text","text":"明天晴，15-24℃"}]' in context
+    assert '"input"' not in context
+
+
+def test_keeps_tool_fields_and_skip_reasons_but_drops_skill_activation():
+    process_info = {"task_execution": {
+        1: {"status": "success", "api_result": {
+            "skill": "campus-notice",
+            "activation": {"name": "campus-notice", "version": "abc"},
+            "notices": [{"title": "停课通知", "reason": "台风", "meta": {"source": "教务处"}}],
+        }},
+        2: {"status": "skipped", "reason": "依赖任务失败"},
+    }}
+
+    context = ProcessContextBuilder(budget=100000, counter=COUNTER).build(process_info)
+
+    assert '"activation"' not in context
+    assert '"reason":"台风","meta":{"source":"教务处"}' in context
+    assert '2: {"status":"skipped","reason":"依赖任务失败"}' in context
+
+
+def test_oversized_results_are_fitted_to_budget_deterministically():
+    builder = ProcessContextBuilder(budget=800, counter=COUNTER)
+    process_info = tool_heavy_process_info()
+
+    context = builder.build(process_info)
+    legacy = json.dumps(process_info["task_execution"][1], ensure_ascii=False, indent=2)
+
+    assert context == builder.build(tool_heavy_process_info())
+    assert COUNTER.count(context) <= 800 + 20
+    assert COUNTER.count(context) * 10 < estimate_tokens(legacy)
+    # 小结果全额保留，大结果被压缩但仍是可读的前几条
+    assert "明天晴，15-24℃" in context
+    assert "通知 0" in context
+    assert "另有" in context
+
+
+def test_allocate_budget_gives_leftover_to_large_results():
+    allocation = allocate_budget({"a": 50, "b": 1000, "c": 3000}, budget=1050, minimum=10)
+
+    assert allocation == {"a": 50, "b": 500, "c": 500}
+
+
+def test_token_counter_truncates_within_budget():
+    text = "校园" * 500 + "abc" * 100
+
+    truncated = COUNTER.truncate(text, 50)
+
+    assert truncated.endswith(TRUNCATION_MARK)
+    assert COUNTER.count(truncated) <= 50
+    assert COUNTER.truncate("短文本", 50) == "短文本"
+
+
+def test_token_counter_estimates_while_encoding_loads_in_background(monkeypatch):
+    release = threading.Event()
+
+    class Encoding:
+        def encode(self, text, disallowed_special=()):
+            return list(text)
+
+    def get_encoding(name):
+        # 模拟离线环境下载编码文件卡住
+        release.wait(5)
+        return Encoding()
+
+    monkeypatch.setitem(sys.modules, "tiktoken", types.SimpleNamespace(get_encoding=get_encoding))
+    counter = TokenCounter("cl100k_base")
+
+    loader = counter.load_in_background()
+    assert counter.count("abcdefgh") == estimate_tokens("abcdefgh")
+
+    release.set()
+    loader.join(5)
+    assert counter.count("abcdefgh") == 8
+
+
+def test_response_prompt_uses_compact_context():
+    messages = ResponseGenerator._create_response_messages("有什么通知", tool_heavy_process_info())
+    prompt = messages[-1]["content"]
+
+    assert "通知 0" in prompt
+    assert "SKILL.md" not in prompt
+    assert "用户询问" not in prompt
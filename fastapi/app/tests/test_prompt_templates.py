@@ -0,0 +1,89 @@
+import json
+from types import SimpleNamespace
+
+from app.agent.PromptTemplates import (
+    PROMPT_TEMPLATES,
+    planner_messages,
+    responder_messages,
+    selector_messages,
+)
+from app.agent.ResponseGenerator import ResponseGenerator
+from app.services.llm_service import log_prompt_cache_usage
+from app.services.student_profile_service import format_student_profile_for_prompt
+
+
+PROFILE = format_student_profile_for_prompt()
+TOOLS = "Tool: campus_notice\nDescription: 查询校园通知\n"
+
+
+def shared_prefix(first, second):
+    first, second = json.dumps(first, ensure_ascii=False), json.dumps(second, ensure_ascii=False)
+    length = 0
+    while length < min(len(first), len(second)) and first[length] == second[length]:
+        length += 1
+    return first[:length]
+
+
+def test_planner_prefix_is_stable_across_requests():
+    first = planner_messages("明天有什么课", PROFILE)
+    second = planner_messages("图书馆几点关门", PROFILE)
+
+    assert first[0] == second[0]
+    assert "明天有什么课" not in first[0]["content"]
+    assert first[-1] == {"role": "user", "content": "明天有什么课"}
+
+
+def test_selector_prefix_holds_tool_catalog_and_profile_only():
+    first = selector_messages({"tasks": [{"id": 1, "task": "查通知"}]}, TOOLS, PROFILE)
+    second = selector_messages({"tasks": [{"id": 1, "task": "查天气"}, {"id": 2, "task": "查课表"}]}, TOOLS, PROFILE)
+
+    assert first[0] == second[0]
+    system = first[0]["content"]
+    assert system.index("规则") < system.index("campus_notice") < system.index("林若溪")
+    assert "查通知" in first[1]["content"]
+
+
+def test_responder_puts_process_info_after_history():
+    history = [{"role": "user", "content": "你好"}, {"role": "assistant", "content": "你好呀"}]
+    process_info = {
+        "user_input": "有什么通知",
+        "task_planning": {"tasks": [{"id": 1, "task": "查通知"}]},
+        "tool_selection": {},
+        "task_execution": {1: {"notices": ["停电通知"]}},
+    }
+
+    first = ResponseGenerator._create_response_messages("有什么通知", process_info, history)
+    second = ResponseGenerator._create_response_messages("换个问题", {**process_info, "task_execution": {}}, history)
+
+    # 静态 system 与聊天历史组成共同前缀，动态内容只出现在最后一条消息
+    assert first[:3] == second[:3]
+    assert "停电通知" not in shared_prefix(first, second)
+    assert "停电通知" in first[-1]["content"]
+    assert first[-1]["content"].endswith("有什么通知")
+
+
+def test_simple_responder_prefix_is_stable():
+    first = responder_messages("你好", PROFILE)
+    second = responder_messages("谢谢", PROFILE, [{"role": "user", "content": "你好"}])
+
+    assert first[0] == second[0]
+
+
+def test_templates_are_versioned():
+    assert set(PROMPT_TEMPLATES) == {"planner", "selector", "responder", "simple_responder"}
+    assert all(template.key == f"{role}@{template.version}" for role, template in PROMPT_TEMPLATES.items())
+
+
+def test_log_prompt_cache_usage_reads_deepseek_and_streaming_usage():
+    deepseek = SimpleNamespace(
+        response_metadata={"token_usage": {"prompt_tokens": 1200, "prompt_cache_hit_tokens": 1024}},
+        usage_metadata=None,
+    )
+    streamed = SimpleNamespace(
+        response_metadata={},
+        usage_metadata={"input_tokens": 800, "input_token_details": {"cache_read": 640}},
+    )
+
+    assert log_prompt_cache_usage("planner", deepseek) == {"prompt_tokens": 1200, "cached_tokens": 1024}
+    assert log_prompt_cache_usage("responder", streamed) == {"prompt_tokens": 800, "cached_tokens": 640}
+    assert log_prompt_cache_usage("responder", SimpleNamespace()) is None
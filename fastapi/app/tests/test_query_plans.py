@@ -0,0 +1,207 @@
+"""
+热点查询的 EXPLAIN QUERY PLAN 检查。
+
+新增落在请求路径上的查询时，请在 ``HOT_QUERIES`` 中加入同样形状的语句；
+如果 SQLite 退化为全表扫描或为排序建立临时 B 树，测试会失败。
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select, text
+
+from app.api.pagination import encode_cursor, keyset_paginate
+from app.db import models
+from app.db.bootstrap import WRITE_ROLE, create_engine_for_role
+from app.db.migrations import MIGRATIONS, run_migrations
+
+
+HOT_QUERIES = {
+    "chat.sessions": select(models.ChatSession)
+    .where(models.ChatSession.user_id == 1)
+    .order_by(models.ChatSession.updated_at.desc()),
+    "chat.session_messages": select(models.ChatMessage)
+    .join(models.ChatSession)
+    .where(
+        models.ChatMessage.session_id == "session-1",
+        models.ChatSession.user_id == 1,
+    )
+    .order_by(models.ChatMessage.created_at),
+    "chat.sessions_page": keyset_paginate(
+        select(models.ChatSession).where(models.ChatSession.user_id == 1),
+        models.ChatSession.updated_at,
+        models.ChatSession.id,
+        50,
+        encode_cursor("2026-01-01 00:00:00", "session-1"),
+    ),
+    "chat.messages_page": keyset_paginate(
+        select(models.ChatMessage)
+        .join(models.ChatSession)
+        .where(
+            models.ChatMessage.session_id == "session-1",
+            models.ChatSession.user_id == 1,
+        ),
+        models.ChatMessage.created_at,
+        models.ChatMessage.id,
+        100,
+        encode_cursor("2026-01-01 00:00:00", 10),
+    ),
+    "chat.export_batch": keyset_paginate(
+        select(models.ChatMessage).where(models.ChatMessage.session_id == "session-1"),
+        models.ChatMessage.created_at,
+        models.ChatMessage.id,
+        500,
+        encode_cursor("2026-01-01 00:00:00", 10),
+        descending=False,
+    ),
+    "chat.history": select(models.ChatMessage)
+    .where(models.ChatMessage.session_id == "session-1")
+    .order_by(models.ChatMessage.created_at),
+    "chat.process_infos": select(models.ProcessInfo)
+    .join(models.ChatSession)
+    .where(
+        models.ProcessInfo.session_id == "session-1",
+        models.ChatSession.user_id == 1,
+    )
+    .order_by(models.ProcessInfo.created_at.desc()),
+    "demo.messages_process_infos": select(models.ProcessInfo).where(
+        models.ProcessInfo.message_id.in_([1, 2, 3])
+    ),
+    "agent_data.list": select(models.AgentData)
+    .where(models.AgentData.user_id == 1)
+    .order_by(models.AgentData.created_at.desc())
+    .limit(100),
+    "agent_data.list_by_session": select(models.AgentData)
+    .where(models.AgentData.user_id == 1, models.AgentData.session_id == "session-1")
+    .order_by(models.AgentData.created_at.desc())
+    .limit(100),
+    "agent_data.list_by_type": select(models.AgentData)
+    .where(models.AgentData.user_id == 1, models.AgentData.type == "table")
+    .order_by(models.AgentData.created_at.desc())
+    .limit(100),
+    "agent_data.page": select(
+        models.AgentData,
+        select(func.count())
+        .select_from(models.AgentData)
+        .where(models.AgentData.user_id == 1, models.AgentData.type == "table")
+        .scalar_subquery()
+        .label("total"),
+    )
+    .where(models.AgentData.user_id == 1, models.AgentData.type == "table")
+    .order_by(models.AgentData.created_at.desc())
+    .offset(100)
+    .limit(100),
+    "agent_data.count": select(func.count())
+    .select_from(models.AgentData)
+    .where(models.AgentData.user_id == 1),
+    "agent_data.by_message": select(models.AgentData)
+    .where(models.AgentData.message_id == 1, models.AgentData.user_id == 1)
+    .order_by(models.AgentData.created_at.desc()),
+    "auth.login_failures": select(func.count())
+    .select_from(models.LoginFailure)
+    .where(
+        models.LoginFailure.client_key == "1.2.3.4",
+        models.LoginFailure.attempted_at > "2026-01-01 00:00:00",
+    ),
+}
+
+
+@pytest_asyncio.fixture
+async def engine(tmp_path):
+    engine = create_engine_for_role(f"sqlite+aiosqlite:///{tmp_path / 'plans.db'}", WRITE_ROLE)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+def _query_plan(conn, statement):
+    compiled = statement.compile(dialect=conn.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[3] for row in rows]
+
+
+def _index_names(conn):
+    rows = conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+    return {row[0] for row in rows}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+async def test_hot_query_uses_index(engine, name):
+    async with engine.connect() as conn:
+        plan = await conn.run_sync(_query_plan, HOT_QUERIES[name])
+
+    assert not [step for step in plan if step.startswith("SCAN")], f"{name} 全表扫描: {plan}"
+    assert not [step for step in plan if "TEMP B-TREE" in step], f"{name} 临时排序: {plan}"
+
+
+def _migrated_index_names():
+    created, dropped = set(), set()
+    for migration in MIGRATIONS:
+        for statement in migration.statements:
+            if not isinstance(statement, str):
+                continue
+            words = statement.split()
+            if statement.startswith("CREATE INDEX"):
+                created.add(words[5])
+            elif statement.startswith("DROP INDEX"):
+                dropped.add(words[4])
+    return created - dropped
+
+
+@pytest.mark.asyncio
+async def test_migrations_add_indexes_to_existing_database(engine):
+    index_names = _migrated_index_names()
+    async with engine.begin() as conn:
+        for index_name in index_names:
+            await conn.execute(text(f"DROP INDEX {index_name}"))
+
+    all_versions = [migration.version for migration in MIGRATIONS]
+    assert await run_migrations(engine) == all_versions
+    assert await run_migrations(engine) == []
+
+    async with engine.connect() as conn:
+        existing = await conn.run_sync(_index_names)
+        versions = (await conn.execute(text("SELECT version FROM schema_migrations"))).scalars().all()
+
+    assert index_names <= existing
+    assert versions == all_versions
+
+
+@pytest.mark.asyncio
+async def test_concurrent_workers_apply_each_migration_once(tmp_path):
+    import asyncio
+
+    from app.db.migrations import Migration
+
+    url = f"sqlite+aiosqlite:///{tmp_path / 'workers.db'}"
+    # 不幂等的 DDL：两个进程都执行时第二次会失败
+    migrations = [Migration(version=1, name="once", statements=("CREATE TABLE once_only (id INTEGER)",))]
+    engines = [create_engine_for_role(url, WRITE_ROLE) for _ in range(4)]
+    try:
+        results = await asyncio.gather(*(run_migrations(engine, migrations) for engine in engines))
+        async with engines[0].connect() as conn:
+            versions = (await conn.execute(text("SELECT version FROM schema_migrations"))).scalars().all()
+    finally:
+        for engine in engines:
+            await engine.dispose()
+
+    assert sorted(results) == [[], [], [], [1]]
+    assert versions == [1]
+
+
+@pytest.mark.asyncio
+async def test_failed_migration_is_rolled_back(tmp_path):
+    from app.db.migrations import Migration
+
+    engine = create_engine_for_role(f"sqlite+aiosqlite:///{tmp_path / 'broken.db'}", WRITE_ROLE)
+    broken = Migration(version=1, name="broken", statements=("CREATE TABLE half_done (id INTEGER)", "NOT SQL"))
+    try:
+        with pytest.raises(Exception):
+            await run_migrations(engine, [broken])
+        async with engine.connect() as conn:
+            tables = (await conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'"))).scalars().all()
+    finally:
+        await engine.dispose()
+
+    assert "half_done" not in tables
@@ -0,0 +1,102 @@
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from app.db import models
+from app.db.bootstrap import WRITE_ROLE, create_engine_for_role
+from app.services import rate_limit_service
+from app.services.rate_limit_service import DatabaseRateLimitStore, MemoryRateLimitStore
+
+
+@pytest.mark.asyncio
+async def test_memory_store_limits_after_max_attempts_and_resets():
+    store = MemoryRateLimitStore(3, timedelta(minutes=15))
+
+    for _ in range(2):
+        await store.record_failure("1.2.3.4")
+    assert not await store.is_limited("1.2.3.4")
+
+    await store.record_failure("1.2.3.4")
+    assert await store.is_limited("1.2.3.4")
+    assert not await store.is_limited("5.6.7.8")
+
+    await store.reset("1.2.3.4")
+    assert not await store.is_limited("1.2.3.4")
+
+
+@pytest.mark.asyncio
+async def test_memory_store_uses_fixed_memory():
+    store = MemoryRateLimitStore(3, timedelta(minutes=15), max_keys=100)
+
+    for _ in range(50):
+        await store.record_failure("1.2.3.4")
+    for index in range(500):
+        await store.record_failure(f"10.0.{index // 256}.{index % 256}")
+
+    assert len(store) == 100
+    assert all(len(attempts) <= 3 for attempts in store._attempts.values())
+
+
+@pytest.mark.asyncio
+async def test_memory_store_sweeps_expired_keys(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit_service.time, "time", lambda: now[0])
+    store = MemoryRateLimitStore(3, timedelta(seconds=60), sweep_interval=timedelta(seconds=10))
+
+    await store.record_failure("1.2.3.4")
+    await store.record_failure("5.6.7.8")
+    now[0] += 30
+    await store.record_failure("5.6.7.8")
+
+    now[0] += 45
+    assert not await store.is_limited("9.9.9.9")
+    assert list(store._attempts) == ["5.6.7.8"]
+
+
+@pytest_asyncio.fixture
+async def session_factory(tmp_path):
+    engine = create_engine_for_role(f"sqlite+aiosqlite:///{tmp_path / 'limits.db'}", WRITE_ROLE)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    yield sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_database_store_is_shared_between_instances(session_factory):
+    worker_a = DatabaseRateLimitStore(session_factory, 3, timedelta(minutes=15))
+    worker_b = DatabaseRateLimitStore(session_factory, 3, timedelta(minutes=15))
+
+    await worker_a.record_failure("1.2.3.4")
+    await worker_b.record_failure("1.2.3.4")
+    assert not await worker_a.is_limited("1.2.3.4")
+
+    await worker_a.record_failure("1.2.3.4")
+    assert await worker_b.is_limited("1.2.3.4")
+
+    await worker_b.reset("1.2.3.4")
+    assert not await worker_a.is_limited("1.2.3.4")
+
+
+@pytest.mark.asyncio
+async def test_database_store_sweeps_rows_outside_window(session_factory):
+    store = DatabaseRateLimitStore(session_factory, 3, timedelta(seconds=0))
+
+    await store.record_failure("1.2.3.4")
+    await store.record_failure("5.6.7.8")
+    assert await _failure_count(session_factory) == 2
+
+    # 到达清理时间后，窗口外的旧记录在下一次写入前被删除
+    store._next_sweep = 0
+    await store.record_failure("1.2.3.4")
+    assert await _failure_count(session_factory) == 1
+
+
+async def _failure_count(session_factory):
+    async with session_factory() as db:
+        result = await db.execute(select(func.count()).select_from(models.LoginFailure))
+        return result.scalar_one()
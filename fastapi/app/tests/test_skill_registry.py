@@ -37,8 +37,9 @@ async def test_course_schedule_skill_filters_by_major_and_day(monkeypatch):
     assert result["count"] == 1
     assert result["courses"][0]["course_name"] == "数据结构"
     assert result["courses"][0]["day_label"] == "周二"
-    assert result["activation"]["name"] == "course-schedule"
-    assert "<skill_content name=\"course-schedule\">" in result["activation"]["content"]
+    activation = SkillRegistry.activate_skill("course-schedule")
+    assert result["activation"] == {"name": "course-schedule", "version": activation["version"]}
+    assert "<skill_content name=\"course-schedule\">" in activation["content"]
 
 
 @pytest.mark.asyncio
@@ -213,3 +214,179 @@ async def test_capabilities_endpoint_initializes_mcp_tools(monkeypatch):
     assert result["tools"][0]["server"] == "weather"
     assert any(skill["name"] == "course-schedule" for skill in result["skills"])
     assert result["errors"] == []
+
+
+@pytest.fixture
+def tmp_skill(tmp_path, monkeypatch):
+    from ..skills.registry import SkillRecord
+
+    skill_dir = tmp_path / "demo-skill"
+    (skill_dir / "references").mkdir(parents=True)
+    (skill_dir / "SKILL.md").write_text("---\nname: demo-skill\ndescription: demo\n---\n说明", encoding="utf-8")
+    (skill_dir / "references" / "data.json").write_text("{}", encoding="utf-8")
+    skill = SkillRecord(
+        name="demo-skill",
+        description="demo",
+        location=str(skill_dir / "SKILL.md"),
+        body="说明",
+        handler=lambda params: {"status": "success", "params": params},
+    )
+    SkillRegistry._ensure_initialized()
+    monkeypatch.setattr(SkillRegistry, "_skills", {**SkillRegistry._skills, "demo-skill": skill})
+    monkeypatch.setattr(SkillRegistry, "_activations", {})
+    return skill_dir
+
+
+@pytest.mark.asyncio
+async def test_activation_is_memoized_and_referenced_by_version(tmp_skill, monkeypatch):
+    first = SkillRegistry.activate_skill("demo-skill")
+    assert first["resources"] == ["references/data.json"]
+
+    # 目录未变化时不再重新构建资源列表
+    def no_rebuild(*args, **kwargs):
+        raise AssertionError("resources listed again")
+
+    monkeypatch.setattr(SkillRegistry, "_list_bundled_resources", no_rebuild)
+    assert SkillRegistry.activate_skill("demo-skill") == first
+
+    result = await SkillRegistry.execute_tool("demo-skill", {"q": 1})
+    assert result["activation"] == {"name": "demo-skill", "version": first["version"]}
+
+
+def test_activation_is_rebuilt_when_resources_change(tmp_skill):
+    import os
+
+    first = SkillRegistry.activate_skill("demo-skill")
+    (tmp_skill / "references" / "more.json").write_text("{}", encoding="utf-8")
+    # 保证修改时间与缓存时不同
+    references = tmp_skill / "references"
+    stat = references.stat()
+    os.utime(references, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    second = SkillRegistry.activate_skill("demo-skill")
+
+    assert second["resources"] == ["references/data.json", "references/more.json"]
+    assert second["version"] != first["version"]
+
+
+def test_activation_is_rebuilt_when_nested_resources_change(tmp_skill):
+    import os
+
+    lib = tmp_skill / "scripts" / "lib"
+    lib.mkdir(parents=True)
+    first = SkillRegistry.activate_skill("demo-skill")
+    (lib / "x.py").write_text("", encoding="utf-8")
+    stat = lib.stat()
+    os.utime(lib, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    second = SkillRegistry.activate_skill("demo-skill")
+
+    assert second["resources"] == ["scripts/lib/x.py", "references/data.json"]
+    assert second["version"] != first["version"]
+
+
+def write_skill(skills_dir, name, description="demo", extra=""):
+    skill_dir = skills_dir / name
+    skill_dir.mkdir(exist_ok=True)
+    (skill_dir / "SKILL.md").write_text(
+        f"---\nname: {name}\ndescription: {description}\n{extra}---\n说明", encoding="utf-8"
+    )
+
+
+@pytest.fixture
+def skills_dir(tmp_path, monkeypatch):
+    for attribute in ("_skills", "_alias_table", "_diagnostics", "_files", "_activations", "_last_reload", "_initialized"):
+        monkeypatch.setattr(SkillRegistry, attribute, getattr(SkillRegistry, attribute))
+    monkeypatch.setattr(SkillRegistry, "_initialized", False)
+    monkeypatch.setattr(SkillRegistry, "_files", {})
+    monkeypatch.setattr(SkillRegistry, "_skill_search_paths", classmethod(lambda cls: [tmp_path]))
+    write_skill(tmp_path, "course-schedule")
+    return tmp_path
+
+
+def test_reload_parses_only_changed_files_and_swaps_tables(skills_dir, monkeypatch):
+    import os
+
+    first = SkillRegistry.list_tools()[0]
+    assert first.handler is not None
+
+    parsed = []
+    original_parse = SkillRegistry._parse_skill_file.__func__
+    monkeypatch.setattr(
+        SkillRegistry, "_parse_skill_file",
+        classmethod(lambda cls, path, diagnostics: parsed.append(path.parent.name) or original_parse(cls, path, diagnostics)),
+    )
+    skills_before = SkillRegistry._skills
+
+    # 未变化时不解析文件，也不替换技能表
+    assert SkillRegistry.reload()["parsed_files"] == []
+    assert SkillRegistry._skills is skills_before
+
+    write_skill(skills_dir, "lab-booking", extra="aliases: [实验室预约]\n")
+    write_skill(skills_dir, "course-schedule", description="新的课表描述")
+    skill_file = skills_dir / "course-schedule" / "SKILL.md"
+    stat = skill_file.stat()
+    os.utime(skill_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    report = SkillRegistry.reload()
+
+    assert sorted(parsed) == ["course-schedule", "lab-booking"]
+    assert (report["added"], report["updated"], report["removed"]) == (["lab-booking"], ["course-schedule"], [])
+    assert SkillRegistry._skills is not skills_before
+    assert SkillRegistry.get_tool("course_schedule").description == "新的课表描述"
+    assert SkillRegistry.get_tool("实验室预约").name == "lab-booking"
+
+    (skills_dir / "lab-booking" / "SKILL.md").unlink()
+    (skills_dir / "broken").mkdir()
+    (skills_dir / "broken" / "SKILL.md").write_text("no frontmatter", encoding="utf-8")
+    report = SkillRegistry.reload()
+
+    assert report["removed"] == ["lab-booking"]
+    assert not SkillRegistry.has_tool("实验室预约")
+    assert any("missing frontmatter" in diagnostic for diagnostic in SkillRegistry.diagnostics())
+    assert SkillRegistry.reload_status()["diagnostics"] == SkillRegistry.diagnostics()
+
+
+@pytest.mark.asyncio
+async def test_watcher_hot_loads_new_skills(skills_dir):
+    import asyncio
+
+    SkillRegistry.list_tools()
+    watcher = asyncio.create_task(SkillRegistry.watch(0.01))
+    try:
+        write_skill(skills_dir, "lab-booking")
+        for _ in range(200):
+            if SkillRegistry.has_tool("lab-booking"):
+                break
+            await asyncio.sleep(0.01)
+        assert SkillRegistry.has_tool("lab-booking")
+    finally:
+        watcher.cancel()
+
+
+def test_activation_follows_record_contents(tmp_skill):
+    first = SkillRegistry.activate_skill("demo-skill")
+
+    # 记录内容变化时，即使目录时间戳不变也重新生成激活内容
+    SkillRegistry._skills["demo-skill"].body = "新的说明"
+    second = SkillRegistry.activate_skill("demo-skill")
+
+    assert "新的说明" in second["content"]
+    assert second["version"] != first["version"]
+
+
+def test_reload_drops_activation_cached_from_old_body(skills_dir):
+    import os
+
+    write_skill(skills_dir, "lab-booking")
+    SkillRegistry.reload()
+    skill_file = skills_dir / "lab-booking" / "SKILL.md"
+    skill_file.write_text("---\nname: lab-booking\ndescription: demo\n---\nNEW BODY", encoding="utf-8")
+    stat = skill_file.stat()
+    os.utime(skill_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    # 下一次轮询前激活，缓存的仍是旧正文
+    assert "说明" in SkillRegistry.activate_skill("lab-booking")["content"]
+    assert SkillRegistry.reload()["updated"] == ["lab-booking"]
+
+    assert SkillRegistry.get_tool("lab-booking").body == "NEW BODY"
+    assert "NEW BODY" in SkillRegistry.activate_skill("lab-booking")["content"]
@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.agent import SpeculativeResponder as speculative_module
+from app.agent.SpeculativeResponder import SpeculativeResponder
+from app.api.v1 import chat as chat_api
+
+
+PLAN = [{"id": 1, "task": "查天气"}, {"id": 2, "task": "查课表"}]
+
+
+def make_pipeline(plan, slow_task_gate=None):
+    async def process_info(message):
+        yield {"type": "data", "subtype": "task_plan", "content": plan}
+        yield {"type": "data", "subtype": "tool_selections", "content": {}}
+        for task in plan:
+            if task["id"] > 1 and slow_task_gate is not None:
+                # 第二个任务要等开头开始输出后才返回，证明两者确实重叠
+                await slow_task_gate.wait()
+            yield {"type": "data", "subtype": "task_result", "content": {"task_id": task["id"], "result": f"结果{task['id']}"}}
+
+    return process_info
+
+
+@pytest.mark.asyncio
+async def test_opening_streams_while_remaining_tasks_run(monkeypatch):
+    gate = asyncio.Event()
+    seen_process_info = []
+
+    async def opening(message, process_info, chat_history):
+        seen_process_info.append(process_info)
+        yield "今天晴，"
+        gate.set()
+        yield "适合出门。"
+
+    monkeypatch.setattr(speculative_module, "get_process_info", make_pipeline(PLAN, gate))
+    monkeypatch.setattr(speculative_module.ResponseGenerator, "create_opening_streaming_response", opening)
+
+    responder = SpeculativeResponder("今天适合出门吗")
+    items = [item async for item in responder.run()]
+
+    kinds = [kind for kind, _ in items]
+    assert responder.opening == "今天晴，适合出门。"
+    # 开头在第二个任务结果之前输出
+    assert kinds.index("token") < len(kinds) - 1
+    assert items[-1][1]["content"]["task_id"] == 2
+    assert list(seen_process_info[0]["task_execution"]) == [1]
+    assert list(responder.recorder.process_info()["task_execution"]) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_no_opening_when_all_tasks_finish_together(monkeypatch):
+    opening = MagicMock()
+    monkeypatch.setattr(speculative_module, "get_process_info", make_pipeline(PLAN[:1]))
+    monkeypatch.setattr(speculative_module.ResponseGenerator, "create_opening_streaming_response", opening)
+
+    responder = SpeculativeResponder("今天天气")
+    items = [item async for item in responder.run()]
+
+    assert all(kind == "event" for kind, _ in items)
+    assert responder.opening == ""
+    opening.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_streaming_response_continues_after_opening(monkeypatch):
+    async def opening(message, process_info, chat_history):
+        yield "先说结论："
+
+    continuation_calls = []
+
+    async def continuation(message, process_info, chat_history, opening=""):
+        continuation_calls.append((process_info, opening))
+        yield "两件事都没问题。"
+
+    saved = []
+
+    async def save_message(session_id, content, is_user, db):
+        saved.append(content)
+        return MagicMock(id=1)
+
+    session_factory = MagicMock()
+    session_factory.return_value.__aenter__ = AsyncMock(return_value=AsyncMock())
+    session_factory.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    monkeypatch.setattr(chat_api, "SPECULATIVE_RESPONSE_ENABLED", True)
+    monkeypatch.setattr(chat_api, "coalesce_tokens", lambda chunks: chunks)
+    monkeypatch.setattr(speculative_module, "get_process_info", make_pipeline(PLAN))
+    monkeypatch.setattr(speculative_module.ResponseGenerator, "create_opening_streaming_response", opening)
+    monkeypatch.setattr(chat_api.ResponseGenerator, "create_streaming_response", continuation)
+
+    with patch.object(chat_api.ChatHistoryManager, "save_message", side_effect=save_message), \
+         patch.object(chat_api.ChatHistoryManager, "save_process_info", new_callable=AsyncMock):
+        frames = [frame async for frame in chat_api.generate_streaming_response("问题", "s", [], True, session_factory)]
+
+    assert continuation_calls[0][1] == "先说结论："
+    assert list(continuation_calls[0][0]["task_execution"]) == [1, 2]
+    assert saved == ["先说结论：两件事都没问题。"]
+    assert any("先说结论".encode() in frame for frame in frames)
@@ -0,0 +1,49 @@
+import json
+from types import SimpleNamespace
+
+import pydantic
+import pytest
+
+from app.api.sse import encode_event, encode_token
+
+
+class _Result(pydantic.BaseModel):
+    status: str
+    content: list
+
+
+def _payload(frame: bytes):
+    assert frame.startswith(b"data: ") and frame.endswith(b"\n\n")
+    return json.loads(frame[len(b"data: "):-2])
+
+
+@pytest.mark.parametrize("chunk", ["你好", 'say "hi"', "line\nbreak", "\\", "", "emoji 🎉"])
+def test_token_frame_matches_json_payload(chunk):
+    assert _payload(encode_token(chunk)) == {"content": chunk}
+
+
+def test_event_frame_serializes_models_and_plain_objects():
+    event = {
+        "type": "data",
+        "subtype": "task_result",
+        "content": {
+            "task_id": "task1",
+            "result": _Result(status="success", content=[SimpleNamespace(type="text", text="晴")]),
+            1: "非字符串键",
+        },
+    }
+
+    assert _payload(encode_event(event)) == {
+        "type": "data",
+        "subtype": "task_result",
+        "content": {
+            "task_id": "task1",
+            "result": {"status": "success", "content": [{"type": "text", "text": "晴"}]},
+            "1": "非字符串键",
+        },
+    }
+
+
+def test_event_frame_rejects_unserializable_values():
+    with pytest.raises(TypeError):
+        encode_event({"content": {1, 2}})
@@ -0,0 +1,149 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.agent import LLMController as controller_module
+from app.agent import TaskPlanner as planner_module
+from app.agent.LLMController import get_streaming_process_info
+from app.agent.PlanStreamParser import PlanStreamParser
+from app.agent.TaskPlanner import TaskPlanner
+
+
+PLAN_TEXT = """```json
+{
+  "tasks": [
+    {"id": 1, "task": "查询天气", "input": "明天 {杭州}", "depends_on": []},
+    {"id": 2, "task": "查询\\"课表\\"", "input": "明天", "depends_on": [1]}  // 依赖任务1
+  ],
+}
+```"""
+
+
+def chunks(text, size):
+    return [text[index:index + size] for index in range(0, len(text), size)]
+
+
+def fake_llm(pieces, error=None):
+    async def astream(messages):
+        for piece in pieces:
+            yield SimpleNamespace(content=piece, usage_metadata=None)
+        if error is not None:
+            raise error
+
+    return MagicMock(astream=astream)
+
+
+@pytest.mark.parametrize("size", [1, 7, len(PLAN_TEXT)])
+def test_parser_yields_each_task_once_it_closes(size):
+    parser = PlanStreamParser()
+    seen = []
+    for piece in chunks(PLAN_TEXT, size):
+        for task in parser.feed(piece):
+            seen.append((task["id"], len(parser.text)))
+
+    assert [task_id for task_id, _ in seen] == [1, 2]
+    assert parser.tasks[0]["input"] == "明天 {杭州}"
+    assert parser.tasks[1]["task"] == '查询"课表"'
+    assert parser.complete
+    if size == 1:
+        # 第一个任务在第二个任务开始输出前就已解析
+        assert seen[0][1] < PLAN_TEXT.index('{"id": 2')
+
+
+def test_parser_keeps_tasks_before_malformed_object():
+    parser = PlanStreamParser()
+
+    tasks = parser.feed('{"tasks": [{"id": 1, "task": "a"}, {"id": 2, task: b}, {"id": 3}]}')
+
+    assert [task["id"] for task in tasks] == [1]
+    assert parser.error and not parser.complete
+
+
+@pytest.mark.asyncio
+async def test_stream_task_plan_yields_tasks(monkeypatch):
+    monkeypatch.setattr(planner_module.LLMService, "get_llm", AsyncMock(return_value=fake_llm(chunks(PLAN_TEXT, 5))))
+
+    tasks = [task async for task in TaskPlanner.stream_task_plan("明天的天气和课表")]
+
+    assert [task["id"] for task in tasks] == [1, 2]
+    assert tasks[1]["depends_on"] == [1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("pieces,error", [
+    (["抱歉，我无法规划"], None),
+    (['{"tasks": [{"id": 1, oops}]}'], None),
+    (['{"tasks": [{"id"'], RuntimeError("connection reset")),
+])
+async def test_malformed_stream_falls_back(monkeypatch, pieces, error):
+    monkeypatch.setattr(planner_module.LLMService, "get_llm", AsyncMock(return_value=fake_llm(pieces, error)))
+
+    tasks = [task async for task in TaskPlanner.stream_task_plan("你好")]
+
+    assert tasks == (await TaskPlanner._get_fallback_plan("你好"))["tasks"]
+
+
+def patch_pipeline(monkeypatch, planned_tasks, first_result_seen):
+    async def stream_task_plan(message):
+        yield planned_tasks[0]
+        # 第一个任务执行完之前不输出后续任务，证明执行与规划重叠
+        await asyncio.wait_for(first_result_seen.wait(), timeout=1)
+        for task in planned_tasks[1:]:
+            yield task
+
+    async def select_tools_for_tasks(task_plan):
+        return {"tool_selections": [
+            {"task_id": task["id"], "tool": f"tool_{task['id']}", "params": {}}
+            for task in task_plan["tasks"]
+        ]}
+
+    async def execute_task(task, tool_selection, task_results):
+        if task["id"] == 1:
+            first_result_seen.set()
+        return {"answer": f"结果{task['id']}", "deps": sorted(task_results)}
+
+    monkeypatch.setattr(controller_module.TaskPlanner, "stream_task_plan", stream_task_plan)
+    monkeypatch.setattr(controller_module.ToolSelector, "select_tools_for_tasks", select_tools_for_tasks)
+    monkeypatch.setattr(controller_module.TaskExecutor, "execute_task", execute_task)
+
+
+@pytest.mark.asyncio
+async def test_first_task_runs_before_planner_finishes(monkeypatch):
+    planned_tasks = [
+        {"id": 1, "task": "查询天气", "input": "明天", "depends_on": []},
+        {"id": 2, "task": "查询课表", "input": "明天", "depends_on": [1]},
+    ]
+    patch_pipeline(monkeypatch, planned_tasks, asyncio.Event())
+
+    events = [event async for event in get_streaming_process_info("明天的天气和课表")]
+
+    data = [(event["subtype"], event["content"]) for event in events if event["type"] == "data"]
+    first_result = next(index for index, (subtype, _) in enumerate(data) if subtype == "task_result")
+    full_plan = next(index for index, (subtype, content) in enumerate(data) if subtype == "task_plan" and len(content) == 2)
+    assert first_result < full_plan
+
+    summary = data[-1][1]
+    assert summary["task_planning"] == {"tasks": planned_tasks}
+    assert [selection["tool"] for selection in summary["tool_selection"]["tool_selections"]] == ["tool_1", "tool_2"]
+    assert summary["task_execution"][2] == {"status": "success", "api_result": {"answer": "结果2", "deps": [1]}}
+
+
+@pytest.mark.asyncio
+async def test_dependency_on_later_or_unplanned_task_is_skipped(monkeypatch):
+    planned_tasks = [
+        {"id": 1, "task": "查询天气", "input": "明天", "depends_on": []},
+        {"id": 2, "task": "汇总", "input": "", "depends_on": [9]},
+        {"id": 3, "task": "循环依赖", "input": "", "depends_on": [4]},
+        {"id": 4, "task": "循环依赖", "input": "", "depends_on": [3]},
+    ]
+    patch_pipeline(monkeypatch, planned_tasks, asyncio.Event())
+
+    events = [event async for event in get_streaming_process_info("明天天气")]
+
+    summary = events[-1]["content"]
+    assert summary["task_execution"][1]["status"] == "success"
+    assert {task_id: result["status"] for task_id, result in summary["task_execution"].items() if task_id > 1} == {
+        2: "skipped", 3: "skipped", 4: "skipped",
+    }
@@ -0,0 +1,104 @@
+import json
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.agent import TaskPlanner as planner_module
+from app.agent import ToolSelector as selector_module
+from app.agent.StructuredOutput import StructuredOutputError, parse_task_plan, parse_tool_selections
+from app.agent.TaskPlanner import TaskPlanner
+from app.agent.ToolSelector import ToolSelector
+from app.services.json_repair import loads_tolerant
+from app.services.llm_service import LLMService, supports_json_mode
+from app.services.pipeline_metrics import PIPELINE_METRICS
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    PIPELINE_METRICS.reset()
+    yield
+    PIPELINE_METRICS.reset()
+
+
+@pytest.mark.parametrize("text,expected", [
+    ('好的，计划如下：\n```json\n{"tasks": [{"id": 1,},],}\n```\n如有需要请告诉我', {"tasks": [{"id": 1}]}),
+    ('{"a": "http://x.cn/a", // 注释\n "b": [1, /* 2 */ 3]}', {"a": "http://x.cn/a", "b": [1, 3]}),
+    ('{"ok": True, "none": None, "text": "True"}', {"ok": True, "none": None, "text": "True"}),
+    ('{"tasks": [{"id": 1, "task": "被截断', {"tasks": [{"id": 1, "task": "被截断"}]}),
+])
+def test_repair_fixes_common_llm_mistakes(text, expected):
+    assert loads_tolerant(text) == (expected, True)
+
+
+def test_valid_json_is_not_marked_repaired():
+    assert loads_tolerant(' {"tasks": []} ') == ({"tasks": []}, False)
+
+
+def test_plan_drops_invalid_tasks_and_counts_repair():
+    plan = parse_task_plan(json.dumps({"tasks": [
+        {"id": "1", "task": "查天气", "depends_on": None},
+        {"task": "缺少 id"},
+    ]}))
+
+    assert plan["tasks"] == [{"id": 1, "task": "查天气", "input": "", "depends_on": []}]
+    assert PIPELINE_METRICS.snapshot()["structured_output"]["planner"]["repaired"] == 1
+
+
+@pytest.mark.parametrize("text", ["我无法完成", '{"tasks": []}', '{"tasks": [{"task": "缺少 id"}]}', '{"plan": []}'])
+def test_unusable_plan_raises(text):
+    with pytest.raises(StructuredOutputError):
+        parse_task_plan(text)
+
+
+def test_selection_list_without_wrapper_is_accepted():
+    selections = parse_tool_selections('[{"task_id": 1, "tool": "campus-notice", "params": null}]')
+
+    assert selections == {"tool_selections": [{"task_id": 1, "tool": "campus-notice", "params": {}, "reason": ""}]}
+
+
+def fake_llm(content):
+    return MagicMock(ainvoke=AsyncMock(return_value=SimpleNamespace(content=content, response_metadata={}, usage_metadata=None)))
+
+
+@pytest.mark.asyncio
+async def test_planner_requests_json_mode_and_repairs_output(monkeypatch):
+    get_llm = AsyncMock(return_value=fake_llm('计划：```json\n{"tasks": [{"id": 1, "task": "查课表", "input": "明天", "depends_on": [],}]}\n```'))
+    monkeypatch.setattr(planner_module.LLMService, "get_llm", get_llm)
+
+    plan = await TaskPlanner.create_task_plan("明天有什么课")
+
+    assert plan["tasks"][0]["task"] == "查课表"
+    assert get_llm.await_args.kwargs["json_mode"] is True
+    assert PIPELINE_METRICS.snapshot()["structured_output"]["planner"] == {
+        "parsed": 0, "repaired": 1, "fallback": 0, "fallback_rate": 0.0,
+    }
+
+
+@pytest.mark.asyncio
+async def test_fallbacks_are_counted(monkeypatch):
+    monkeypatch.setattr(planner_module.LLMService, "get_llm", AsyncMock(return_value=fake_llm("抱歉")))
+    monkeypatch.setattr(selector_module.ServerManager, "get_instance", AsyncMock(side_effect=RuntimeError("offline")))
+    monkeypatch.setattr(selector_module.LLMService, "get_llm", AsyncMock(return_value=fake_llm('{"tool_selections": [{"tool": "x"}]}')))
+
+    plan = await TaskPlanner.create_task_plan("你好")
+    selections = await ToolSelector.select_tools_for_tasks(plan)
+
+    assert plan["tasks"] == [{"id": 1, "task": "处理用户请求", "input": "你好", "depends_on": []}]
+    assert selections["tool_selections"][0]["tool"] == "general_assistant"
+    metrics = PIPELINE_METRICS.snapshot()["structured_output"]
+    assert metrics["planner"]["fallback"] == 1
+    assert metrics["selector"]["fallback_rate"] == 1.0
+
+
+@pytest.mark.asyncio
+async def test_json_mode_binds_response_format(monkeypatch):
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "test-key")
+    monkeypatch.setattr(LLMService, "_llm_instances", {})
+
+    llm = await LLMService.get_llm(model_name="deepseek-v4-flash", temperature=0.1, json_mode=True)
+    plain = await LLMService.get_llm(model_name="deepseek-v4-flash", temperature=0.1)
+
+    assert llm.kwargs == {"response_format": {"type": "json_object"}}
+    assert not hasattr(plain, "kwargs")
+    assert not supports_json_mode("deepseek-reasoner")
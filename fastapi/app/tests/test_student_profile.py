@@ -27,14 +27,16 @@ def test_student_profile_document_contains_required_fields():
 
 
 def test_student_profile_is_inserted_into_agent_prompt():
-    prompt = ResponseGenerator._create_response_prompt(
+    messages = ResponseGenerator._create_response_messages(
+        "我的导师是谁？",
         {
             "user_input": "我的导师是谁？",
             "task_planning": {},
             "tool_selection": {},
             "task_execution": {},
-        }
+        },
     )
+    prompt = messages[0]["content"]
 
     assert "当前用户学生画像" in prompt
     assert "林若溪" in prompt
@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.api.sse import coalesce_tokens
+
+
+async def _stream(chunks, delay=0.0):
+    for chunk in chunks:
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk
+
+
+async def _collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_first_token_is_flushed_then_chunks_merge_by_size():
+    tokens = ["你"] + ["ab"] * 10
+
+    frames = await _collect(coalesce_tokens(_stream(tokens), max_chars=8, max_delay_ms=1000))
+
+    assert frames[0] == "你"
+    assert frames[1:] == ["abababab", "abababab", "abab"]
+    assert "".join(frames) == "".join(tokens)
+
+
+@pytest.mark.asyncio
+async def test_buffer_is_flushed_after_delay_when_upstream_stalls():
+    async def stalled():
+        yield "首"
+        yield "a"
+        yield "b"
+        await asyncio.sleep(0.2)
+        yield "c"
+
+    started = asyncio.get_running_loop().time()
+    arrivals = []
+    async for frame in coalesce_tokens(stalled(), max_chars=100, max_delay_ms=20):
+        arrivals.append((frame, asyncio.get_running_loop().time() - started))
+
+    assert [frame for frame, _ in arrivals] == ["首", "ab", "c"]
+    # "ab" 在上游停顿期间按时间窗口输出，而不是等到 "c" 到达
+    assert arrivals[1][1] < 0.15
+
+
+@pytest.mark.asyncio
+async def test_events_flush_buffered_tokens_and_keep_their_order():
+    event = {"type": "data", "subtype": "task_result"}
+    items = ["开", "头", "是", event, "后", "续"]
+
+    frames = await _collect(coalesce_tokens(_stream(items), max_chars=100, max_delay_ms=1000))
+
+    assert frames == ["开", "头是", event, "后续"]
+
+
+@pytest.mark.asyncio
+async def test_disabled_coalescing_passes_tokens_through():
+    frames = await _collect(coalesce_tokens(_stream(["a", "", "b"]), max_chars=0))
+
+    assert frames == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_upstream_errors_propagate_and_closing_cancels_upstream():
+    async def failing():
+        yield "a"
+        raise RuntimeError("upstream failed")
+
+    with pytest.raises(RuntimeError):
+        await _collect(coalesce_tokens(failing(), max_chars=4))
+
+    cancelled = asyncio.Event()
+
+    async def endless():
+        try:
+            while True:
+                yield "x"
+                await asyncio.sleep(0.001)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    stream = coalesce_tokens(endless(), max_chars=4, max_delay_ms=1000)
+    assert await stream.__anext__() == "x"
+    await stream.aclose()
+    assert cancelled.is_set()
@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+import pytest
+
+from app.api.v1.capabilities import list_capabilities
+from app.services.mcp_server import Tool
+from app.services.server_manager import ServerManager
+from app.services.tool_catalog import ToolCatalogService
+from app.skills import SkillRegistry
+
+
+WEATHER = Tool("campus_weather", "查询校园或城市天气", {"properties": {"location": {"description": "地点"}}})
+SEARCH = Tool("web_search", "搜索互联网", {"properties": {"search_query": {"description": "搜索内容"}}})
+
+
+@pytest.fixture
+def mcp_tools(monkeypatch):
+    monkeypatch.setattr(ServerManager, "_initialized", True)
+    monkeypatch.setattr(ServerManager, "_cached_tools", [WEATHER])
+
+    def replace(tools):
+        monkeypatch.setattr(ServerManager, "_cached_tools", tools)
+
+    return replace
+
+
+@pytest.mark.asyncio
+async def test_catalog_is_reused_until_sources_change(mcp_tools):
+    first = await ToolCatalogService.current()
+
+    # 来源未变化时直接复用快照，不再序列化工具
+    with patch("app.services.tool_catalog.serialize_tool", side_effect=AssertionError("catalog rebuilt")):
+        assert await ToolCatalogService.current() is first
+
+    assert "campus_weather" in first.text
+    assert "general_assistant" in first.text
+    assert [tool.name for tool in first.tools] == sorted(tool.name for tool in first.tools)
+
+
+@pytest.mark.asyncio
+async def test_version_increases_only_when_content_changes(mcp_tools):
+    first = await ToolCatalogService.current()
+
+    mcp_tools([WEATHER])
+    same_content = await ToolCatalogService.current()
+    mcp_tools([WEATHER, SEARCH])
+    changed = await ToolCatalogService.current()
+
+    assert same_content is not first
+    assert same_content.version == first.version
+    assert same_content.digest == first.digest
+    assert changed.version == first.version + 1
+    assert changed.digest != first.digest
+    assert "web_search" in changed.text
+
+
+@pytest.mark.asyncio
+async def test_skill_rediscovery_rebuilds_catalog(mcp_tools, monkeypatch):
+    first = await ToolCatalogService.current()
+
+    monkeypatch.setattr(SkillRegistry, "_initialized", False)
+    second = await ToolCatalogService.current()
+
+    assert second is not first
+    assert second.version == first.version
+
+
+@pytest.mark.asyncio
+async def test_capabilities_serves_catalog_json(mcp_tools):
+    catalog = await ToolCatalogService.current()
+
+    result = await list_capabilities()
+
+    assert result["tools"] is catalog.tool_items
+    assert result["skills"] is catalog.skill_items
+    assert result["catalog"] == {"version": catalog.version, "hash": catalog.digest}
+    assert result["tools"][0]["input_schema"]["properties"]["location"]["description"] == "地点"
@@ -0,0 +1,120 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app.agent.ToolSelector import ToolSelector
+from app.services.mcp_server import Tool
+from app.services.server_manager import ServerManager
+from app.services.tool_index import ToolIndex, tokenize
+
+
+def schema(**properties):
+    return {
+        "type": "object",
+        "properties": {name: {"type": "string", "description": description} for name, description in properties.items()},
+        "required": list(properties)[:1],
+    }
+
+
+# 与线上一致的工具目录：高德地图、网络搜索、天气 MCP 以及本地 skill
+CATALOG = [
+    Tool("maps_regeocode", "将一个高德经纬度坐标转换为行政区划地址信息", schema(location="经纬度")),
+    Tool("maps_geo", "将详细的结构化地址转换为经纬度坐标。支持对地标性名胜景区、建筑物名称解析为经纬度坐标", schema(address="待解析的结构化地址信息", city="指定查询的城市")),
+    Tool("maps_ip_location", "IP 定位根据用户输入的 IP 地址，定位 IP 的所在位置", schema(ip="IP地址")),
+    Tool("maps_weather", "根据城市名称或者标准adcode查询指定城市的天气", schema(city="城市名称或者adcode")),
+    Tool("maps_search_detail", "查询关键词搜或者周边搜获取到的POI ID的详细信息", schema(id="关键词搜或者周边搜获取到的POI ID")),
+    Tool("maps_bicycling", "骑行路径规划用于规划骑行通勤方案，规划时会考虑天桥、单行线、封路等情况。最大支持 500km 的骑行路线规划", schema(origin="出发点经纬度", destination="目的地经纬度")),
+    Tool("maps_direction_walking", "步行路径规划 API 可以根据输入起点终点经纬度坐标规划100km 以内的步行通勤方案，并且返回通勤方案的数据", schema(origin="出发点经纬度", destination="目的地经纬度")),
+    Tool("maps_direction_driving", "驾车路径规划 API 可以根据用户起终点经纬度坐标规划以小客车、轿车通勤出行的方案，并且返回通勤方案的数据", schema(origin="出发点经纬度", destination="目的地经纬度")),
+    Tool("maps_direction_transit_integrated", "公交路径规划 API 可以根据用户起终点经纬度坐标规划综合各类公共（火车、公交、地铁）交通方式的通勤方案，并且返回通勤方案的数据，跨城场景下必须传起点城市与终点城市", schema(origin="出发点经纬度", destination="目的地经纬度", city="公共交通规划起点城市", cityd="公共交通规划终点城市")),
+    Tool("maps_distance", "距离测量 API 可以测量两个经纬度坐标之间的距离,支持驾车、步行以及球面距离测量", schema(origins="起点经纬度", destination="终点经纬度", type="距离测量类型")),
+    Tool("maps_text_search", "关键词搜，根据用户传入关键词，搜索出相关的POI", schema(keywords="搜索关键词", city="查询城市")),
+    Tool("maps_around_search", "周边搜，根据用户传入关键词以及坐标location，搜索出radius半径范围的POI", schema(keywords="搜索关键词", location="中心点经纬度", radius="搜索半径")),
+    Tool("web_search", "智谱网络搜索，搜索互联网上的实时新闻、资料与网页内容", schema(search_query="搜索内容")),
+    Tool("campus_weather", "查询校园或城市天气。适用于询问杭州、临安、浙江农林大学、东湖校区、衣锦校区等地的当前天气和未来 1-7 天天气预报。", schema(location="地点", days="天数")),
+    Tool("campus-notice", "查询最新校园通知。用于用户询问奖学金申请、开学注意事项、运动会、教务公告、安全检查、图书馆开放等校园通知信息时。", schema(query="用户原始查询", params="结构化参数")),
+    Tool("venue-booking", "查询校园场地并生成 mock 场地预约单。用于用户规划讲座、会议、培训、活动、场馆借用、容量筛选、校区筛选、设备要求和时段冲突检查时。", schema(query="用户原始查询", params="结构化参数")),
+    Tool("course-schedule", "查询浙江农林大学课程表。用于用户询问课表、某专业某学期课程、某天课程、课程地点、任课教师或课程编号时。", schema(query="用户原始查询", params="结构化参数")),
+]
+
+# 规划器产出的典型任务及其应选工具
+LABELED_TASKS = [
+    ("查询东湖校区明天的天气", "明天 东湖校区", {"campus_weather", "maps_weather"}),
+    ("查询奖学金申请通知", "奖学金申请", {"campus-notice"}),
+    ("查询计算机专业本学期课表", "计算机 本学期", {"course-schedule"}),
+    ("查询周三上午的课程地点和任课教师", "周三上午", {"course-schedule"}),
+    ("预约一间能容纳100人的讲座场地", "100人 讲座", {"venue-booking"}),
+    ("规划从东湖校区到西湖的公交路线", "东湖校区 西湖", {"maps_direction_transit_integrated"}),
+    ("规划步行到图书馆的路线", "图书馆", {"maps_direction_walking"}),
+    ("规划骑行到临安汽车站的路线", "临安汽车站", {"maps_bicycling"}),
+    ("驾车去杭州东站的路线", "杭州东站", {"maps_direction_driving"}),
+    ("把浙江农林大学东湖校区的地址转换为经纬度坐标", "浙江农林大学东湖校区", {"maps_geo"}),
+    ("搜索学校周边的奶茶店", "奶茶店", {"maps_around_search", "maps_text_search"}),
+    ("测量两个地点之间的距离", "宿舍 体育馆", {"maps_distance"}),
+    ("搜索互联网上关于人工智能的最新新闻", "人工智能 新闻", {"web_search"}),
+    ("查询运动会的安排通知", "运动会", {"campus-notice"}),
+    ("根据IP地址定位所在城市", "IP", {"maps_ip_location"}),
+    ("查询图书馆开放时间的通知", "图书馆开放时间", {"campus-notice"}),
+]
+
+
+def test_tokenize_splits_cjk_bigrams_and_tool_names():
+    assert tokenize("查询天气") == ["查询", "询天", "天气"]
+    assert tokenize("maps_direction_walking".replace("_", " ")) == ["maps", "direction", "walking"]
+    assert tokenize("IP 定位") == ["定位", "ip"]
+
+
+def test_recall_at_k_on_labeled_tasks():
+    index = ToolIndex(CATALOG)
+    hits = 0
+    for task, task_input, expected in LABELED_TASKS:
+        names = {tool.name for tool, _ in index.search(f"{task} {task_input}", k=5)}
+        hits += bool(names & expected)
+
+    recall = hits / len(LABELED_TASKS)
+    assert recall >= 0.9, f"recall@5 = {recall:.2f}"
+
+
+def test_top1_picks_expected_tool_for_unambiguous_tasks():
+    index = ToolIndex(CATALOG)
+
+    assert index.search("查询奖学金申请通知")[0][0].name == "campus-notice"
+    assert index.search("查询计算机专业本学期课表")[0][0].name == "course-schedule"
+    assert index.search("规划骑行路线")[0][0].name == "maps_bicycling"
+
+
+def test_retrieve_for_plan_unions_tasks_within_limit():
+    index = ToolIndex(CATALOG)
+    plan = {"tasks": [
+        {"id": 1, "task": "查询明天的天气", "input": "明天"},
+        {"id": 2, "task": "查询课表", "input": "明天"},
+    ]}
+
+    names = [tool.name for tool in index.retrieve_for_plan(plan, k=3, limit=4)]
+
+    assert len(names) == len(set(names)) <= 4
+    assert "campus_weather" in names
+    assert "course-schedule" in names
+    assert index.retrieve_for_plan({"tasks": [{"id": 1, "task": "你好"}]}) == []
+
+
+@pytest.mark.asyncio
+async def test_selector_prompt_lists_only_retrieved_tools(monkeypatch):
+    llm = MagicMock()
+    llm.ainvoke = AsyncMock(return_value=MagicMock(content='{"tool_selections": []}'))
+    plan = {"tasks": [{"id": 1, "task": "查询奖学金申请通知", "input": "奖学金", "depends_on": []}]}
+
+    monkeypatch.setattr(ServerManager, "_initialized", True)
+    # 后三项对应仓库内置的本地 skill，由 SkillRegistry 提供
+    monkeypatch.setattr(ServerManager, "_cached_tools", CATALOG[:-3])
+
+    with patch("app.agent.ToolSelector.ServerManager.get_instance", AsyncMock()), \
+            patch("app.agent.ToolSelector.TOOL_RETRIEVAL_MIN_CATALOG", 10), \
+            patch("app.agent.ToolSelector.LLMService.get_llm", AsyncMock(return_value=llm)):
+        await ToolSelector.select_tools_for_tasks(plan)
+
+    system, user = (message["content"] for message in llm.ainvoke.await_args.args[0])
+    assert "general_assistant" in system
+    assert "campus-notice" not in system
+    assert "<候选工具>" in user and "campus-notice" in user
+    assert "maps_bicycling" not in system + user
@@ -0,0 +1,182 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.agent import TaskExecutor as executor_module
+from app.agent.TaskExecutor import TaskExecutor
+from app.services.mcp_server import Tool
+from app.services.server_manager import ServerManager
+from app.services.tool_params import ParamValidator, compile_validators
+
+
+DRIVING = Tool("maps_direction_driving", "驾车路径规划", {
+    "type": "object",
+    "properties": {
+        "origin": {"type": "string", "description": "出发点经纬度"},
+        "destination": {"type": "string", "description": "目的地经纬度"},
+        "strategy": {"type": "integer", "enum": [0, 1, 2]},
+        "avoid_highway": {"type": "boolean"},
+        "waypoints": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["origin", "destination"],
+    "additionalProperties": False,
+})
+
+
+def test_cheap_coercions_repair_params_locally():
+    validator = ParamValidator(DRIVING.name, DRIVING.input_schema)
+    params = {"origin": 119.72, "destination": "120.1,30.2", "strategy": "1", "avoid_highway": "是", "waypoints": "120,30", "note": "多余"}
+
+    result = validator.validate(params)
+
+    assert result.ok
+    assert result.params == {"origin": "119.72", "destination": "120.1,30.2", "strategy": 1, "avoid_highway": True, "waypoints": ["120,30"]}
+    assert result.repaired == ["avoid_highway", "note", "origin", "strategy", "waypoints"]
+    assert params["strategy"] == "1"
+
+
+@pytest.mark.parametrize("params,message", [
+    ({"origin": "120,30"}, "缺少必填参数 destination"),
+    ({"origin": "120,30", "destination": "", "strategy": 1}, "缺少必填参数 destination"),
+    ({"origin": "120,30", "destination": "121,31", "strategy": "最快"}, "params.strategy 应为 integer"),
+    ({"origin": "120,30", "destination": "121,31", "strategy": 5}, "params.strategy 应为 [0, 1, 2] 之一"),
+    ({"origin": "120,30", "destination": "121,31", "waypoints": [{"lng": 120}]}, "params.waypoints[0] 应为 string"),
+])
+def test_invalid_params_are_reported(params, message):
+    result = ParamValidator(DRIVING.name, DRIVING.input_schema).validate(params)
+
+    assert not result.ok
+    assert message in result.errors[0]
+
+
+def test_weekday_names_become_day_numbers():
+    validator = ParamValidator("course-schedule", {"properties": {
+        "day_of_week": {"type": "integer", "format": "weekday"},
+    }})
+
+    assert validator.validate({"day_of_week": "星期三", "major": "计算机"}).params == {"day_of_week": 3, "major": "计算机"}
+    assert validator.validate({"day_of_week": "8"}).errors == ["params.day_of_week 不是有效的星期: '8'"]
+
+
+BOUNDED = {"properties": {
+    "radius": {"type": "integer", "minimum": 1, "maximum": 50000},
+    "page": {"type": "integer", "default": 1},
+    "sort": {"type": "string", "enum": ["distance"], "default": None},
+}}
+
+
+def test_lenient_validator_clamps_numbers_and_defaults_replace_bad_values():
+    validator = ParamValidator("demo", BOUNDED, lenient=True)
+
+    result = validator.validate({"radius": "约100000米", "page": "第一页", "sort": "weight"})
+
+    assert result.ok
+    assert result.params == {"radius": 50000, "page": 1}
+
+
+@pytest.mark.parametrize("params,message", [
+    ({"radius": 100000}, "params.radius 应不大于 50000"),
+    ({"radius": 0}, "params.radius 应不小于 1"),
+    ({"page": "第一页"}, "params.page 应为 integer"),
+    ({"sort": "weight"}, "params.sort 应为 ['distance'] 之一"),
+])
+def test_strict_validator_keeps_bounds_and_ignores_defaults(params, message):
+    result = ParamValidator("demo", BOUNDED).validate(params)
+
+    assert not result.ok
+    assert message in result.errors[0]
+
+
+def skill_validator(name):
+    from app.skills import SkillRegistry
+
+    skill = SkillRegistry.get_tool(name)
+    return compile_validators([skill])[skill.name]
+
+
+@pytest.mark.parametrize("name,params,expected", [
+    # 处理函数会提取数字：venue_service._normalize_int
+    ("venue-booking", {"capacity_min": "100人", "equipment": "投影,音响"}, {"capacity_min": 100, "equipment": "投影,音响"}),
+    ("venue-booking", {"attendee_count": "约80", "action": "Reserve"}, {"attendee_count": 80, "action": "Reserve"}),
+    ("venue-booking", {"capacity_min": "1,000"}, {"capacity_min": 1000}),
+    # 处理函数把无法解析的人数当作未提供
+    ("venue-booking", {"capacity_min": "很多人", "campus": "东湖校区"}, {"campus": "东湖校区"}),
+    # campus_notice_service 把 limit 截断到 1..20，无法解析时用 5
+    ("campus-notice", {"limit": 50, "keyword": "奖学金"}, {"limit": 20, "keyword": "奖学金"}),
+    ("campus-notice", {"limit": "3条"}, {"limit": 3}),
+    ("campus-notice", {"limit": "全部"}, {"limit": 5}),
+    # 无法识别的星期不过滤，与 normalize_day 返回 None 时一致
+    ("course-schedule", {"day_of_week": "周五", "major": "计算机科学"}, {"day_of_week": 5, "major": "计算机科学"}),
+    ("course-schedule", {"day_of_week": "周3"}, {}),
+    ("course-schedule", {"day": 0, "grade": "2023级"}, {"grade": "2023级"}),
+    ("course-schedule", {"day_of_week": 2}, {"day_of_week": 2}),
+])
+def test_skill_schemas_accept_what_handlers_accept(name, params, expected):
+    result = skill_validator(name).validate(params)
+
+    assert result.ok
+    assert result.params == expected
+
+
+def test_validators_compile_from_mcp_schemas_and_skill_metadata():
+    skill = MagicMock(metadata={"input_schema": {"properties": {"limit": {"type": "integer"}}}}, spec=["name", "metadata"])
+    skill.name = "campus-notice"
+    untyped = Tool("web_search", "搜索", {})
+
+    validators = compile_validators([DRIVING, skill, untyped])
+
+    assert sorted(validators) == ["campus-notice", "maps_direction_driving"]
+    # MCP 工具保持严格校验，只有 skill 的 schema 截断边界、替换默认值
+    assert validators["campus-notice"].lenient
+    assert not validators["maps_direction_driving"].lenient
+
+
+@pytest.fixture
+def amap_server(monkeypatch):
+    server = MagicMock()
+    server.list_tools = AsyncMock(return_value=[DRIVING])
+    server.execute_tool = AsyncMock(return_value={"route": "ok"})
+    monkeypatch.setattr(ServerManager, "_initialized", True)
+    monkeypatch.setattr(ServerManager, "_cached_tools", [DRIVING])
+    monkeypatch.setattr(ServerManager, "_servers", {"amap": server})
+    return server
+
+
+@pytest.mark.asyncio
+async def test_invalid_call_fails_before_dispatch(amap_server):
+    result = await TaskExecutor.execute_task(
+        {"id": 2, "task": "规划路线"},
+        {"tool": "maps_direction_driving", "params": {"origin": "{TASK_1_RESULT.location}"}},
+        {1: {"status": "success", "api_result": {"location": "119.72,30.26"}}},
+    )
+
+    assert result["error"].startswith("参数校验失败")
+    amap_server.execute_tool.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_repaired_params_are_dispatched(amap_server):
+    result = await TaskExecutor.execute_task(
+        {"id": 1, "task": "规划路线"},
+        {"tool": "maps_direction_driving", "params": {"origin": "119.72,30.26", "destination": "120.1,30.2", "strategy": "2"}},
+        {},
+    )
+
+    assert result == {"route": "ok"}
+    amap_server.execute_tool.assert_awaited_once_with(
+        "maps_direction_driving", {"origin": "119.72,30.26", "destination": "120.1,30.2", "strategy": 2},
+    )
+
+
+@pytest.mark.asyncio
+async def test_skill_params_use_frontmatter_schema(monkeypatch):
+    execute = AsyncMock(return_value={"status": "success"})
+    monkeypatch.setattr(executor_module.SkillRegistry, "execute_tool", execute)
+
+    await TaskExecutor.execute_task(
+        {"id": 1, "task": "查课表"},
+        {"tool": "course_schedule", "params": {"params": {"day_of_week": "周五"}, "query": "周五的课"}},
+        {},
+    )
+
+    execute.assert_awaited_once_with("course_schedule", {"day_of_week": 5, "query": "周五的课"})
@@ -0,0 +1,158 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.turn_stream import ReplayGap, TurnRegistry, TurnStream, parse_event_id
+from app.api.v1 import chat as chat_api
+from app.services.access_service import AccessPrincipal
+
+
+PRINCIPAL = AccessPrincipal(
+    access_id=0,
+    user_id=1,
+    label="tester",
+    expires_at=datetime.utcnow() + timedelta(days=1),
+    max_calls=10,
+    calls_used=0,
+)
+
+
+async def frames(count, gate=None):
+    for index in range(1, count + 1):
+        if gate is not None and index == 3:
+            await gate.wait()
+        yield f"data: {index}\n\n".encode()
+
+
+def payloads(chunks):
+    return [chunk.split(b"\n")[1] for chunk in chunks]
+
+
+def test_parse_event_id():
+    assert parse_event_id("abc:12") == ("abc", 12)
+    assert parse_event_id(" abc:0 ") == ("abc", 0)
+    assert parse_event_id("abc") is None
+    assert parse_event_id("abc:x") is None
+    assert parse_event_id(":3") is None
+
+
+@pytest.mark.asyncio
+async def test_frames_carry_ids_and_resume_after_last_event_id():
+    registry = TurnRegistry()
+    turn = registry.start(frames(4), user_id=1, session_id="s")
+
+    first = [chunk async for chunk in turn.subscribe()]
+    resumed = [chunk async for chunk in turn.subscribe(after=2)]
+
+    assert first[0] == f"id: {turn.turn_id}:1\ndata: 1\n\n".encode()
+    assert payloads(resumed) == [b"data: 3", b"data: 4"]
+
+
+@pytest.mark.asyncio
+async def test_generation_continues_without_subscriber_and_reconnect_follows_live():
+    registry = TurnRegistry()
+    gate = asyncio.Event()
+    turn = registry.start(frames(4, gate), user_id=1, session_id="s")
+
+    # 客户端读到第 2 帧后断线
+    subscription = turn.subscribe()
+    received = [await subscription.__anext__(), await subscription.__anext__()]
+    await subscription.aclose()
+
+    reconnect = asyncio.create_task(_collect(turn.subscribe(after=2)))
+    await asyncio.sleep(0)
+    gate.set()
+
+    assert payloads(received) == [b"data: 1", b"data: 2"]
+    assert payloads(await reconnect) == [b"data: 3", b"data: 4"]
+    assert turn.done
+
+
+@pytest.mark.asyncio
+async def test_evicted_frames_cannot_be_replayed():
+    registry = TurnRegistry(maxlen=2)
+    turn = registry.start(frames(5), user_id=1, session_id="s")
+    await turn.task
+
+    assert not turn.can_replay(2)
+    assert turn.can_replay(3)
+    with pytest.raises(ReplayGap):
+        [chunk async for chunk in turn.subscribe(after=1)]
+
+
+@pytest.mark.asyncio
+async def test_finished_turns_expire_and_are_scoped_to_owner():
+    registry = TurnRegistry(ttl_seconds=0)
+    turn = registry.start(frames(1), user_id=1, session_id="s")
+
+    assert registry.get(turn.turn_id, user_id=2) is None
+    assert registry.get(turn.turn_id, user_id=1) is turn
+
+    await turn.task
+    assert registry.get(turn.turn_id, user_id=1) is None
+    assert len(registry) == 0
+
+
+@pytest.mark.asyncio
+async def test_chat_resumes_from_buffer_without_rerunning_pipeline(monkeypatch):
+    registry = TurnRegistry()
+    monkeypatch.setattr(chat_api, "TURN_STREAMS", registry)
+    turn = registry.start(frames(3), user_id=1, session_id="s")
+    await turn.task
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("续传不应重新生成")
+
+    monkeypatch.setattr(chat_api, "generate_streaming_response", fail)
+    request = chat_api.schemas.ChatRequest(message="问题", session_id="s")
+
+    response = await chat_api.chat(request, http_request=None, access=PRINCIPAL, last_event_id=f"{turn.turn_id}:1")
+    body = [chunk async for chunk in response.body_iterator]
+
+    assert payloads(body) == [b"data: 2", b"data: 3"]
+    assert response.headers[chat_api.TURN_ID_HEADER] == turn.turn_id
+    with pytest.raises(HTTPException) as exc_info:
+        await chat_api.chat(request, http_request=None, access=PRINCIPAL, last_event_id="unknown:1")
+    assert exc_info.value.status_code == 404
+
+
+async def _collect(iterator):
+    return [chunk async for chunk in iterator]
+
+
+class NoScanDeque(deque):
+    def __iter__(self):
+        raise AssertionError("buffer scanned")
+
+
+@pytest.mark.asyncio
+async def test_subscriber_indexes_buffer_by_seq_without_scanning():
+    turn = TurnStream("t", user_id=1, session_id="s", maxlen=4096)
+    turn._frames = NoScanDeque(turn._frames, maxlen=4096)
+    for index in range(1000):
+        turn.append(f"data: {index}\n\n".encode())
+    turn.finish()
+
+    chunks = [chunk async for chunk in turn.subscribe(after=997)]
+
+    assert [chunk.split(b"\n")[0] for chunk in chunks] == [b"id: t:998", b"id: t:999", b"id: t:1000"]
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_hits_gap_when_buffer_wraps():
+    turn = TurnStream("t", user_id=1, session_id="s", maxlen=2)
+    for index in range(2):
+        turn.append(f"data: {index}\n\n".encode())
+
+    received = []
+    with pytest.raises(ReplayGap):
+        async for chunk in turn.subscribe(after=0):
+            received.append(chunk)
+            # 订阅者处理期间缓冲被写满并淘汰了下一帧
+            turn.append(b"data: x\n\n")
+            turn.append(b"data: y\n\n")
+
+    assert len(received) == 1
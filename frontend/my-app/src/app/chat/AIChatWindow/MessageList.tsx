@@ -1,7 +1,10 @@
 import { ScrollArea } from "@/components/ui/scroll-area";
 import MessageItem from "./MessageItem";
 import ProcessingInfo from "./ProcessingInfo";
-import { useRef, useEffect } from "react";
+import { useRef, useEffect, useLayoutEffect } from "react";
+
+// 距离顶部多少像素时开始加载更早的消息
+const LOAD_OLDER_THRESHOLD = 80;
 
 interface MessageListProps {
   messages: Array<{
@@ -22,6 +25,8 @@ interface MessageListProps {
     taskResults: Record<string, any>;
   } | null;
   isProcessing: boolean;
+  hasOlder?: boolean;
+  onLoadOlder?: () => Promise<boolean>;
 }
 
 export default function MessageList({
@@ -29,16 +34,47 @@ export default function MessageList({
   streamingMessage,
   currentProcessInfo,
   isProcessing,
+  hasOlder = false,
+  onLoadOlder,
 }: MessageListProps) {
   const scrollRef = useRef<HTMLDivElement>(null);
-  
-  // 自动滚动到底部
-  useEffect(() => {
-    if (scrollRef.current) {
-      scrollRef.current.scrollTop = scrollRef.current.scrollHeight;
+  // 加载更早消息前的滚动高度，用于在顶部插入消息后保持当前位置
+  const heightBeforeLoad = useRef<number | null>(null);
+
+  // ScrollArea 的 ref 指向外层容器，实际滚动的是其中的 viewport
+  const getViewport = () =>
+    scrollRef.current?.querySelector<HTMLDivElement>(
+      "[data-radix-scroll-area-viewport]"
+    ) ?? null;
+
+  // 自动滚动到底部；在顶部插入更早的消息时保持当前阅读位置
+  useLayoutEffect(() => {
+    const viewport = getViewport();
+    if (!viewport) return;
+    if (heightBeforeLoad.current !== null) {
+      viewport.scrollTop += viewport.scrollHeight - heightBeforeLoad.current;
+      heightBeforeLoad.current = null;
+      return;
     }
+    viewport.scrollTop = viewport.scrollHeight;
   }, [messages, streamingMessage, currentProcessInfo]);
-  
+
+  // 滚动到顶部附近时加载更早的一页消息
+  useEffect(() => {
+    const viewport = getViewport();
+    if (!viewport || !hasOlder || !onLoadOlder) return;
+    const handleScroll = () => {
+      if (viewport.scrollTop > LOAD_OLDER_THRESHOLD || heightBeforeLoad.current !== null) return;
+      heightBeforeLoad.current = viewport.scrollHeight;
+      onLoadOlder().then((loaded) => {
+        // 没有插入消息时不会触发上面的布局调整，在这里恢复以便再次加载
+        if (!loaded) heightBeforeLoad.current = null;
+      });
+    };
+    viewport.addEventListener("scroll", handleScroll);
+    return () => viewport.removeEventListener("scroll", handleScroll);
+  }, [hasOlder, onLoadOlder]);
+
   return (
     <ScrollArea className="h-full px-4" ref={scrollRef}>
       <div className="flex flex-col gap-4 py-4">
@@ -14,6 +14,8 @@ interface SessionHistoryProps {
   currentSessionId: string | null;
   onSessionChange: (id: string) => void;
   onDeleteSession: (id: string) => void;
+  hasMore?: boolean;
+  onLoadMore?: () => void;
   open: boolean;
   onOpenChange: (open: boolean) => void;
 }
@@ -23,6 +25,8 @@ export default function SessionHistory({
   currentSessionId,
   onSessionChange,
   onDeleteSession,
+  hasMore = false,
+  onLoadMore,
   open,
   onOpenChange,
 }: SessionHistoryProps) {
@@ -52,6 +56,18 @@ export default function SessionHistory({
                 />
               </div>
             ))}
+
+            {hasMore && onLoadMore && (
+              <div className="px-2">
+                <Button
+                  variant="ghost"
+                  className="w-full text-muted-foreground"
+                  onClick={onLoadMore}
+                >
+                  加载更多
+                </Button>
+              </div>
+            )}
           </div>
         </ScrollArea>
       </SheetContent>
@@ -23,6 +23,23 @@ import MessageList from "./AIChatWindow/MessageList";
 import ChatInput from "./AIChatWindow/ChatInput";
 import { apiUrl, fetchWithCSRF } from "./util";
 
+// 流式回复中断后的最大续传次数
+const MAX_STREAM_RETRIES = 3;
+
+// 把接口返回的历史消息转换为消息列表使用的结构
+const toChatMessage = (msg: any) => ({
+  text: msg.content,
+  isUser: msg.is_user,
+  processInfo: msg.process_info
+    ? {
+        steps: msg.process_info.steps,
+        taskPlan: msg.process_info.task_plan,
+        toolSelection: msg.process_info.tool_selection,
+        taskResults: msg.process_info.task_results,
+      }
+    : undefined,
+});
+
 interface ChatWindowProps {
   sessionId: string | null;
   onSessionChange: (sessionId: string | null) => void;
@@ -49,6 +66,13 @@ export default function ChatWindowShadcn({
   const [sessions, setSessions] = useState<
     Array<{ id: string; title: string; updated_at: string }>
   >([]);
+  // 接口分页返回，游标为 null 表示没有更多数据
+  const [sessionsCursor, setSessionsCursor] = useState<string | null>(null);
+  const [messagesCursor, setMessagesCursor] = useState<string | null>(null);
+  const isLoadingSessions = useRef(false);
+  const isLoadingOlderMessages = useRef(false);
+  // 记录当前会话，丢弃切换会话前发出的翻页请求的结果
+  const activeSessionId = useRef<string | null>(sessionId);
   const [llmConfigStatus, setLlmConfigStatus] = useState<{
     configured: boolean;
     providers: Array<{ name: string; env: string; configured: boolean; model: string }>;
@@ -114,6 +138,7 @@ export default function ChatWindowShadcn({
           apiUrl("/api/chat/sessions/")
         );
         if (sessionsData.status === "success") {
+          // 只检查最新一页，空会话都是刚创建的
           for (const session of sessionsData.data) {
             // 跳过最近创建的会话
             if (session.id === recentlyCreatedSessionId.current) {
@@ -121,7 +146,7 @@ export default function ChatWindowShadcn({
             }
 
             const messagesData = await fetchWithCSRF(
-              apiUrl(`/api/chat/sessions/${session.id}/messages/`)
+              apiUrl(`/api/chat/sessions/${session.id}/messages/?limit=1`)
             );
 
             if (
@@ -236,12 +261,16 @@ export default function ChatWindowShadcn({
     }
   };
 
-  // 3. 处理流式响应
+  // 3. 处理流式响应；读取中断时携带 Last-Event-ID 重连续传
   const handleStreamResponse = async (
-    reader: ReadableStreamDefaultReader<Uint8Array>
+    reader: ReadableStreamDefaultReader<Uint8Array>,
+    reconnect: (lastEventId: string) => Promise<ReadableStreamDefaultReader<Uint8Array>>
   ) => {
     const decoder = new TextDecoder();
     let buffer = "";
+    let pendingEventId = "";
+    let lastEventId = "";
+    let retries = 0;
     let accumulatedMessage = { current: "" };
     let processInfo = {
       steps: [] as string[],
@@ -251,7 +280,19 @@ export default function ChatWindowShadcn({
     };
 
     while (true) {
-      const { done, value } = await reader.read();
+      let chunk: ReadableStreamReadResult<Uint8Array>;
+      try {
+        chunk = await reader.read();
+      } catch (error) {
+        if (!lastEventId || retries >= MAX_STREAM_RETRIES) throw error;
+        retries += 1;
+        await new Promise((resolve) => setTimeout(resolve, 500 * retries));
+        reader = await reconnect(lastEventId);
+        buffer = "";
+        pendingEventId = "";
+        continue;
+      }
+      const { done, value } = chunk;
       if (done) break;
 
       buffer += decoder.decode(value, { stream: true });
@@ -259,7 +300,16 @@ export default function ChatWindowShadcn({
       buffer = lines.pop() || "";
 
       for (const line of lines) {
+        if (line.startsWith("id: ")) {
+          pendingEventId = line.slice(4).trim();
+          continue;
+        }
         processSSELine(line, accumulatedMessage, processInfo);
+        // 数据行处理完才推进断点，避免重连时跳过半截事件
+        if (line.startsWith("data: ") && pendingEventId) {
+          lastEventId = pendingEventId;
+          pendingEventId = "";
+        }
       }
     }
 
@@ -270,11 +320,17 @@ export default function ChatWindowShadcn({
   };
 
   // 4. 发送网络请求
-  const sendChatRequest = async (message: string, sessionId: string, isAgent: boolean) => {
+  const sendChatRequest = async (
+    message: string,
+    sessionId: string,
+    isAgent: boolean,
+    lastEventId?: string
+  ) => {
     const response = await fetchWithCSRF(apiUrl("/api/v1/chat/"), {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        ...(lastEventId ? { "Last-Event-ID": lastEventId } : {}),
       },
       body: JSON.stringify({
         message,
@@ -319,7 +375,9 @@ export default function ChatWindowShadcn({
       const reader = await sendChatRequest(currentMessage, sessionId, isAgent);
 
       // 处理流式响应
-      const result = await handleStreamResponse(reader);
+      const result = await handleStreamResponse(reader, (lastEventId) =>
+        sendChatRequest(currentMessage, sessionId, isAgent, lastEventId)
+      );
 
       // 更新最终消息
       setMessages((prev) => [
@@ -338,27 +396,18 @@ export default function ChatWindowShadcn({
       cleanupChatState();
     }
   };
-  // 当 sessionId 改变时，重新获取消息
+  // 当 sessionId 改变时，重新获取最新一页消息
   useEffect(() => {
+    activeSessionId.current = sessionId;
+    setMessagesCursor(null);
     if (sessionId) {
       fetchWithCSRF(
-        apiUrl(`/api/chat/sessions/${sessionId}/messages/`)
+        apiUrl(`/api/chat/sessions/${sessionId}/messages/?include=process_info`)
       )
         .then((data) => {
-          if (data.status === "success") {
-            const newMessages = data.data.map((msg: any) => ({
-              text: msg.content,
-              isUser: msg.is_user,
-              processInfo: msg.process_info
-                ? {
-                    steps: msg.process_info.steps,
-                    taskPlan: msg.process_info.task_plan,
-                    toolSelection: msg.process_info.tool_selection,
-                    taskResults: msg.process_info.task_results,
-                  }
-                : undefined,
-            }));
-            setMessages(newMessages);
+          if (data.status === "success" && activeSessionId.current === sessionId) {
+            setMessages(data.data.map(toChatMessage));
+            setMessagesCursor(data.next_cursor ?? null);
           }
         })
         .catch((error) => {
@@ -369,6 +418,28 @@ export default function ChatWindowShadcn({
     }
   }, [sessionId]);
 
+  // 滚动到顶部时加载更早的一页消息，返回是否插入了消息
+  const loadOlderMessages = async () => {
+    if (!sessionId || !messagesCursor || isLoadingOlderMessages.current) return false;
+    isLoadingOlderMessages.current = true;
+    try {
+      const data = await fetchWithCSRF(
+        apiUrl(
+          `/api/chat/sessions/${sessionId}/messages/?include=process_info&cursor=${encodeURIComponent(messagesCursor)}`
+        )
+      );
+      if (data.status !== "success" || activeSessionId.current !== sessionId) return false;
+      setMessages((prev) => [...data.data.map(toChatMessage), ...prev]);
+      setMessagesCursor(data.next_cursor ?? null);
+      return data.data.length > 0;
+    } catch (error) {
+      console.error("获取更早的消息失败:", error);
+      return false;
+    } finally {
+      isLoadingOlderMessages.current = false;
+    }
+  };
+
   const fetchSessions = async () => {
     try {
       const data = await fetchWithCSRF(
@@ -376,12 +447,34 @@ export default function ChatWindowShadcn({
       );
       if (data.status === "success") {
         setSessions(data.data);
+        setSessionsCursor(data.next_cursor ?? null);
       }
     } catch (error) {
       console.error("获取聊天历史失败:", error);
     }
   };
 
+  const loadMoreSessions = async () => {
+    if (!sessionsCursor || isLoadingSessions.current) return;
+    isLoadingSessions.current = true;
+    try {
+      const data = await fetchWithCSRF(
+        apiUrl(`/api/chat/sessions/?cursor=${encodeURIComponent(sessionsCursor)}`)
+      );
+      if (data.status === "success") {
+        setSessions((prev) => {
+          const seen = new Set(prev.map((session) => session.id));
+          return [...prev, ...data.data.filter((session: any) => !seen.has(session.id))];
+        });
+        setSessionsCursor(data.next_cursor ?? null);
+      }
+    } catch (error) {
+      console.error("获取更多聊天历史失败:", error);
+    } finally {
+      isLoadingSessions.current = false;
+    }
+  };
+
   const handleNewSession = async () => {
     try {
       const data = await fetchWithCSRF(
@@ -451,6 +544,8 @@ export default function ChatWindowShadcn({
           currentSessionId={sessionId}
           onSessionChange={onSessionChange}
           onDeleteSession={handleDeleteSession}
+          hasMore={sessionsCursor !== null}
+          onLoadMore={loadMoreSessions}
           open={isHistoryOpen}
           onOpenChange={setIsHistoryOpen}
         />
@@ -484,6 +579,8 @@ export default function ChatWindowShadcn({
             streamingMessage={isStreaming ? streamingMessage : null}
             currentProcessInfo={currentProcessInfo}
             isProcessing={isStreaming}
+            hasOlder={messagesCursor !== null}
+            onLoadOlder={loadOlderMessages}
           />
         </CardContent>
 
@@ -87,7 +87,7 @@ export default function ChatWindowShadcn({
             )
 
             const messagesData = await fetchWithCSRF(
-              apiUrl(`/api/chat/sessions/${session.id}/messages/`)
+              apiUrl(`/api/chat/sessions/${session.id}/messages/?limit=1`)
             );
             
             if (messagesData.status === "success" && messagesData.data.length === 0 && documentsData.status === "success" && documentsData.data.length === 0) {